@@ -0,0 +1,6 @@
+"""Benchmarks for dynamic_fastapi.
+
+Each module can be run on its own, e.g. `python -m benchmarks.decode`, or
+every benchmark can be run together with `python -m benchmarks`, optionally
+saving the results as JSON to compare with later runs.
+"""
@@ -0,0 +1,81 @@
+"""Run every benchmark and save the results.
+
+Save the results of a run with `--output`, then pass them to `--compare` on a
+later run to see how each result changed.
+"""
+from typing import Any
+
+import click
+
+from benchmarks import decode, encode, load, startup, validate
+from benchmarks.results import compare, flatten, load_results, save_results
+
+_SCALES = {
+    "quick": {
+        "docs": 10_000,
+        "task_types": 50,
+        "windows": 2000,
+        "requests": 200,
+        "startup_task_types": [10, 100],
+    },
+    "full": {
+        "docs": 100_000,
+        "task_types": 200,
+        "windows": 20_000,
+        "requests": 2000,
+        "startup_task_types": [100, 500],
+    },
+}
+"""Sizes of the benchmarks at each scale."""
+
+
+def run(scale: str, seed: int) -> dict[str, dict[str, Any]]:
+    """Run every benchmark.
+
+    :param scale: The name of the benchmark sizes to use.
+    :param seed: The seed for the load test data.
+
+    :returns: The results of each benchmark, keyed by benchmark name.
+    """
+    sizes = _SCALES[scale]
+    return {
+        "decode": decode.run(sizes["docs"]),
+        "encode": encode.run(sizes["docs"] // 10, rounds=5),
+        "validate": validate.run(sizes["docs"], sizes["task_types"]),
+        "load": load.run(
+            window_count=sizes["windows"], requests=sizes["requests"], seed=seed
+        ),
+        "startup": startup.run(sizes["startup_task_types"], seed=seed),
+    }
+
+
+@click.command
+@click.option(
+    "--scale", type=click.Choice(list(_SCALES)), default="quick", show_default=True
+)
+@click.option("--seed", default=0, help="Seed for generated data.")
+@click.option("--output", "-o", type=click.Path(), help="Save results as JSON.")
+@click.option(
+    "--compare",
+    "baseline",
+    type=click.Path(exists=True),
+    help="Results of an earlier run to compare with.",
+)
+def main(scale: str, seed: int, output: str | None, baseline: str | None) -> None:
+    results = run(scale, seed)
+
+    if baseline is None:
+        for name, value in flatten(results):
+            click.echo(f"{name}: {value:,.2f}")
+    else:
+        previous = load_results(baseline)
+        click.echo(f"Compared with {previous['commit'] or baseline}:")
+        for name, before, after, change in compare(previous["results"], results):
+            click.echo(f"{name}: {before:,.2f} -> {after:,.2f} ({change:+.1%})")
+
+    if output is not None:
+        save_results(output, {"scale": scale, "seed": seed}, results)
+
+
+if __name__ == "__main__":
+    main()
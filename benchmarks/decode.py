@@ -0,0 +1,130 @@
+"""Benchmark per-document window decoding.
+
+Compares decoding through the models cached by `TaskTypeRegistry` with the
+previous approach of looking up the task type, resolving its parameters model
+by name and parametrising `Window[...]` for every document, and with trusted
+reads which skip validation.
+"""
+from collections.abc import Callable, Mapping
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any
+
+import click
+
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
+from dynamic_fastapi.model.window import Window, WindowParams
+
+TASK_TYPES = [
+    TaskType(name="task_alpha"),
+    TaskType(name="task_beta", extensions={"symbol_set": None}),
+    TaskType(
+        name="task_gamma",
+        extensions={"keynonce": {"key_len": 12, "nonce_len": 8}},
+    ),
+]
+"""Task types matching data/seeds.yml."""
+
+
+def make_docs(count: int) -> list[dict[str, Any]]:
+    """Create window documents spread across the benchmark task types.
+
+    :param count: The number of documents to create.
+
+    :returns: The window documents.
+    """
+    start = datetime(2023, 1, 1)
+    extra = {
+        "task_alpha": {},
+        "task_beta": {"symbol_set": 3},
+        "task_gamma": {"key": "0" * 12, "nonce": "f" * 8},
+    }
+
+    docs = []
+    for i in range(count):
+        task_type = TASK_TYPES[i % len(TASK_TYPES)].name
+        docs.append(
+            {
+                "_id": f"{i:024x}",
+                "params": {
+                    "task_type": task_type,
+                    "start_time": start + timedelta(minutes=i),
+                    "stop_time": start + timedelta(minutes=i + 60),
+                    "datasources": ["src_a", "src_b"],
+                    **extra[task_type],
+                },
+                "state": "open",
+            }
+        )
+
+    return docs
+
+
+def _legacy_decoder() -> Callable[[Mapping[str, Any]], Window]:
+    """Create a decoder using the lookups made before models were cached.
+
+    :returns: A function decoding one window document.
+    """
+    params_models: dict[str, type[WindowParams]] = {}
+    for task_type in TASK_TYPES:
+        name = f"{task_type.name.upper()}_WindowParams"
+        params_models[name] = task_type.params_model
+
+    def _decode(doc: Mapping[str, Any]) -> Window:
+        task_type = TaskTypeRegistry.task_type(doc["params"]["task_type"])
+        params_model = params_models[f"{task_type.name.upper()}_WindowParams"]
+        return Window[params_model].parse_obj(doc)
+
+    return _decode
+
+
+def time_decode(decode: Callable[[Mapping[str, Any]], Window], docs: list) -> float:
+    """Time decoding every document.
+
+    :param decode: The decoder.
+    :param docs: The documents to decode.
+
+    :returns: The mean time per document in microseconds.
+    """
+    begin = perf_counter()
+    for doc in docs:
+        decode(doc)
+    return (perf_counter() - begin) / len(docs) * 1e6
+
+
+def run(count: int) -> dict[str, float]:
+    """Run the decode benchmark.
+
+    :param count: The number of documents to decode.
+
+    :returns: The mean decode time per document in microseconds, keyed by
+        approach.
+    """
+    for task_type in TASK_TYPES:
+        TaskTypeRegistry.register(task_type)
+
+    docs = make_docs(count)
+    windows_db = WindowCollection.__new__(WindowCollection)
+    windows_db.validate_sample_rate = 0.0
+
+    return {
+        "legacy_us": time_decode(_legacy_decoder(), docs),
+        "cached_us": time_decode(windows_db.from_doc, docs),
+        "trusted_us": time_decode(
+            lambda doc: windows_db.from_doc(doc, validate=False), docs
+        ),
+    }
+
+
+@click.command
+@click.option("--count", "-n", default=100_000, help="Documents to decode.")
+def main(count: int) -> None:
+    results = run(count)
+    click.echo(f"Decoded {count} documents")
+    for name, value in results.items():
+        click.echo(f"  {name}: {value:.2f} us/doc")
+
+
+if __name__ == "__main__":
+    main()
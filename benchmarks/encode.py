@@ -0,0 +1,72 @@
+"""Benchmark response encoding for window listings.
+
+Compares `jsonable_encoder` followed by `JSONResponse` with `ORJSONResponse`
+rendering the validated models directly.
+"""
+from collections.abc import Callable
+from time import perf_counter
+
+import click
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from benchmarks.decode import TASK_TYPES, make_docs
+from dynamic_fastapi.app.responses import ORJSONResponse
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.page import Page
+from dynamic_fastapi.model.task_type import TaskTypeRegistry
+from dynamic_fastapi.model.window import Window
+
+
+def time_encode(encode: Callable[[Page], bytes], page: Page, rounds: int) -> float:
+    """Time encoding a page.
+
+    :param encode: The encoder.
+    :param page: The page to encode.
+    :param rounds: The number of times to encode the page.
+
+    :returns: The number of windows encoded per second.
+    """
+    begin = perf_counter()
+    for _ in range(rounds):
+        encode(page)
+    return len(page.items) * rounds / (perf_counter() - begin)
+
+
+def run(count: int, rounds: int) -> dict[str, float]:
+    """Run the encode benchmark.
+
+    :param count: The number of windows per page.
+    :param rounds: The number of times to encode the page.
+
+    :returns: Windows encoded per second, keyed by approach.
+    """
+    for task_type in TASK_TYPES:
+        TaskTypeRegistry.register(task_type)
+
+    windows_db = WindowCollection.__new__(WindowCollection)
+    items = [windows_db.from_doc(doc) for doc in make_docs(count)]
+    page = Page[Window].construct(items=items, next=None)
+
+    return {
+        "jsonable_encoder_per_s": time_encode(
+            lambda page: JSONResponse(jsonable_encoder(page)).body, page, rounds
+        ),
+        "orjson_per_s": time_encode(
+            lambda page: ORJSONResponse(page).body, page, rounds
+        ),
+    }
+
+
+@click.command
+@click.option("--count", "-n", default=10_000, help="Windows per page.")
+@click.option("--rounds", "-r", default=5, help="Times to encode the page.")
+def main(count: int, rounds: int) -> None:
+    results = run(count, rounds)
+    click.echo(f"Encoded {rounds} pages of {count} windows")
+    for name, value in results.items():
+        click.echo(f"  {name}: {value:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+"""In-memory stand-in for the parts of a Motor client used by the application.
+
+Documents are stored BSON encoded and decoded on every read, so reads cost
+about as much as decoding the driver's responses does. Queries scan the
+collection in `_id` order, skipping straight to the document for an `_id` or
+past a `$gt` bound on it, as the `_id` index would. Only the query and update
+operators used by the application are supported, and unique indexes are
+enforced.
+"""
+from bisect import bisect_right, insort
+from collections.abc import (
+    AsyncIterator, Callable, Iterable, Iterator, Mapping, Sequence
+)
+from datetime import datetime
+from itertools import islice
+from typing import Any
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.objectid import ObjectId
+from pymongo import IndexModel, ReturnDocument, WriteConcern
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import InsertOneResult, UpdateResult
+
+_CODEC_OPTIONS = CodecOptions(tz_aware=False)
+
+
+def _values(doc: Mapping[str, Any], path: str) -> list[Any]:
+    """Find the values at a dotted path, as a query would match them.
+
+    :param doc: The document.
+    :param path: The dotted field path.
+
+    :returns: The value at the path, followed by its elements if it is an
+        array. Empty if the document has no value at the path.
+    """
+    value = doc
+    for key in path.split("."):
+        if not isinstance(value, Mapping) or key not in value:
+            return []
+        value = value[key]
+
+    if isinstance(value, list):
+        return [value, *value]
+    return [value]
+
+
+def _compare(compare: Callable[[Any, Any], bool]) -> Callable[[list, Any], bool]:
+    def _matches(values: list[Any], arg: Any) -> bool:
+        for value in values:
+            try:
+                if compare(value, arg):
+                    return True
+            except TypeError:
+                continue
+        return False
+
+    return _matches
+
+
+_TYPES = {"string": str, "date": datetime, "objectId": ObjectId}
+"""Python types of the BSON type aliases supported by `$type`."""
+
+_OPERATORS: dict[str, Callable[[list, Any], bool]] = {
+    "$in": lambda values, arg: any(value in arg for value in values),
+    "$ne": lambda values, arg: all(value != arg for value in values),
+    "$exists": lambda values, arg: bool(values) is bool(arg),
+    "$type": lambda values, arg: any(
+        isinstance(value, _TYPES[arg]) for value in values
+    ),
+    "$gt": _compare(lambda value, arg: value > arg),
+    "$gte": _compare(lambda value, arg: value >= arg),
+    "$lt": _compare(lambda value, arg: value < arg),
+    "$lte": _compare(lambda value, arg: value <= arg),
+}
+
+
+def matches(doc: Mapping[str, Any], filter: Mapping[str, Any] | None) -> bool:
+    """Check whether a document matches a query filter.
+
+    :param doc: The document.
+    :param filter: The query filter.
+
+    :returns: Whether the document matches.
+
+    :raises OperationFailure: If the filter uses an unsupported operator.
+    """
+    for key, condition in (filter or {}).items():
+        if key == "$and":
+            matched = all(matches(doc, part) for part in condition)
+        elif key == "$or":
+            matched = any(matches(doc, part) for part in condition)
+        elif isinstance(condition, Mapping) and any(
+            op.startswith("$") for op in condition
+        ):
+            values = _values(doc, key)
+            try:
+                matched = all(
+                    _OPERATORS[op](values, arg) for op, arg in condition.items()
+                )
+            except KeyError as err:
+                raise OperationFailure(f"Unsupported operator: {err}") from err
+        else:
+            matched = any(value == condition for value in _values(doc, key))
+
+        if not matched:
+            return False
+
+    return True
+
+
+def _project(doc: Mapping[str, Any], projection: Mapping[str, Any]) -> dict:
+    """Include only the projected fields of a document.
+
+    :param doc: The document.
+    :param projection: The inclusion projection.
+
+    :returns: The projected document.
+    """
+    projected = {}
+    paths = [path for path, include in projection.items() if include]
+    if projection.get("_id", True):
+        paths.append("_id")
+
+    for path in paths:
+        *parents, name = path.split(".")
+        source, target = doc, projected
+        for key in parents:
+            source = source.get(key) if isinstance(source, Mapping) else None
+            if not isinstance(source, Mapping):
+                break
+            target = target.setdefault(key, {})
+        else:
+            if name in source:
+                target[name] = source[name]
+
+    return projected
+
+
+def _update(doc: dict[str, Any], update: Mapping[str, Any]) -> None:
+    """Apply an update to a document in place.
+
+    :param doc: The document.
+    :param update: The update, using `$set` and `$inc`.
+
+    :raises OperationFailure: If the update uses an unsupported operator.
+    """
+    for op, fields in update.items():
+        if op not in ("$set", "$inc"):
+            raise OperationFailure(f"Unsupported update operator: {op}")
+
+        for path, value in fields.items():
+            *parents, name = path.split(".")
+            target = doc
+            for key in parents:
+                target = target.setdefault(key, {})
+            if op == "$inc":
+                value = target.get(name, 0) + value
+            target[name] = value
+
+
+class FakeCursor:
+    """Cursor over the documents found by a query."""
+
+    def __init__(self, collection: "FakeCollection", **query: Any):
+        self._collection = collection
+        self._query = query
+
+    def __aiter__(self) -> AsyncIterator[dict[str, Any]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[dict[str, Any]]:
+        for doc in self._collection._find(**self._query):
+            yield doc
+
+    async def to_list(self, length: int | None) -> list[dict[str, Any]]:
+        """Return the found documents.
+
+        :param length: The largest number of documents to return, or None for
+            all of them.
+
+        :returns: The documents.
+        """
+        return list(islice(self._collection._find(**self._query), length))
+
+
+class FakeCollection:
+    """In-memory collection."""
+
+    write_concern = WriteConcern()
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: dict[Any, dict[str, Any]] = {}
+        self._ids: list[Any] = []
+        self._encoded: dict[Any, bytes] = {}
+        self._indexes: dict[str, IndexModel] = {}
+        self._unique: dict[str, dict[bytes, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def find(
+        self,
+        filter: Mapping[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+        sort: Sequence[tuple[str, int]] | None = None,
+        limit: int = 0,
+    ) -> FakeCursor:
+        return FakeCursor(
+            self, filter=filter, projection=projection, sort=sort, limit=limit
+        )
+
+    async def find_one(
+        self, filter: Mapping[str, Any] | None = None
+    ) -> dict[str, Any] | None:
+        return next(self._find(filter), None)
+
+    async def insert_one(self, doc: dict[str, Any]) -> InsertOneResult:
+        # The driver sets the generated _id on the document it is given.
+        doc.setdefault("_id", ObjectId())
+        self._store(doc, new=True)
+        return InsertOneResult(doc["_id"], acknowledged=True)
+
+    async def insert_many(
+        self, docs: Sequence[dict[str, Any]], ordered: bool = True
+    ) -> None:
+        write_errors = []
+        for index, doc in enumerate(docs):
+            doc.setdefault("_id", ObjectId())
+            try:
+                self._store(doc, new=True)
+            except DuplicateKeyError as err:
+                write_errors.append(
+                    {"index": index, "code": err.code, "errmsg": str(err)}
+                )
+                if ordered:
+                    break
+
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors})
+
+    async def find_one_and_update(
+        self,
+        filter: Mapping[str, Any],
+        update: Mapping[str, Any],
+        return_document: bool = ReturnDocument.BEFORE,
+    ) -> dict[str, Any] | None:
+        before = next(self._find(filter), None)
+        if before is None:
+            return None
+
+        after = self._decode(self._encoded[before["_id"]])
+        _update(after, update)
+        self._store(after)
+        return after if return_document == ReturnDocument.AFTER else before
+
+    async def update_many(
+        self, filter: Mapping[str, Any], update: Mapping[str, Any]
+    ) -> UpdateResult:
+        docs = list(self._find(filter))
+        for doc in docs:
+            _update(doc, update)
+            self._store(doc)
+
+        count = len(docs)
+        return UpdateResult({"n": count, "nModified": count}, acknowledged=True)
+
+    async def create_indexes(self, indexes: Sequence[IndexModel]) -> list[str]:
+        for index in indexes:
+            name = index.document["name"]
+            self._indexes[name] = index
+            self._unique[name] = {}
+            for doc_id, doc in self._docs.items():
+                key = self._unique_keys(doc).get(name)
+                if key is not None:
+                    self._unique[name][key] = doc_id
+        return [index.document["name"] for index in indexes]
+
+    async def index_information(self) -> dict[str, Any]:
+        indexes = {"_id_": {"key": [("_id", 1)]}}
+        for name, index in self._indexes.items():
+            indexes[name] = {"key": list(index.document["key"].items())}
+        return indexes
+
+    def aggregate(self, pipeline: Sequence[Mapping[str, Any]]) -> None:
+        raise OperationFailure("Aggregation is not supported")
+
+    def watch(self, *args, **kwargs) -> None:
+        raise OperationFailure("Change streams are not supported")
+
+    def _find(
+        self,
+        filter: Mapping[str, Any] | None = None,
+        projection: Mapping[str, Any] | None = None,
+        sort: Sequence[tuple[str, int]] | None = None,
+        limit: int = 0,
+    ) -> Iterator[dict[str, Any]]:
+        filter = filter or {}
+        doc_ids = (
+            doc_id
+            for doc_id in self._scan(filter, list(sort or []))
+            if matches(self._docs[doc_id], filter)
+        )
+        for doc_id in islice(doc_ids, limit or None):
+            doc = self._decode(self._encoded[doc_id])
+            yield doc if projection is None else _project(doc, projection)
+
+    def _scan(
+        self, filter: Mapping[str, Any], sort: list[tuple[str, int]]
+    ) -> Iterable[Any]:
+        """Find the IDs of the documents a query may match, in sorted order.
+
+        :param filter: The query filter.
+        :param sort: The sort keys and directions.
+
+        :returns: The candidate document IDs.
+        """
+        doc_id = filter.get("_id")
+        if doc_id is not None and not isinstance(doc_id, Mapping):
+            # Look documents up by ID directly, as the _id index would.
+            return [doc_id] if doc_id in self._docs else []
+
+        if sort in ([], [("_id", 1)]):
+            # Scan in _id order from any lower bound, as the _id index would.
+            start = 0
+            if isinstance(doc_id, Mapping) and "$gt" in doc_id:
+                start = bisect_right(self._ids, doc_id["$gt"])
+            return (self._ids[index] for index in range(start, len(self._ids)))
+
+        doc_ids = list(self._ids)
+        for key, direction in reversed(sort):
+            doc_ids.sort(
+                key=lambda doc_id: _values(self._docs[doc_id], key)[:1],  # noqa: B023
+                reverse=direction < 0,
+            )
+        return doc_ids
+
+    def _store(self, doc: Mapping[str, Any], new: bool = False) -> None:
+        doc_id = doc["_id"]
+        previous = self._docs.get(doc_id)
+        if new and previous is not None:
+            raise DuplicateKeyError(f"Duplicate key: _id {doc_id}", 11000)
+
+        keys = self._unique_keys(doc)
+        for name, key in keys.items():
+            if self._unique[name].get(key, doc_id) != doc_id:
+                raise DuplicateKeyError(f"Duplicate key: {name}", 11000)
+
+        if previous is None:
+            insort(self._ids, doc_id)
+        else:
+            for name, key in self._unique_keys(previous).items():
+                del self._unique[name][key]
+        for name, key in keys.items():
+            self._unique[name][key] = doc_id
+
+        encoded = bson.encode(doc)
+        self._encoded[doc_id] = encoded
+        self._docs[doc_id] = self._decode(encoded)
+
+    def _unique_keys(self, doc: Mapping[str, Any]) -> dict[str, bytes]:
+        """Find the keys of a document in each unique index covering it.
+
+        :param doc: The document.
+
+        :returns: The encoded keys by index name.
+        """
+        keys = {}
+        for name, index in self._indexes.items():
+            spec = index.document
+            if spec.get("unique") and matches(doc, spec.get("partialFilterExpression")):
+                values = [_values(doc, path)[:1] for path in spec["key"]]
+                keys[name] = bson.encode({"key": values})
+        return keys
+
+    @staticmethod
+    def _decode(encoded: bytes) -> dict[str, Any]:
+        return bson.decode(encoded, _CODEC_OPTIONS)
+
+
+class FakeDatabase:
+    """In-memory database."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+
+class FakeClient:
+    """In-memory client."""
+
+    def __init__(self):
+        self._databases: dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name)
+        return self._databases[name]
+
+    def close(self) -> None:
+        pass
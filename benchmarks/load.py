@@ -0,0 +1,312 @@
+"""Load test the application in process.
+
+The application is started against an in-memory database seeded with
+generated task types and windows, and requests are sent straight to it
+through ASGI, without a server or network in between. Each scenario sends its
+requests from several concurrent clients and reports the throughput and
+latency percentiles. Decoding the seeded windows is timed separately.
+
+Run with `python -m benchmarks.load`, or with every other benchmark through
+`python -m benchmarks`.
+"""
+import asyncio
+from collections.abc import Callable, Mapping
+from random import Random
+from statistics import quantiles
+from time import perf_counter
+from typing import Any, NamedTuple
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+import click
+import orjson
+from fastapi import FastAPI
+
+from benchmarks.fake import FakeClient
+from benchmarks.results import save_results
+from benchmarks.seeds import (
+    DATASOURCES, make_params, make_task_types, make_window_docs
+)
+from dynamic_fastapi.app.config import AppConfig
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.task_type import TaskType
+
+
+class Request(NamedTuple):
+    """A request to send to the application."""
+
+    method: str
+    path: str
+    query: Mapping[str, Any] = {}
+    body: Any = None
+
+
+async def send(app: FastAPI, request: Request) -> tuple[int, bytes]:
+    """Send a request to an application through ASGI.
+
+    :param app: The application.
+    :param request: The request.
+
+    :returns: The response status and body.
+    """
+    body = b"" if request.body is None else orjson.dumps(request.body)
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": request.method,
+        "scheme": "http",
+        "path": request.path,
+        "raw_path": request.path.encode(),
+        "query_string": urlencode(request.query, doseq=True).encode(),
+        "root_path": "",
+        "headers": [
+            (b"host", b"benchmark"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    response = {"status": 0, "body": []}
+
+    async def _receive() -> dict[str, Any]:
+        if messages:
+            return messages.pop()
+        # The client never disconnects.
+        await asyncio.Future()
+
+    async def _send(message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await app(scope, _receive, _send)
+    return response["status"], b"".join(response["body"])
+
+
+async def run_scenario(
+    app: FastAPI,
+    make_request: Callable[[Random], Request],
+    requests: int,
+    concurrency: int,
+    rng: Random,
+) -> dict[str, float]:
+    """Send requests from concurrent clients and measure the responses.
+
+    :param app: The application.
+    :param make_request: Create the next request.
+    :param requests: The total number of requests to send.
+    :param concurrency: The number of concurrent clients.
+    :param rng: The random number generator.
+
+    :returns: The request count, error count, requests per second and
+        latency percentiles in milliseconds.
+    """
+    pending = [make_request(rng) for _ in range(requests)]
+    latencies, errors = [], 0
+
+    async def _client() -> None:
+        nonlocal errors
+        while pending:
+            request = pending.pop()
+            begin = perf_counter()
+            status, _ = await send(app, request)
+            latencies.append((perf_counter() - begin) * 1000)
+            errors += status >= 400
+
+    begin = perf_counter()
+    await asyncio.gather(*(_client() for _ in range(concurrency)))
+    elapsed = perf_counter() - begin
+
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": requests,
+        "errors": errors,
+        "per_s": requests / elapsed,
+        "p50_ms": percentiles[49],
+        "p90_ms": percentiles[89],
+        "p99_ms": percentiles[98],
+        "max_ms": max(latencies),
+    }
+
+
+def time_decode(windows_db: WindowCollection, docs: list, validate: bool) -> float:
+    """Time decoding window documents.
+
+    :param windows_db: The windows collection.
+    :param docs: The window documents.
+    :param validate: Whether to validate the documents.
+
+    :returns: The number of documents decoded per second.
+    """
+    begin = perf_counter()
+    for doc in docs:
+        windows_db.from_doc(doc, validate=validate)
+    return len(docs) / (perf_counter() - begin)
+
+
+def _scenarios(
+    task_types: list[TaskType], window_ids: list[str]
+) -> dict[str, Callable[[Random], Request]]:
+    """Create the request generators for each scenario.
+
+    :param task_types: The seeded task types.
+    :param window_ids: The IDs of the seeded windows.
+
+    :returns: The request generators, keyed by scenario name.
+    """
+
+    def _create(rng: Random) -> Request:
+        task_type = rng.choice(task_types)
+        return Request(
+            "POST",
+            f"/windows/{task_type.name}/create",
+            body=make_params(task_type, rng),
+        )
+
+    def _get(rng: Random) -> Request:
+        return Request("GET", f"/windows/{rng.choice(window_ids)}")
+
+    def _list(rng: Random) -> Request:
+        return Request("GET", "/windows", {"limit": 100})
+
+    def _list_filtered(rng: Random) -> Request:
+        query = rng.choice(
+            [
+                {"task_type": rng.choice(task_types).name},
+                {"datasource": rng.choice(DATASOURCES)},
+                {"state": "open", "datasource": rng.choice(DATASOURCES)},
+            ]
+        )
+        return Request("GET", "/windows", {**query, "limit": 100})
+
+    def _active(rng: Random) -> Request:
+        return Request(
+            "GET",
+            "/windows/active",
+            {"at": "2023-07-01T00:00:00", "datasource": rng.choice(DATASOURCES)},
+        )
+
+    return {
+        "create": _create,
+        "get": _get,
+        "list": _list,
+        "list_filtered": _list_filtered,
+        "active": _active,
+    }
+
+
+async def _run(
+    app_config: AppConfig,
+    task_types: list[TaskType],
+    window_docs: list[dict[str, Any]],
+    requests: int,
+    concurrency: int,
+    rng: Random,
+) -> dict[str, dict[str, float]]:
+    # Imported here so that importing the benchmarks does not build the app.
+    from dynamic_fastapi.app import app
+
+    client = FakeClient()
+    database = client[app_config.mongo.database]
+    await database["task_types"].insert_many(
+        [
+            {"name": task_type.name, "extensions": task_type.extensions}
+            for task_type in task_types
+        ]
+    )
+    await database["windows"].insert_many(window_docs)
+
+    results = {}
+    with patch("dynamic_fastapi.app.create_client", return_value=client), patch(
+        "dynamic_fastapi.app.config._app_config", app_config
+    ):
+        async with app.router.lifespan_context(app):
+            windows_db = WindowCollection(database)
+            docs = await database["windows"].find().to_list(None)
+            results["decode"] = {
+                "validated_per_s": time_decode(windows_db, docs, validate=True),
+                "trusted_per_s": time_decode(windows_db, docs, validate=False),
+            }
+
+            window_ids = [str(doc["_id"]) for doc in window_docs]
+            for name, make_request in _scenarios(task_types, window_ids).items():
+                results[name] = await run_scenario(
+                    app, make_request, requests, concurrency, rng
+                )
+
+    return results
+
+
+def run(
+    task_type_count: int = 30,
+    window_count: int = 10_000,
+    requests: int = 1000,
+    concurrency: int = 10,
+    seed: int = 0,
+    trusted_reads: bool = False,
+    cache: bool = False,
+) -> dict[str, dict[str, float]]:
+    """Run the load benchmark.
+
+    :param task_type_count: The number of task types to seed.
+    :param window_count: The number of windows to seed.
+    :param requests: The number of requests sent per scenario.
+    :param concurrency: The number of concurrent clients.
+    :param seed: The seed for the generated data and requests.
+    :param trusted_reads: Whether the application skips validating reads.
+    :param cache: Whether the application caches reads in memory.
+
+    :returns: The results of each scenario, and the decode throughput.
+    """
+    rng = Random(seed)  # noqa: S311
+    task_types = make_task_types(task_type_count, rng)
+    window_docs = make_window_docs(task_types, window_count, rng)
+    app_config = AppConfig.parse_obj(
+        {
+            "uvicorn": {"port": 0, "log_level": "warning"},
+            "mongo": {"host": "memory", "database": "benchmark"},
+            "windows": {"trusted_reads": trusted_reads},
+            "cache": {"enabled": cache},
+            "openapi": {"precompute": False},
+        }
+    )
+
+    return asyncio.run(
+        _run(app_config, task_types, window_docs, requests, concurrency, rng)
+    )
+
+
+@click.command
+@click.option("--task-types", "-t", default=30, help="Task types to seed.")
+@click.option("--windows", "-w", default=10_000, help="Windows to seed.")
+@click.option("--requests", "-n", default=1000, help="Requests per scenario.")
+@click.option("--concurrency", "-c", default=10, help="Concurrent clients.")
+@click.option("--seed", default=0, help="Seed for generated data.")
+@click.option("--trusted-reads", is_flag=True, help="Skip validating reads.")
+@click.option("--cache", is_flag=True, help="Cache reads in memory.")
+@click.option("--output", "-o", type=click.Path(), help="Save results as JSON.")
+def main(output: str | None, **parameters: Any) -> None:
+    results = run(
+        task_type_count=parameters["task_types"],
+        window_count=parameters["windows"],
+        requests=parameters["requests"],
+        concurrency=parameters["concurrency"],
+        seed=parameters["seed"],
+        trusted_reads=parameters["trusted_reads"],
+        cache=parameters["cache"],
+    )
+    for scenario, values in results.items():
+        click.echo(f"{scenario}:")
+        for name, value in values.items():
+            click.echo(f"  {name}: {value:,.2f}")
+
+    if output is not None:
+        save_results(output, parameters, {"load": results})
+
+
+if __name__ == "__main__":
+    main()
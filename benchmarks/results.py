@@ -0,0 +1,91 @@
+"""Saving and comparing benchmark results.
+
+Results are saved as JSON along with the commit and Python version they were
+measured with, so that runs from different commits can be compared.
+"""
+import json
+import platform
+import subprocess
+from collections.abc import Iterator, Mapping
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+
+def _commit() -> str | None:
+    """The current git commit, if the benchmarks are run from a checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S603, S607
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return result.stdout.strip()
+
+
+def save_results(
+    path: str | Path, parameters: Mapping[str, Any], results: Mapping[str, Any]
+) -> None:
+    """Save benchmark results as JSON.
+
+    :param path: The file to write.
+    :param parameters: The parameters the benchmarks were run with.
+    :param results: The results, nested by benchmark.
+    """
+    document = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "parameters": parameters,
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(document, indent=2) + "\n")
+
+
+def load_results(path: str | Path) -> dict[str, Any]:
+    """Load benchmark results saved by `save_results`.
+
+    :param path: The file to read.
+
+    :returns: The saved results document.
+    """
+    return json.loads(Path(path).read_text())
+
+
+def flatten(results: Mapping[str, Any], prefix: str = "") -> Iterator[tuple]:
+    """Flatten nested results.
+
+    :param results: The results, nested by benchmark.
+    :param prefix: The dotted name of the enclosing results.
+
+    :yields: The dotted name and value of each numeric result.
+    """
+    for name, value in results.items():
+        if isinstance(value, Mapping):
+            yield from flatten(value, f"{prefix}{name}.")
+        elif isinstance(value, int | float) and not isinstance(value, bool):
+            yield f"{prefix}{name}", value
+
+
+def compare(
+    baseline: Mapping[str, Any], current: Mapping[str, Any]
+) -> list[tuple[str, float, float, float]]:
+    """Compare the results of two runs.
+
+    :param baseline: The earlier results.
+    :param current: The later results.
+
+    :returns: The name, baseline value, current value and relative change of
+        each result present in both runs.
+    """
+    before = dict(flatten(baseline))
+    return [
+        (name, before[name], value, value / before[name] - 1 if before[name] else 0)
+        for name, value in flatten(current)
+        if name in before
+    ]
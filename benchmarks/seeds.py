@@ -0,0 +1,104 @@
+"""Generated benchmark data, modelled on data/seeds.yml.
+
+Task types repeat the extension configurations of the seed task types, and
+windows are spread across the task types with random times and datasources.
+The same seed always generates the same data.
+"""
+from datetime import datetime, timedelta
+from random import Random
+from typing import Any
+
+from bson.objectid import ObjectId
+
+from dynamic_fastapi.model.task_type import TaskType
+from dynamic_fastapi.model.window import WindowState
+
+DATASOURCES = [f"src_{name}" for name in "abcdefgh"]
+"""Datasources used by generated windows."""
+
+_START = datetime(2023, 1, 1)
+
+
+def make_task_types(count: int, rng: Random) -> list[TaskType]:
+    """Create task types cycling through the seed extension configurations.
+
+    :param count: The number of task types.
+    :param rng: The random number generator.
+
+    :returns: The task types.
+    """
+    task_types = []
+    for i in range(count):
+        extensions = [
+            {},
+            {"symbol_set": None},
+            {
+                "keynonce": {
+                    "key_len": rng.choice([8, 12, 16]),
+                    "nonce_len": rng.choice([8, 16]),
+                }
+            },
+        ][i % 3]
+        task_types.append(TaskType(name=f"task_{i:03d}", extensions=extensions))
+
+    return task_types
+
+
+def make_params(task_type: TaskType, rng: Random) -> dict[str, Any]:
+    """Create window create parameters for a task type.
+
+    :param task_type: The task type.
+    :param rng: The random number generator.
+
+    :returns: The parameters, as they would be sent in a create request.
+    """
+    start = _START + timedelta(minutes=rng.randrange(365 * 24 * 60))
+    params = {
+        "start_time": start.isoformat(),
+        "stop_time": (start + timedelta(hours=rng.randint(1, 72))).isoformat(),
+        "datasources": rng.sample(DATASOURCES, rng.randint(1, 3)),
+    }
+
+    for ext_name, ext_args in task_type.extensions.items():
+        if ext_name == "symbol_set":
+            params["symbol_set"] = rng.randint(1, 10)
+        elif ext_name == "keynonce":
+            ext_args = ext_args or {}
+            for field in ("key", "nonce"):
+                length = ext_args.get(f"{field}_len") or 16
+                params[field] = f"{rng.getrandbits(length * 4):0{length}x}"
+
+    return params
+
+
+def make_window_docs(
+    task_types: list[TaskType], count: int, rng: Random
+) -> list[dict[str, Any]]:
+    """Create window documents spread across task types.
+
+    Most windows are open, and the rest are cancelled or complete.
+
+    :param task_types: The task types.
+    :param count: The number of documents.
+    :param rng: The random number generator.
+
+    :returns: The window documents.
+    """
+    states = [WindowState.OPEN] * 8 + [WindowState.CANCELLED, WindowState.COMPLETE]
+    docs = []
+    for _ in range(count):
+        task_type = rng.choice(task_types)
+        params = make_params(task_type, rng)
+        for field in ("start_time", "stop_time"):
+            params[field] = datetime.fromisoformat(params[field])
+
+        docs.append(
+            {
+                "_id": ObjectId(rng.randbytes(12)),
+                "params": {"task_type": task_type.name, **params},
+                "state": rng.choice(states).value,
+                "version": 0,
+            }
+        )
+
+    return docs
@@ -0,0 +1,135 @@
+"""Benchmark application startup.
+
+The application is started against an in-memory database seeded with
+generated task types, either building every task type's models and routes at
+startup or building each task type's models on first use. Both the startup
+and the first create requests for a task type are timed. Each measurement is
+taken in a fresh process, so that no models or caches are left over from
+earlier measurements.
+
+Run with `python -m benchmarks.startup`, or with every other benchmark through
+`python -m benchmarks`.
+"""
+import asyncio
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from random import Random
+from time import perf_counter
+from typing import Any
+from unittest.mock import patch
+
+import click
+
+from benchmarks.fake import FakeClient
+from benchmarks.load import Request, send
+from benchmarks.results import save_results
+from benchmarks.seeds import make_params, make_task_types
+from dynamic_fastapi.app.config import AppConfig
+
+
+async def _measure(task_type_count: int, lazy: bool, seed: int) -> dict[str, float]:
+    # Imported here so that only the measuring process builds the app.
+    from dynamic_fastapi.app import app
+
+    rng = Random(seed)  # noqa: S311
+    task_types = make_task_types(task_type_count, rng)
+    app_config = AppConfig.parse_obj(
+        {
+            "uvicorn": {"port": 0, "log_level": "warning"},
+            "mongo": {"host": "memory", "database": "benchmark"},
+            "task_types": {"lazy": lazy},
+            "openapi": {"precompute": False},
+        }
+    )
+    client = FakeClient()
+    await client[app_config.mongo.database]["task_types"].insert_many(
+        [
+            {"name": task_type.name, "extensions": task_type.extensions}
+            for task_type in task_types
+        ]
+    )
+
+    task_type = rng.choice(task_types)
+    path = f"/windows/{task_type.name}/create"
+    results = {}
+    with patch("dynamic_fastapi.app.create_client", return_value=client), patch(
+        "dynamic_fastapi.app.config._app_config", app_config
+    ):
+        begin = perf_counter()
+        async with app.router.lifespan_context(app):
+            results["startup_s"] = perf_counter() - begin
+            for name in ("first_create_ms", "second_create_ms"):
+                begin = perf_counter()
+                status, body = await send(
+                    app, Request("POST", path, body=make_params(task_type, rng))
+                )
+                results[name] = (perf_counter() - begin) * 1000
+                if status != 200:
+                    raise RuntimeError(f"Create failed with {status}: {body!r}")
+
+    return results
+
+
+def measure(task_type_count: int, lazy: bool, seed: int = 0) -> dict[str, float]:
+    """Start the application in this process and time it.
+
+    :param task_type_count: The number of task types to seed.
+    :param lazy: Whether task type models are built on first use.
+    :param seed: The seed for the generated task types and requests.
+
+    :returns: The startup time in seconds, and the times of the first and
+        second create requests for a task type in milliseconds.
+    """
+    return asyncio.run(_measure(task_type_count, lazy, seed))
+
+
+def run(task_type_counts: Sequence[int], seed: int = 0) -> dict[str, dict[str, Any]]:
+    """Run the startup benchmark.
+
+    :param task_type_counts: The numbers of task types to start with.
+    :param seed: The seed for the generated task types and requests.
+
+    :returns: The results of each measurement, keyed by the mode and number
+        of task types, such as `lazy_100`.
+    """
+    results = {}
+    for count in task_type_counts:
+        for mode in ("eager", "lazy"):
+            # A fresh process for each measurement.
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                results[f"{mode}_{count}"] = pool.submit(
+                    measure, count, mode == "lazy", seed
+                ).result()
+    return results
+
+
+@click.command
+@click.option(
+    "--task-types",
+    "-t",
+    multiple=True,
+    type=int,
+    default=[10, 100, 500],
+    show_default=True,
+    help="Numbers of task types to start with. May be repeated.",
+)
+@click.option("--seed", default=0, help="Seed for generated data.")
+@click.option("--output", "-o", type=click.Path(), help="Save results as JSON.")
+def main(task_types: tuple[int, ...], seed: int, output: str | None) -> None:
+    results = run(task_types, seed)
+    for name, values in results.items():
+        click.echo(
+            f"{name}: started in {values['startup_s']:.3f}s, first create "
+            f"{values['first_create_ms']:.1f}ms, second create "
+            f"{values['second_create_ms']:.1f}ms"
+        )
+
+    if output is not None:
+        save_results(
+            output, {"task_types": list(task_types), "seed": seed}, {"startup": results}
+        )
+
+
+if __name__ == "__main__":
+    main()
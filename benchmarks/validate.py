@@ -0,0 +1,124 @@
+"""Benchmark create request validation.
+
+Measures the throughput of validating window create parameters for each task
+type, and the time to build task type models with extension instances and
+field types built fresh for every task type compared with memoised ones.
+"""
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+from time import perf_counter
+from typing import Any
+
+import click
+
+from benchmarks.decode import TASK_TYPES
+from dynamic_fastapi.model import extension
+from dynamic_fastapi.model.extension import Extension
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeModels
+from dynamic_fastapi.model.window import WindowParams
+
+_EXTRA = {
+    "task_alpha": {},
+    "task_beta": {"symbol_set": 3},
+    "task_gamma": {"key": "0" * 12, "nonce": "f" * 8},
+}
+"""Extension parameters for create requests of each benchmark task type."""
+
+
+def make_bodies(task_type: TaskType, count: int) -> list[dict[str, Any]]:
+    """Create window create request bodies for a task type.
+
+    :param task_type: The task type.
+    :param count: The number of bodies to create.
+
+    :returns: The request bodies, as decoded JSON.
+    """
+    start = datetime(2023, 1, 1)
+    return [
+        {
+            "start_time": (start + timedelta(minutes=i)).isoformat(),
+            "stop_time": (start + timedelta(minutes=i + 60)).isoformat(),
+            "datasources": ["src_a", "src_b"],
+            **_EXTRA[task_type.name],
+        }
+        for i in range(count)
+    ]
+
+
+def time_validate(
+    params_model: type[WindowParams], bodies: list[Mapping[str, Any]]
+) -> float:
+    """Time validating every request body.
+
+    :param params_model: The parameters model of the task type.
+    :param bodies: The request bodies.
+
+    :returns: The number of bodies validated per second.
+    """
+    begin = perf_counter()
+    for body in bodies:
+        params_model.parse_obj(body)
+    return len(bodies) / (perf_counter() - begin)
+
+
+def time_build(task_types: list[TaskType], memoised: bool) -> float:
+    """Time building the models for task types.
+
+    :param task_types: The task types.
+    :param memoised: Whether extension instances and field types are shared
+        between task types, or built fresh for each.
+
+    :returns: The mean time per task type in microseconds.
+    """
+    begin = perf_counter()
+    for task_type in task_types:
+        if not memoised:
+            Extension.__instances__.clear()
+            extension._regex_str.cache_clear()
+        TaskType.validate(task_type.dict())
+        TaskTypeModels.build(task_type)
+    return (perf_counter() - begin) / len(task_types) * 1e6
+
+
+def run(count: int, task_type_count: int) -> dict[str, float]:
+    """Run the validation benchmark.
+
+    :param count: The number of request bodies validated per task type.
+    :param task_type_count: The number of task types to build models for.
+
+    :returns: Validated requests per second for each task type, and the mean
+        model build time per task type in microseconds.
+    """
+    results = {}
+    for task_type in TASK_TYPES:
+        params_model = TaskTypeModels.build(task_type).params_model
+        results[f"{task_type.name}_per_s"] = time_validate(
+            params_model, make_bodies(task_type, count)
+        )
+
+    # Many task types repeating a few extension configurations.
+    task_types = [
+        TaskType(
+            name=f"task_{i}",
+            extensions={"keynonce": {"key_len": 8 * (i % 4), "nonce_len": 8}},
+        )
+        for i in range(task_type_count)
+    ]
+    results["build_fresh_us"] = time_build(task_types, memoised=False)
+    results["build_memoised_us"] = time_build(task_types, memoised=True)
+    return results
+
+
+@click.command
+@click.option("--count", "-n", default=100_000, help="Requests per task type.")
+@click.option("--task-types", "-t", default=200, help="Task types to build.")
+def main(count: int, task_types: int) -> None:
+    results = run(count, task_types)
+    click.echo(f"Validated {count} requests per task type")
+    for name, value in results.items():
+        unit = "us/task type" if name.endswith("_us") else "requests/s"
+        click.echo(f"  {name}: {value:,.2f} {unit}")
+
+
+if __name__ == "__main__":
+    main()
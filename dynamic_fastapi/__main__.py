@@ -1,25 +1,113 @@
+import asyncio
 import logging
+import os
+import sys
+from tempfile import mkstemp
 
 import click
 import uvicorn
 
-from dynamic_fastapi.app import app
-from dynamic_fastapi.app.config import load_config
+from dynamic_fastapi.app import APP, create_indexes
+from dynamic_fastapi.app.client import create_client
+from dynamic_fastapi.app.config import (
+    TASK_TYPES_SNAPSHOT_ENV, AppConfig, load_config
+)
+from dynamic_fastapi.database.collection import IndexReport
+from dynamic_fastapi.database.indexes import ensure_indexes, index_reports
+from dynamic_fastapi.database.task_types import (
+    TaskTypeCollection, save_snapshot
+)
 
+_log = logging.getLogger(__name__)
 
-@click.command
-@click.option("--config", "-c", type=click.Path(exists=True))
-def main(config: str) -> None:
+
+@click.group(invoke_without_command=True)
+@click.option("--config", "-c", type=click.Path(exists=True), required=True)
+@click.pass_context
+def main(ctx: click.Context, config: str) -> None:
     logging.basicConfig(
         level=logging.DEBUG,
         handlers=[logging.StreamHandler()],
     )
 
-    app_config = load_config(config)
+    ctx.obj = load_config(config)
+
+    # Serve the application if no command is given.
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(serve)
+
+
+@main.command
+@click.pass_obj
+def serve(app_config: AppConfig) -> None:
+    """Serve the application."""
+    if app_config.uvicorn.workers == 1:
+        uvicorn.run(APP, **app_config.uvicorn.dict())
+        return
+
+    # Set up the database and load the task types once, rather than in every
+    # worker.
+    fd, snapshot = mkstemp(prefix="task_types_", suffix=".json")
+    os.close(fd)
+    try:
+        asyncio.run(_prepare_workers(app_config, snapshot))
+        os.environ[TASK_TYPES_SNAPSHOT_ENV] = snapshot
+        uvicorn.run(APP, **app_config.uvicorn.dict())
+    finally:
+        os.environ.pop(TASK_TYPES_SNAPSHOT_ENV, None)
+        os.remove(snapshot)
+
+
+async def _prepare_workers(app_config: AppConfig, snapshot: str) -> None:
+    """Create indexes and snapshot the task types for the workers to share.
+
+    :param app_config: The application config.
+    :param snapshot: The file to save the task types to.
+    """
+    client = create_client(app_config.mongo)
+    try:
+        database = client[app_config.mongo.database]
+        await create_indexes(app_config.mongo, database)
+        task_types_db = TaskTypeCollection(database)
+        task_types = [task_type async for task_type in task_types_db.find()]
+        save_snapshot(snapshot, task_types)
+        if app_config.task_types.snapshot is not None:
+            save_snapshot(app_config.task_types.snapshot, task_types)
+        _log.info("Loaded %s task types for the workers", len(task_types))
+    finally:
+        client.close()
+
+
+@main.command
+@click.option(
+    "--check", is_flag=True, help="Only report on indexes, without creating them."
+)
+@click.pass_obj
+def indexes(app_config: AppConfig, check: bool) -> None:
+    """Create missing indexes and report on index usage."""
+
+    async def _indexes() -> list[IndexReport]:
+        client = create_client(app_config.mongo)
+        try:
+            database = client[app_config.mongo.database]
+            if not check:
+                await ensure_indexes(database)
+            return await index_reports(database)
+        finally:
+            client.close()
+
+    reports = asyncio.run(_indexes())
+    for report in reports:
+        click.echo(f"{report.collection}:")
+        click.echo(f"  missing: {', '.join(report.missing) or '-'}")
+        click.echo(f"  undeclared: {', '.join(report.undeclared) or '-'}")
+        if report.unused is None:
+            click.echo("  unused: unknown")
+        else:
+            click.echo(f"  unused: {', '.join(report.unused) or '-'}")
 
-    uvicorn_config = uvicorn.Config(app, **app_config.uvicorn.dict())
-    uvicorn_server = uvicorn.Server(uvicorn_config)
-    uvicorn_server.run()
+    if any(report.missing for report in reports):
+        sys.exit(1)
 
 
 if __name__ == "__main__":
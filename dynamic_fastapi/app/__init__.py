@@ -1,37 +1,319 @@
 """FastAPI application."""
-from contextlib import asynccontextmanager
+import asyncio
+import os
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, contextmanager, suppress
+from logging import getLogger
+from time import perf_counter
 
 from fastapi import FastAPI
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
 
-from dynamic_fastapi.app.config import get_config
-from dynamic_fastapi.app.windows import generate_routes, windows_api
+from dynamic_fastapi.app.active import ActiveWindowIndex
+from dynamic_fastapi.app.client import create_cache, create_client, warm_up
+from dynamic_fastapi.app.config import (
+    TASK_TYPES_SNAPSHOT_ENV, AppConfig, MongoConfig, get_config
+)
+from dynamic_fastapi.app.events import WindowEvents
+from dynamic_fastapi.app.idempotency import RecentWindows
+from dynamic_fastapi.app.metrics import metrics_api
+from dynamic_fastapi.app.openapi import install_openapi
+from dynamic_fastapi.app.reload import TaskTypeWatcher
+from dynamic_fastapi.app.windows import generate_routes, mount_routes
+from dynamic_fastapi.database.batch import InsertBatcher
+from dynamic_fastapi.database.cache import DocumentCache
+from dynamic_fastapi.database.indexes import ensure_indexes
 from dynamic_fastapi.database.task_types import (
-    TaskTypeCollection, register_types_from_db
+    TaskTypeCollection, read_types_from_db, register_types,
+    register_types_from_snapshot
 )
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.metrics import REGISTRY, PoolMetrics
+from dynamic_fastapi.model.task_type import TaskTypeRegistry
+
+_log = getLogger(__name__)
+
+_LOAD_RETRY_INTERVAL = 5.0
+"""Seconds to wait before loading the open windows again after failing."""
+
+
+async def create_indexes(
+    mongo_config: MongoConfig, database: AsyncIOMotorDatabase
+) -> None:
+    """Create missing indexes, if configured to.
+
+    Failing to create indexes is logged rather than raised, so that the
+    application can still start.
+
+    :param mongo_config: The mongo config.
+    :param database: The database connection.
+    """
+    if not mongo_config.ensure_indexes:
+        return
+
+    try:
+        await ensure_indexes(database)
+    except OperationFailure:
+        _log.exception("Unable to create indexes")
+
+
+@contextmanager
+def _log_duration(step: str) -> Iterator[None]:
+    """Log how long a step of starting the application takes.
+
+    :param step: Description of the step, such as `Loaded task types`.
+    """
+    begin = perf_counter()
+    yield
+    _log.info("%s in %.3fs", step, perf_counter() - begin)
+
+
+async def _register_task_types(
+    mongo_config: MongoConfig,
+    database: AsyncIOMotorDatabase,
+    watcher: TaskTypeWatcher,
+) -> bool:
+    """Register the task types to start with.
+
+    The task types are registered from the snapshot shared by the process
+    starting the workers, if there is one, then from the configured snapshot,
+    then from the database.
+
+    :param mongo_config: The mongo config.
+    :param database: The database connection.
+    :param watcher: The watcher keeping the task types up to date.
+
+    :returns: Whether the task types were loaded from the configured snapshot
+        and still need to be reconciled with the database.
+    """
+    shared = os.environ.get(TASK_TYPES_SNAPSHOT_ENV)
+    if shared is not None:
+        # Workers share the indexes and task types set up once before they
+        # were started.
+        with _log_duration("Registered task types from shared snapshot"):
+            register_types_from_snapshot(shared)
+        return False
+
+    if watcher.load_snapshot():
+        return True
+
+    await create_indexes(mongo_config, database)
+    with _log_duration("Registered task types"):
+        task_types = await read_types_from_db(watcher.task_types_db)
+        register_types(task_types)
+    watcher.save_snapshot(task_types)
+    return False
+
+
+async def _update_task_types(
+    app_config: AppConfig,
+    database: AsyncIOMotorDatabase,
+    watcher: TaskTypeWatcher,
+    reconcile: bool,
+) -> None:
+    """Keep the task types up to date in the background.
+
+    :param app_config: The application config.
+    :param database: The database connection.
+    :param watcher: The watcher keeping the task types up to date.
+    :param reconcile: Whether to first create indexes and reconcile the task
+        types loaded from a snapshot with the database.
+    """
+    if reconcile:
+        try:
+            await create_indexes(app_config.mongo, database)
+        except PyMongoError:
+            _log.exception("Unable to create indexes")
+        with _log_duration("Reconciled task types with the database"):
+            await watcher.reload()
+
+    if app_config.task_types.watch:
+        await watcher.run()
+
+
+async def _load_windows(
+    client: AsyncIOMotorClient,
+    mongo_config: MongoConfig,
+    active_windows: ActiveWindowIndex,
+    windows_db: WindowCollection,
+    validate: bool,
+) -> None:
+    """Open the mongo connections and load the open windows in the background.
+
+    Requests for the open windows are refused until they are loaded, so
+    loading is retried until it succeeds.
+
+    :param client: The mongo client.
+    :param mongo_config: The mongo config.
+    :param active_windows: The index to load the open windows into.
+    :param windows_db: The windows database collection.
+    :param validate: Whether to validate the windows read.
+    """
+    try:
+        await warm_up(client, mongo_config.warmup_connections)
+    except PyMongoError:
+        _log.exception("Unable to open mongo connections")
+
+    while True:
+        try:
+            with _log_duration("Loaded open windows"):
+                await active_windows.load(windows_db, validate=validate)
+            return
+        except PyMongoError:
+            _log.exception(
+                "Unable to load open windows, retrying in %ss", _LOAD_RETRY_INTERVAL
+            )
+            await asyncio.sleep(_LOAD_RETRY_INTERVAL)
+
+
+def _window_events(
+    app_config: AppConfig,
+    windows_db: WindowCollection,
+    active_windows: ActiveWindowIndex,
+    windows_cache: DocumentCache | None,
+) -> WindowEvents:
+    """Create the window change stream, keeping the index and cache current.
+
+    Changes made by other processes are applied to the open windows index
+    and invalidate the cache, which are reloaded if changes are missed.
+
+    :param app_config: The application config.
+    :param windows_db: The windows database collection.
+    :param active_windows: The index of open windows.
+    :param windows_cache: The windows cache, if there is one.
+
+    :returns: The window events, which are not yet running.
+    """
+    validate = not app_config.windows.trusted_reads
+    window_events = WindowEvents(
+        windows_db,
+        queue_size=app_config.events.queue_size,
+        retry_interval=app_config.events.retry_interval,
+        validate=validate,
+    )
+    window_events.listeners.append(active_windows.apply)
+    window_events.resyncs.append(
+        lambda: active_windows.reload(windows_db, validate=validate)
+    )
+    if windows_cache is not None:
+        window_events.listeners.append(
+            lambda change: windows_cache.invalidate(change.window_id)
+        )
+        window_events.resyncs.append(windows_cache.invalidate_all)
+    return window_events
 
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI) -> None:
     """Lifespan function for FastAPI application.
 
-    Handles setup/teardown of the application.
+    Handles setup/teardown of the application. A single mongo client is
+    created for the lifetime of the application and shared by all requests.
 
     :param app: The FastAPI application.
     """
+    begin = perf_counter()
     app_config = get_config()
 
-    client = AsyncIOMotorClient(app_config.mongo.host)
+    REGISTRY.enabled = app_config.metrics.enabled
+    pool_listeners = [PoolMetrics()] if app_config.metrics.enabled else []
+    client = create_client(app_config.mongo, pool_listeners)
     database = client[app_config.mongo.database]
-    task_types_db = TaskTypeCollection(database)
-    await register_types_from_db(task_types_db)
-    client.close()
+    app.state.mongo_client = client
+    app.state.database = database
 
-    generate_routes()
+    cache_backend = create_cache(app_config.cache)
+    windows_cache = None
+    if cache_backend is not None:
+        windows_cache = DocumentCache(
+            cache_backend, WindowCollection.Config.collection_name
+        )
+    app.state.windows_cache = windows_cache
 
-    app.include_router(windows_api)
+    windows_batcher = None
+    if app_config.windows.insert_batch_size > 1:
+        windows_batcher = InsertBatcher(
+            database[WindowCollection.Config.collection_name],
+            max_delay=app_config.windows.insert_batch_delay,
+            max_batch=app_config.windows.insert_batch_size,
+        )
+    app.state.windows_batcher = windows_batcher
+
+    watch_task = events_task = load_task = None
+    app.state.window_events = None
+    try:
+        TaskTypeRegistry.lazy = app_config.task_types.lazy
+        watcher = TaskTypeWatcher(
+            app,
+            TaskTypeCollection(database),
+            app_config.task_types.poll_interval,
+            snapshot=app_config.task_types.snapshot,
+        )
+        reconcile = await _register_task_types(app_config.mongo, database, watcher)
+
+        windows_db = WindowCollection(database)
+        validate = not app_config.windows.trusted_reads
+        active_windows = ActiveWindowIndex()
+        if reconcile:
+            # Started from the snapshot without waiting on mongo, so do not
+            # wait for the open windows either.
+            load_task = asyncio.create_task(
+                _load_windows(
+                    client, app_config.mongo, active_windows, windows_db, validate
+                )
+            )
+        else:
+            await warm_up(client, app_config.mongo.warmup_connections)
+            with _log_duration("Loaded open windows"):
+                await active_windows.load(windows_db, validate=validate)
+        app.state.active_windows = active_windows
+        app.state.recent_windows = RecentWindows(
+            app_config.windows.idempotency_cache_size
+        )
+
+        with _log_duration("Generated routes"):
+            generate_routes()
+            mount_routes(app)
+
+        app.state.openapi_cache.precompute = app_config.openapi.precompute
+        app.state.openapi_cache.refresh()
+
+        if reconcile or app_config.task_types.watch:
+            watch_task = asyncio.create_task(
+                _update_task_types(app_config, database, watcher, reconcile=reconcile)
+            )
+
+        if app_config.events.enabled:
+            window_events = _window_events(
+                app_config, windows_db, active_windows, windows_cache
+            )
+            app.state.window_events = window_events
+            events_task = asyncio.create_task(window_events.run())
+
+        _log.info(
+            "Started with %d task types in %.3fs",
+            len(TaskTypeRegistry.task_types()),
+            perf_counter() - begin,
+        )
+        yield
+    finally:
+        for task in (watch_task, events_task, load_task):
+            if task is not None:
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+
+        if windows_batcher is not None:
+            await windows_batcher.close()
+        if cache_backend is not None:
+            await cache_backend.close()
+        client.close()
 
-    yield
 
+APP = "dynamic_fastapi.app:app"
+"""Import string of the application, for starting uvicorn workers."""
 
 app = FastAPI(lifespan=_lifespan)
+app.include_router(metrics_api)
+install_openapi(app)
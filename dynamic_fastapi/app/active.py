@@ -0,0 +1,370 @@
+"""In-memory index of open windows by time range."""
+from collections.abc import Hashable
+from datetime import datetime, timezone
+from logging import getLogger
+from random import random
+from typing import Generic, TypeVar
+
+from bson.objectid import ObjectId
+
+from dynamic_fastapi.app.events import WindowChange
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.window import Window, WindowFilter, WindowState
+
+_log = getLogger(__name__)
+
+_KT = TypeVar("_KT", bound=Hashable)
+
+
+class _Node:
+    """Node of an interval treap.
+
+    Nodes are ordered by the start of their interval, with ties broken by
+    insertion order, and arranged as a heap on a random priority so the tree
+    stays balanced in expectation. Each node holds the latest stop in its
+    subtree, so subtrees ending before a query range are skipped.
+    """
+
+    __slots__ = ("order", "stop", "key", "priority", "max_stop", "left", "right")
+
+    def __init__(self, start: float, stop: float, seq: int, key: Hashable):
+        self.order = (start, seq)
+        self.stop = stop
+        self.key = key
+        # Balancing does not need a cryptographically secure generator.
+        self.priority = random()  # noqa: S311
+        self.max_stop = stop
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+
+    def update(self) -> None:
+        """Recompute the latest stop in the subtree from the children."""
+        max_stop = self.stop
+        for child in (self.left, self.right):
+            if child is not None and child.max_stop > max_stop:
+                max_stop = child.max_stop
+        self.max_stop = max_stop
+
+
+def _split(
+    node: _Node | None, order: tuple[float, int]
+) -> tuple[_Node | None, _Node | None]:
+    """Split a subtree into the nodes ordered before `order` and the rest.
+
+    :param node: The root of the subtree.
+    :param order: The order to split at.
+
+    :returns: The roots of the two subtrees.
+    """
+    if node is None:
+        return None, None
+    if node.order < order:
+        node.right, rest = _split(node.right, order)
+        node.update()
+        return node, rest
+    before, node.left = _split(node.left, order)
+    node.update()
+    return before, node
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    """Join two subtrees, every node of `left` being ordered before `right`.
+
+    :param left: The root of the earlier subtree.
+    :param right: The root of the later subtree.
+
+    :returns: The root of the joined subtree.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _insert(node: _Node | None, new: _Node) -> _Node:
+    """Insert a node into a subtree.
+
+    :param node: The root of the subtree.
+    :param new: The node to insert.
+
+    :returns: The root of the subtree with the node inserted.
+    """
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.order)
+        new.update()
+        return new
+    if new.order < node.order:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    node.update()
+    return node
+
+
+def _delete(node: _Node | None, order: tuple[float, int]) -> _Node | None:
+    """Delete the node with an order from a subtree.
+
+    :param node: The root of the subtree.
+    :param order: The order of the node to delete.
+
+    :returns: The root of the subtree without the node.
+    """
+    if node is None:
+        return None
+    if node.order == order:
+        return _merge(node.left, node.right)
+    if order < node.order:
+        node.left = _delete(node.left, order)
+    else:
+        node.right = _delete(node.right, order)
+    node.update()
+    return node
+
+
+class IntervalTree(Generic[_KT]):
+    """Index of keyed intervals answering overlap queries.
+
+    Intervals are held in a treap, so adding or removing an interval takes
+    O(log n) expected time and the tree never needs rebuilding. Subtrees
+    starting after or ending before the query range are skipped, so a query
+    finding k intervals takes O((k + 1) log n) expected time.
+    """
+
+    def __init__(self):
+        """Create an empty IntervalTree."""
+        self._nodes: dict[_KT, _Node] = {}
+        self._root: _Node | None = None
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, key: _KT, start: float, stop: float) -> None:
+        """Add an interval, replacing any interval with the same key.
+
+        :param key: The key of the interval.
+        :param start: The start of the interval.
+        :param stop: The end of the interval.
+        """
+        self.remove(key)
+        self._seq += 1
+        node = self._nodes[key] = _Node(start, stop, self._seq, key)
+        self._root = _insert(self._root, node)
+
+    def remove(self, key: _KT) -> None:
+        """Remove an interval if it is present.
+
+        :param key: The key of the interval.
+        """
+        node = self._nodes.pop(key, None)
+        if node is not None:
+            self._root = _delete(self._root, node.order)
+
+    def overlapping(self, start: float, stop: float) -> list[_KT]:
+        """Find the intervals overlapping a range.
+
+        An interval overlaps the range if it starts at or before `stop` and
+        ends after `start`, so a range with `start == stop` finds the
+        intervals containing that point.
+
+        :param start: The start of the range.
+        :param stop: The end of the range.
+
+        :returns: The keys of the overlapping intervals.
+        """
+        keys = []
+        nodes = [self._root]
+        while nodes:
+            node = nodes.pop()
+            if node is None or node.max_stop <= start:
+                continue
+            nodes.append(node.left)
+            # Nodes to the right start no earlier than this one.
+            if node.order[0] <= stop:
+                if node.stop > start:
+                    keys.append(node.key)
+                nodes.append(node.right)
+        return keys
+
+
+def _timestamp(value: datetime) -> float:
+    """Convert a time to a POSIX timestamp, treating naive times as UTC.
+
+    :param value: The time.
+
+    :returns: The timestamp.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _matches(window: Window, window_filter: WindowFilter) -> bool:
+    """Whether a window is selected by a filter.
+
+    :param window: The window.
+    :param window_filter: The window filter.
+
+    :returns: Whether the filter selects the window.
+    """
+    params = window.params
+    if window_filter.task_types and params.task_type not in window_filter.task_types:
+        return False
+    if window_filter.state is not None and (
+        WindowState(window.state) is not window_filter.state
+    ):
+        return False
+    if (
+        window_filter.datasource is not None
+        and window_filter.datasource not in params.datasources
+    ):
+        return False
+
+    time_ranges = (
+        (params.start_time, window_filter.start_after, window_filter.start_before),
+        (params.stop_time, window_filter.stop_after, window_filter.stop_before),
+    )
+    for value, after, before in time_ranges:
+        if after is not None and _timestamp(value) < _timestamp(after):
+            return False
+        if before is not None and _timestamp(value) >= _timestamp(before):
+            return False
+
+    return True
+
+
+class ActiveWindowIndex:
+    """Index of open windows by datasource and time range."""
+
+    def __init__(self):
+        """Create an empty ActiveWindowIndex."""
+        self._windows: dict[ObjectId, Window] = {}
+        self._trees: dict[str, IntervalTree[ObjectId]] = {}
+        self.loaded = False
+        """Whether the open windows have been loaded from the database."""
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def update(self, window: Window) -> None:
+        """Add an open window, or remove a window which is no longer open.
+
+        :param window: The window.
+        """
+        self.remove(window.id)
+        # Defaults are not converted to their values, so accept either form.
+        if WindowState(window.state) is not WindowState.OPEN:
+            return
+
+        params = window.params
+        start, stop = _timestamp(params.start_time), _timestamp(params.stop_time)
+        self._windows[window.id] = window
+        for datasource in params.datasources:
+            self._trees.setdefault(datasource, IntervalTree()).add(
+                window.id, start, stop
+            )
+
+    def apply(self, change: WindowChange) -> None:
+        """Apply a change to a window.
+
+        :param change: The window change.
+        """
+        if change.window is None:
+            self.remove(change.window_id)
+        else:
+            self.update(change.window)
+
+    def remove(self, window_id: ObjectId) -> None:
+        """Remove a window if it is present.
+
+        :param window_id: The ID of the window.
+        """
+        window = self._windows.pop(window_id, None)
+        if window is None:
+            return
+
+        for datasource in window.params.datasources:
+            tree = self._trees[datasource]
+            tree.remove(window_id)
+            if not tree:
+                del self._trees[datasource]
+
+    def overlapping(
+        self, start: datetime, stop: datetime, datasource: str | None = None
+    ) -> list[Window]:
+        """Find the open windows overlapping a time range.
+
+        :param start: The start of the time range.
+        :param stop: The end of the time range. Pass the same time as `start`
+            to find the windows open at that time.
+        :param datasource: The datasource the windows must use, or None to
+            include all datasources.
+
+        :returns: The overlapping windows, ordered by ID.
+        """
+        if datasource is None:
+            trees = self._trees.values()
+        elif datasource in self._trees:
+            trees = [self._trees[datasource]]
+        else:
+            return []
+
+        start_ts, stop_ts = _timestamp(start), _timestamp(stop)
+        window_ids = {
+            window_id
+            for tree in trees
+            for window_id in tree.overlapping(start_ts, stop_ts)
+        }
+        return [self._windows[window_id] for window_id in sorted(window_ids)]
+
+    def matching(self, window_filter: WindowFilter) -> list[ObjectId]:
+        """Find the open windows selected by a filter.
+
+        This checks every open window, so is intended for occasional bulk
+        operations rather than queries.
+
+        :param window_filter: The window filter.
+
+        :returns: The IDs of the matching windows.
+        """
+        return [
+            window_id
+            for window_id, window in self._windows.items()
+            if _matches(window, window_filter)
+        ]
+
+    async def reload(self, windows_db: WindowCollection, validate: bool = True) -> None:
+        """Replace the windows with the open windows in the database.
+
+        The windows are loaded into a new index, so the index stays usable
+        while they are read.
+
+        :param windows_db: The windows database collection.
+        :param validate: Whether to validate the windows read.
+        """
+        index = ActiveWindowIndex()
+        await index.load(windows_db, validate=validate)
+        self._windows, self._trees = index._windows, index._trees
+        self.loaded = True
+
+    async def load(self, windows_db: WindowCollection, validate: bool = True) -> None:
+        """Add every open window in the database.
+
+        :param windows_db: The windows database collection.
+        :param validate: Whether to validate the windows read.
+        """
+        query = {"state": WindowState.OPEN.value}
+        async for window in windows_db.find(query, validate=validate):
+            self.update(window)
+        self.loaded = True
+
+        _log.info("Indexed %d open windows", len(self))
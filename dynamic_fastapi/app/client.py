@@ -0,0 +1,74 @@
+"""Mongo and cache client utilities."""
+import asyncio
+from collections.abc import Sequence
+from logging import getLogger
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.monitoring import ConnectionPoolListener
+
+from dynamic_fastapi.app.config import CacheConfig, MongoConfig
+from dynamic_fastapi.database.cache import (
+    CacheBackend, MemoryCache, RedisCache
+)
+
+_log = getLogger(__name__)
+
+
+def create_client(
+    config: MongoConfig, pool_listeners: Sequence[ConnectionPoolListener] = ()
+) -> AsyncIOMotorClient:
+    """Create a Mongo client using the configured pool settings.
+
+    :param config: The mongo configuration.
+    :param pool_listeners: Listeners for the connection pool events.
+
+    :returns: A new client. The client should be shared for the lifetime of
+        the application and closed on shutdown.
+    """
+    return AsyncIOMotorClient(
+        config.host,
+        maxPoolSize=config.max_pool_size,
+        minPoolSize=config.min_pool_size,
+        maxIdleTimeMS=config.max_idle_time_ms,
+        connectTimeoutMS=config.connect_timeout_ms,
+        serverSelectionTimeoutMS=config.server_selection_timeout_ms,
+        event_listeners=list(pool_listeners),
+    )
+
+
+def create_cache(config: CacheConfig) -> CacheBackend | None:
+    """Create the configured cache backend.
+
+    :param config: The cache configuration.
+
+    :returns: A new cache backend, or None if caching is disabled. The backend
+        should be shared for the lifetime of the application and closed on
+        shutdown.
+
+    :raises ImportError: If the backend's extra is not installed.
+    """
+    if not config.enabled:
+        return None
+    if config.backend == "redis":
+        return RedisCache.from_url(config.redis_url, config.ttl)
+
+    return MemoryCache(config.max_bytes, config.ttl)
+
+
+async def warm_up(client: AsyncIOMotorClient, connections: int) -> None:
+    """Pre-open connections in the client pool.
+
+    Concurrent pings each check out their own connection, so issuing
+    `connections` of them at once leaves that many sockets in the pool.
+
+    :param client: The client to warm up.
+    :param connections: The number of connections to open.
+    """
+    if connections < 1:
+        return
+
+    connections = min(connections, client.options.pool_options.max_pool_size)
+    _log.info("Opening %d mongo connections", connections)
+    await asyncio.gather(
+        *(client.admin.command("ping") for _ in range(connections))
+    )
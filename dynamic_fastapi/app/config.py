@@ -1,10 +1,26 @@
 """Configuration models for the application."""
-from pydantic import BaseModel
+import os
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field, root_validator
 from yaml import safe_load as load_yaml
 
 _app_config: "AppConfig" = None
 """Global application config."""
 
+CONFIG_ENV = "DYNAMIC_FASTAPI_CONFIG"
+"""Environment variable holding the path of the config file.
+
+Set when the config is loaded, so that worker processes started by uvicorn
+load the same config.
+"""
+TASK_TYPES_SNAPSHOT_ENV = "DYNAMIC_FASTAPI_TASK_TYPES_SNAPSHOT"
+"""Environment variable holding the path of a task types snapshot.
+
+Set before starting workers, which register the task types in the snapshot
+instead of each reading them from the database.
+"""
+
 
 class MongoConfig(BaseModel):
     """Configuration for mongo."""
@@ -13,6 +29,20 @@ class MongoConfig(BaseModel):
     """The host string to connect to mongo db."""
     database: str
     """The name of the mongo database."""
+    max_pool_size: int = 100
+    """The maximum number of connections held open by the client."""
+    min_pool_size: int = 0
+    """The minimum number of connections the client keeps open."""
+    max_idle_time_ms: int | None = None
+    """Time a connection may stay idle in the pool before being closed."""
+    connect_timeout_ms: int = 20000
+    """Time allowed for establishing a new connection."""
+    server_selection_timeout_ms: int = 30000
+    """Time allowed for finding a suitable server for an operation."""
+    warmup_connections: int = 0
+    """Number of connections to open when the application starts."""
+    ensure_indexes: bool = True
+    """Whether to create missing indexes when the application starts."""
 
 
 class UvicornConfig(BaseModel):
@@ -22,6 +52,85 @@ class UvicornConfig(BaseModel):
     """The port to serve."""
     log_level: str
     """The level of logs to allow."""
+    workers: int = Field(1, ge=1)
+    """The number of worker processes serving the application.
+
+    More than one requires `events.enabled`.
+    """
+
+
+class WindowsConfig(BaseModel):
+    """Configuration for the windows API."""
+
+    bulk_batch_size: int = 1000
+    """The number of windows written per insert during bulk creation."""
+    bulk_max_items: int = 10000
+    """The largest number of windows accepted by a bulk create request."""
+    trusted_reads: bool = False
+    """Whether to skip validating windows read from the database."""
+    validate_sample_rate: float = Field(0.01, ge=0.0, le=1.0)
+    """The fraction of trusted reads which are validated anyway."""
+    idempotency_cache_size: int = Field(10000, ge=0)
+    """The number of IDs of windows created with idempotency keys held in memory."""
+    insert_batch_size: int = Field(1, ge=1)
+    """The most concurrent window inserts written together. 1 disables batching."""
+    insert_batch_delay: float = Field(0.002, ge=0.0)
+    """Seconds a batched window insert waits for others to join it."""
+
+
+class EventsConfig(BaseModel):
+    """Configuration for the window events stream."""
+
+    enabled: bool = False
+    """Whether to watch for window changes. Requires mongo change streams."""
+    queue_size: int = 1000
+    """The number of events buffered per subscriber before it is dropped."""
+    keepalive: float = 15.0
+    """Seconds without events before a keepalive comment is sent."""
+    retry_interval: float = 30.0
+    """Seconds to wait before reopening a failed change stream."""
+
+
+class CacheConfig(BaseModel):
+    """Configuration for caching window reads."""
+
+    enabled: bool = False
+    """Whether to cache window lookups and pages."""
+    backend: Literal["memory", "redis"] = "memory"
+    """Where to hold the cache. The redis backend requires the redis extra."""
+    max_bytes: int = 64 * 1024 * 1024
+    """The largest size of the memory cache."""
+    ttl: float = 30.0
+    """Seconds until a cached value expires."""
+    redis_url: str = "redis://localhost:6379/0"
+    """The Redis server for the redis backend."""
+
+
+class TaskTypesConfig(BaseModel):
+    """Configuration for loading task types."""
+
+    watch: bool = False
+    """Whether to pick up task type changes without restarting."""
+    poll_interval: float = 30.0
+    """Seconds between reloads when change streams are unavailable."""
+    lazy: bool = False
+    """Whether to build each task type's models on first use instead of at startup."""
+    snapshot: str | None = None
+    """File to start from, and keep up to date with the task types in mongo."""
+
+
+class OpenAPIConfig(BaseModel):
+    """Configuration for the OpenAPI schema."""
+
+    precompute: bool = True
+    """Whether to build the schema in the background when routes change."""
+
+
+class MetricsConfig(BaseModel):
+    """Configuration for application metrics."""
+
+    enabled: bool = False
+    """Whether to record metrics and serve them at `/metrics`."""
 
 
 class AppConfig(BaseModel):
@@ -29,20 +138,53 @@ class AppConfig(BaseModel):
 
     uvicorn: UvicornConfig
     mongo: MongoConfig
+    windows: WindowsConfig = Field(default_factory=WindowsConfig)
+    events: EventsConfig = Field(default_factory=EventsConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    task_types: TaskTypesConfig = Field(default_factory=TaskTypesConfig)
+    openapi: OpenAPIConfig = Field(default_factory=OpenAPIConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+
+    @root_validator(skip_on_failure=True)
+    def validate_workers(cls, values: dict[str, Any]) -> dict[str, Any]:  # noqa: N805
+        """Validate that multiple workers can keep their state up to date.
+
+        Each worker holds its own index of active windows, which only learns of
+        windows written by other workers from the events stream.
+
+        :param values: The provided config values.
+
+        :returns: The config values.
+
+        :raises ValueError: If there are multiple workers without events.
+        """
+        if values["uvicorn"].workers > 1 and not values["events"].enabled:
+            raise ValueError("Multiple uvicorn workers require events.enabled")
+        return values
 
 
 def get_config() -> AppConfig:
-    """The global application configuration."""
+    """The global application configuration.
+
+    Processes which have not loaded the config, such as uvicorn workers, load
+    the config file named by the environment.
+    """
+    if _app_config is None and CONFIG_ENV in os.environ:
+        return load_config(os.environ[CONFIG_ENV])
     return _app_config
 
 
 def load_config(config_file: str) -> AppConfig:
     """Set the global application configuration from the config file.
 
+    The path of the config file is also set in the environment, so that
+    processes started from this one load the same config.
+
     :param config_file: The config file for the application.
     """
     global _app_config
     with open(config_file) as fp:
         _app_config = AppConfig.parse_obj(load_yaml(fp))
 
+    os.environ[CONFIG_ENV] = os.path.abspath(config_file)
     return _app_config
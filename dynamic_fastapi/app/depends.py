@@ -1,37 +1,112 @@
 from typing import Annotated
 
-from fastapi import Depends
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from fastapi import Depends, HTTPException, Request, status
+from motor.motor_asyncio import AsyncIOMotorDatabase
 
-from dynamic_fastapi.app.config import get_config
+from dynamic_fastapi.app.active import ActiveWindowIndex
+from dynamic_fastapi.app.config import AppConfig, get_config
+from dynamic_fastapi.app.events import WindowEvents
+from dynamic_fastapi.app.idempotency import RecentWindows
 from dynamic_fastapi.database.windows import WindowCollection
 
 
-def _database() -> AsyncIOMotorDatabase:
+def _app_config() -> AppConfig:
+    """Provide the application configuration.
+
+    :returns: The application configuration.
+    """
+    return get_config()
+
+
+AppConfigDep = Annotated[AppConfig, Depends(_app_config)]
+"""Application configuration dependency."""
+
+
+def _database(request: Request) -> AsyncIOMotorDatabase:
     """Provide a connection to the database.
 
-    :yields: A connection to the database.
+    The database is backed by the client created when the application
+    started, so requests share its connection pool.
+
+    :param request: The current request.
+
+    :returns: A connection to the database.
     """
-    app_config = get_config()
-    client = AsyncIOMotorClient(app_config.mongo.host)
-    db = client[app_config.mongo.database]
-    yield db
-    client.close()
+    return request.app.state.database
 
 
 DatabaseDep = Annotated[AsyncIOMotorDatabase, Depends(_database)]
 """Database connection dependency."""
 
 
-def _windows_collection(db: DatabaseDep) -> WindowCollection:
+def _windows_collection(
+    request: Request, db: DatabaseDep, app_config: AppConfigDep
+) -> WindowCollection:
     """Provide a windows collection interface.
 
+    :param request: The current request.
     :param db: The database connection.
+    :param app_config: The application configuration.
 
     :yields: A windows collection instance.
     """
-    yield WindowCollection(db)
+    yield WindowCollection(
+        db,
+        validate_sample_rate=app_config.windows.validate_sample_rate,
+        cache=getattr(request.app.state, "windows_cache", None),
+        batcher=getattr(request.app.state, "windows_batcher", None),
+    )
 
 
 WindowsDBDep = Annotated[WindowCollection, Depends(_windows_collection)]
 """Windows database collection dependency."""
+
+
+def _active_windows(request: Request) -> ActiveWindowIndex:
+    """Provide the index of open windows.
+
+    :param request: The current request.
+
+    :returns: The index of open windows.
+    """
+    return request.app.state.active_windows
+
+
+ActiveWindowsDep = Annotated[ActiveWindowIndex, Depends(_active_windows)]
+"""Open windows index dependency."""
+
+
+def _recent_windows(request: Request) -> RecentWindows:
+    """Provide the windows recently created with an idempotency key.
+
+    :param request: The current request.
+
+    :returns: The recent windows.
+    """
+    return request.app.state.recent_windows
+
+
+RecentWindowsDep = Annotated[RecentWindows, Depends(_recent_windows)]
+"""Recently created windows dependency."""
+
+
+def _window_events(request: Request) -> WindowEvents:
+    """Provide the shared window change stream.
+
+    :param request: The current request.
+
+    :returns: The window events.
+
+    :raises HTTPException: If window events are disabled.
+    """
+    window_events = getattr(request.app.state, "window_events", None)
+    if window_events is None:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE, "Window events are disabled"
+        )
+
+    return window_events
+
+
+WindowEventsDep = Annotated[WindowEvents, Depends(_window_events)]
+"""Window events dependency."""
@@ -0,0 +1,256 @@
+"""Window change events for dynamic_fastapi."""
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Mapping
+from inspect import isawaitable
+from logging import getLogger
+from typing import Any, NamedTuple
+
+from bson.objectid import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import OperationFailure, PyMongoError
+
+from dynamic_fastapi.app.responses import dumps
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.window import Window
+
+_log = getLogger(__name__)
+
+_RESUME_FAILED_CODES = frozenset({260, 280, 286})
+"""Server error codes for change streams which cannot resume after their last
+change, e.g. because it is no longer in the oplog."""
+
+
+def _resume_failed(err: PyMongoError) -> bool:
+    """Whether an error means the change stream cannot be resumed.
+
+    :param err: The error raised while watching.
+    """
+    return isinstance(err, OperationFailure) and err.code in _RESUME_FAILED_CODES
+
+
+class WindowChange(NamedTuple):
+    """A change to a window."""
+
+    operation: str
+    """The change stream operation type, e.g. `insert` or `update`."""
+    window_id: ObjectId
+    """The ID of the changed window."""
+    window: Window | None
+    """The window after the change, or None if it was deleted."""
+
+
+class _Subscriber:
+    """An event stream subscriber with a bounded buffer."""
+
+    def __init__(self, task_types: frozenset[str], queue_size: int):
+        self.task_types = task_types
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(queue_size)
+
+    def wants(self, task_type: str | None) -> bool:
+        if task_type is None or not self.task_types:
+            return True
+        return task_type in self.task_types
+
+
+class WindowEvents:
+    """Shared window change stream fanned out to subscribers.
+
+    A single change stream on the windows collection is decoded and encoded
+    once per change, then offered to every subscriber interested in the task
+    type. Each subscriber has a bounded buffer, and a subscriber whose buffer
+    is full is dropped rather than holding up the others.
+
+    If the change stream cannot be resumed after the last change seen, it is
+    reopened from the current time and the resync functions are called, as
+    the changes in between are lost.
+    """
+
+    def __init__(
+        self,
+        windows_db: WindowCollection,
+        queue_size: int = 1000,
+        retry_interval: float = 30.0,
+        validate: bool = True,
+    ):
+        """Create a WindowEvents.
+
+        :param windows_db: The windows collection.
+        :param queue_size: The number of events buffered per subscriber.
+        :param retry_interval: Seconds to wait before reopening the change
+            stream after it fails.
+        :param validate: Whether to validate changed windows.
+        """
+        self.windows_db = windows_db
+        self.queue_size = queue_size
+        self.retry_interval = retry_interval
+        self.validate = validate
+        self.listeners: list[Callable[[WindowChange], Awaitable[None] | None]] = []
+        """Functions called with every change, e.g. to update indexes. Any
+        awaitable they return is awaited before the change is published."""
+        self.resyncs: list[Callable[[], Awaitable[None] | None]] = []
+        """Functions called when changes may have been missed, e.g. to reload
+        indexes. They are called once the change stream is reopened, so that
+        changes made while they run are not missed too."""
+        self._subscribers: set[_Subscriber] = set()
+        self._resume_token: Mapping[str, Any] | None = None
+        self._resync = False
+
+    @property
+    def subscriber_count(self) -> int:
+        """The number of current subscribers."""
+        return len(self._subscribers)
+
+    async def run(self) -> None:
+        """Watch for window changes until cancelled.
+
+        The change stream is reopened after failures, resuming after the last
+        change seen if it can.
+        """
+        while True:
+            try:
+                await self._watch()
+            except PyMongoError as err:
+                if _resume_failed(err):
+                    self._restart()
+                _log.warning(
+                    "Unable to watch windows, retrying in %ss: %s",
+                    self.retry_interval,
+                    err,
+                )
+            except Exception:
+                # The change being published may not have reached every
+                # listener, so start over rather than ending the task.
+                self._restart()
+                _log.exception(
+                    "Unable to publish window changes, retrying in %ss",
+                    self.retry_interval,
+                )
+            await asyncio.sleep(self.retry_interval)
+
+    async def subscribe(
+        self, task_types: frozenset[str] = frozenset(), keepalive: float = 15.0
+    ) -> AsyncIterator[bytes]:
+        """Subscribe to window changes as server-sent events.
+
+        :param task_types: The task types to receive changes for, or empty
+            for all task types.
+        :param keepalive: Seconds without changes before a comment is sent to
+            keep the connection open.
+
+        :yields: Encoded server-sent events. The stream ends if the subscriber
+            falls too far behind.
+        """
+        subscriber = _Subscriber(task_types, self.queue_size)
+        self._subscribers.add(subscriber)
+        try:
+            yield b": connected\n\n"
+            while True:
+                get = subscriber.queue.get()
+                try:
+                    message = await asyncio.wait_for(get, keepalive)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+
+                if message is None:
+                    yield b"event: dropped\ndata: {}\n\n"
+                    return
+                yield message
+        finally:
+            self._subscribers.discard(subscriber)
+
+    async def publish(self, change: WindowChange) -> None:
+        """Send a change to the listeners and subscribers.
+
+        :param change: The window change.
+        """
+        for listener in self.listeners:
+            result = listener(change)
+            if isawaitable(result):
+                await result
+
+        if not self._subscribers:
+            return
+
+        if change.window is None:
+            task_type, data = None, dumps({"_id": change.window_id})
+        else:
+            task_type, data = change.window.params.task_type, dumps(change.window)
+        message = b"event: %s\ndata: %s\n\n" % (change.operation.encode(), data)
+
+        for subscriber in list(self._subscribers):
+            if not subscriber.wants(task_type):
+                continue
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: _Subscriber) -> None:
+        """Drop a subscriber which is not keeping up.
+
+        :param subscriber: The subscriber.
+        """
+        _log.warning("Dropping window events subscriber which fell behind")
+        self._subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def _restart(self) -> None:
+        """Reopen the change stream from the current time, and resync."""
+        self._resume_token = None
+        self._resync = True
+
+    async def _watch(self) -> None:
+        """Publish changes from a change stream on the windows collection."""
+        async with self.windows_db.collection.watch(
+            full_document="updateLookup", resume_after=self._resume_token
+        ) as stream:
+            _log.info("Watching window changes")
+            if self._resync:
+                _log.info("Resyncing after missed window changes")
+                for resync in self.resyncs:
+                    result = resync()
+                    if isawaitable(result):
+                        await result
+                self._resync = False
+
+            async for event in stream:
+                if event["operationType"] == "invalidate":
+                    # The stream ends, and cannot be resumed after this event.
+                    _log.warning("Window change stream invalidated")
+                    self._restart()
+                    return
+
+                self._resume_token = event["_id"]
+                change = self._change(event)
+                if change is not None:
+                    await self.publish(change)
+
+    def _change(self, event: Mapping[str, Any]) -> WindowChange | None:
+        """Convert a change stream event to a window change.
+
+        :param event: The change stream event.
+
+        :returns: The window change, or None if the event does not describe a
+            change to a window.
+        """
+        operation = event["operationType"]
+        if operation == "delete":
+            return WindowChange(operation, event["documentKey"]["_id"], None)
+        if operation not in ("insert", "update", "replace"):
+            return None
+
+        # The window may have been deleted before an update was looked up.
+        doc = event.get("fullDocument")
+        if doc is None:
+            return None
+
+        try:
+            window = self.windows_db.from_doc(doc, validate=self.validate)
+        except (KeyError, ValidationError):
+            _log.warning("Ignoring change to unreadable window %s", doc.get("_id"))
+            return None
+
+        return WindowChange(operation, window.id, window)
@@ -0,0 +1,61 @@
+"""Recently created windows by idempotency key."""
+from collections import OrderedDict
+
+from bson.objectid import ObjectId
+
+from dynamic_fastapi import metrics
+from dynamic_fastapi.model.window import Window
+
+
+class RecentWindows:
+    """Windows recently created with an idempotency key, by task type and key.
+
+    Clients retry creates soon after the original request, so holding the IDs
+    of the most recently created windows answers most retries without trying
+    to insert the window again. Only the IDs are held, since windows change
+    after they are created, so retries read the current window by ID. The
+    least recently used windows are evicted beyond `max_size`. Windows are
+    only held by this process; the unique index on the task type and key is
+    what prevents duplicate windows.
+    """
+
+    def __init__(self, max_size: int):
+        """Create an empty RecentWindows.
+
+        :param max_size: The most windows to hold. Nothing is held if zero.
+        """
+        self.max_size = max_size
+        self._windows: OrderedDict[tuple[str, str], ObjectId] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def get(self, task_type: str, key: str) -> ObjectId | None:
+        """Find the ID of the window of a task type created with a key.
+
+        :param task_type: The name of the task type.
+        :param key: The idempotency key.
+
+        :returns: The ID of the window, or None if it is not held.
+        """
+        window_id = self._windows.get((task_type, key))
+        metrics.CACHE_REQUESTS.inc(
+            "idempotency", "miss" if window_id is None else "hit"
+        )
+        if window_id is not None:
+            self._windows.move_to_end((task_type, key))
+        return window_id
+
+    def add(self, window: Window) -> None:
+        """Hold a window created with an idempotency key.
+
+        :param window: The window. Windows without a key are ignored.
+        """
+        if window.idempotency_key is None or self.max_size < 1:
+            return
+
+        key = (window.params.task_type, window.idempotency_key)
+        self._windows[key] = window.id
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_size:
+            self._windows.popitem(last=False)
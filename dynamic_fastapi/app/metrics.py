@@ -0,0 +1,117 @@
+"""Request metrics for dynamic_fastapi."""
+import asyncio
+from collections.abc import Callable, Coroutine
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+
+from dynamic_fastapi.app.depends import AppConfigDep
+from dynamic_fastapi.metrics import (
+    CONTENT_TYPE, REGISTRY, REQUEST_DURATION, STAGE_DURATION,
+    VALIDATION_FAILURES, current_route, current_task_type
+)
+
+metrics_api = APIRouter()
+
+_request_begin: ContextVar[float | None] = ContextVar("request_begin", default=None)
+
+
+def _observe_validated() -> None:
+    """Record the time from the start of the request as the validate stage."""
+    begin = _request_begin.get()
+    if REGISTRY.enabled and begin is not None:
+        STAGE_DURATION.observe(
+            perf_counter() - begin,
+            "validate",
+            current_route.get(),
+            current_task_type.get(),
+        )
+
+
+class TimedRoute(APIRoute):
+    """Route recording request metrics.
+
+    Requests are timed as a whole, and the time until the endpoint is called,
+    spent parsing and validating the request, is recorded as the `validate`
+    stage. Endpoints marked with `__validates__`, which validate their input
+    themselves, time the stage instead. Stages timed while handling the
+    request are labelled with the route and the task type of its endpoint.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        call = self.dependant.call
+        # The handler may be built more than once, so only wrap the call once.
+        if asyncio.iscoroutinefunction(call) and not hasattr(call, "__timed__"):
+
+            @wraps(call)
+            async def _timed_call(**kwargs):
+                if not getattr(self.endpoint, "__validates__", False):
+                    _observe_validated()
+                return await call(**kwargs)
+
+            _timed_call.__timed__ = True
+            self.dependant.call = _timed_call
+
+        handler = super().get_route_handler()
+
+        async def _handler(request: Request) -> Response:
+            if not REGISTRY.enabled:
+                return await handler(request)
+
+            # Endpoints are marked with their task type after being routed.
+            task_type = getattr(self.endpoint, "__task_type__", "")
+            tokens = (
+                current_route.set(self.path),
+                current_task_type.set(task_type),
+                _request_begin.set(perf_counter()),
+            )
+            status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+            try:
+                response = await handler(request)
+                status_code = response.status_code
+                return response
+            except HTTPException as err:
+                status_code = err.status_code
+                raise
+            except RequestValidationError:
+                status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+                # Endpoints may set the task type once they know it.
+                VALIDATION_FAILURES.inc("request", current_task_type.get())
+                raise
+            finally:
+                REQUEST_DURATION.observe(
+                    perf_counter() - _request_begin.get(),
+                    self.path,
+                    request.method,
+                    str(status_code),
+                )
+                for var, token in zip(
+                    (current_route, current_task_type, _request_begin),
+                    tokens,
+                    strict=True,
+                ):
+                    var.reset(token)
+
+        return _handler
+
+
+@metrics_api.get("/metrics", include_in_schema=False)
+async def metrics(app_config: AppConfigDep) -> Response:
+    """Return the application metrics in the Prometheus text format.
+    \f
+    :param app_config: The application configuration.
+
+    :returns: The metrics.
+
+    :raises HTTPException: If metrics are disabled.
+    """
+    if not app_config.metrics.enabled:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Metrics are disabled")
+
+    return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
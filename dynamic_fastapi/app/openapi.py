@@ -0,0 +1,185 @@
+"""Cached OpenAPI schema for dynamic_fastapi."""
+import asyncio
+import json
+from collections.abc import Sequence
+from hashlib import sha1
+from logging import getLogger
+from threading import Lock
+from typing import Any
+
+from fastapi import FastAPI, Request, Response, status
+from fastapi.openapi.utils import get_openapi
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import BaseRoute, Route
+
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
+
+_log = getLogger(__name__)
+
+
+class OpenAPICache:
+    """OpenAPI schema cache.
+
+    The schema is built once per version of the task type registry and set of
+    application routes. The schema for the routes of each task type is cached
+    separately, so that when task types change only the changed task types and
+    the routes shared by all task types need to be regenerated.
+    """
+
+    def __init__(self, app: FastAPI):
+        """Create an OpenAPICache.
+
+        :param app: The application to build the schema for.
+        """
+        self.app = app
+        self._lock = Lock()
+        self._version: tuple[int, list[BaseRoute]] | None = None
+        self._fragments: dict[str, tuple[TaskType, dict[str, Any]]] = {}
+        self._schema: dict[str, Any] | None = None
+        self._body = b""
+        self._etag = ""
+        self._refresh_task: asyncio.Task | None = None
+        self.precompute = False
+        """Whether `refresh` builds the schema ahead of the first request."""
+
+    def openapi(self) -> dict[str, Any]:
+        """The OpenAPI schema for the application."""
+        self._ensure_current()
+        return self._schema
+
+    def response(self) -> tuple[bytes, str]:
+        """The encoded OpenAPI schema.
+
+        :returns: The JSON encoded schema and its ETag.
+        """
+        self._ensure_current()
+        return self._body, self._etag
+
+    def is_current(self) -> bool:
+        """Whether the cached schema matches the application routes."""
+        if self._version is None:
+            return False
+
+        registry_version, routes = self._current_version()
+        return self._version[0] == registry_version and self._version[1] is routes
+
+    def refresh(self) -> None:
+        """Build the schema in the background if it is out of date.
+
+        Does nothing unless `precompute` is set.
+        """
+        if not self.precompute or self.is_current():
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        self._refresh_task = asyncio.create_task(run_in_threadpool(self.openapi))
+
+    def _current_version(self) -> tuple[int, list[BaseRoute]]:
+        # The application's route list is replaced whenever the windows routes
+        # are regenerated, so its identity changes along with the routes.
+        return TaskTypeRegistry.version(), self.app.router.routes
+
+    def _ensure_current(self) -> None:
+        with self._lock:
+            if not self.is_current():
+                self._build()
+
+    def _build(self) -> None:
+        version = self._current_version()
+        _log.info("Building OpenAPI schema for registry version %d", version[0])
+
+        shared_routes = []
+        task_type_routes: dict[str, list[BaseRoute]] = {}
+        for route in version[1]:
+            endpoint = getattr(route, "endpoint", None)
+            task_type = getattr(endpoint, "__task_type__", None)
+            if task_type is None:
+                shared_routes.append(route)
+            else:
+                task_type_routes.setdefault(task_type, []).append(route)
+
+        schema = self._generate(shared_routes)
+        fragments = {}
+        for name, routes in task_type_routes.items():
+            task_type = TaskTypeRegistry.task_type(name)
+            fragment = self._fragments.get(name)
+            if fragment is None or fragment[0] != task_type:
+                fragment = (task_type, self._generate(routes))
+            fragments[name] = fragment
+            _merge(schema, fragment[1])
+
+        body = json.dumps(schema).encode()
+        self._fragments = fragments
+        self._schema = schema
+        self._body = body
+        self._etag = f'"{sha1(body).hexdigest()}"'  # noqa: S324
+        self._version = version
+
+    def _generate(self, routes: Sequence[BaseRoute]) -> dict[str, Any]:
+        return get_openapi(
+            title=self.app.title,
+            version=self.app.version,
+            openapi_version=self.app.openapi_version,
+            description=self.app.description,
+            terms_of_service=self.app.terms_of_service,
+            contact=self.app.contact,
+            license_info=self.app.license_info,
+            routes=routes,
+            tags=self.app.openapi_tags,
+            servers=self.app.servers,
+        )
+
+
+def _merge(schema: dict[str, Any], fragment: dict[str, Any]) -> None:
+    """Merge the paths and components of a schema fragment into a schema.
+
+    :param schema: The schema to update.
+    :param fragment: The schema fragment.
+    """
+    paths = schema.setdefault("paths", {})
+    for path, operations in fragment.get("paths", {}).items():
+        paths[path] = {**paths.get(path, {}), **operations}
+
+    for section, values in fragment.get("components", {}).items():
+        components = schema.setdefault("components", {})
+        components[section] = {**components.get(section, {}), **values}
+
+
+def install_openapi(app: FastAPI) -> OpenAPICache:
+    """Serve the application's OpenAPI schema from a cache.
+
+    The schema is served with an ETag, and requests with a matching
+    `If-None-Match` header receive a `304 Not Modified` response.
+
+    :param app: The application.
+
+    :returns: The schema cache, which is also stored as
+        `app.state.openapi_cache`.
+    """
+    cache = OpenAPICache(app)
+    app.state.openapi_cache = cache
+    app.openapi = cache.openapi
+
+    async def openapi(request: Request) -> Response:
+        if cache.is_current():
+            body, etag = cache.response()
+        else:
+            # Building the schema is slow, so keep it off the event loop.
+            body, etag = await run_in_threadpool(cache.response)
+
+        headers = {"ETag": etag}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        return Response(body, media_type="application/json", headers=headers)
+
+    if app.openapi_url:
+        app.router.routes = [
+            Route(app.openapi_url, openapi, include_in_schema=False)
+            if getattr(route, "path", None) == app.openapi_url
+            else route
+            for route in app.router.routes
+        ]
+
+    return cache
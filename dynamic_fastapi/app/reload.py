@@ -0,0 +1,180 @@
+"""Reloading task types while the application is running."""
+import asyncio
+from collections.abc import Iterable
+from logging import getLogger
+
+from fastapi import FastAPI
+from pydantic import ValidationError
+from pymongo.errors import OperationFailure, PyMongoError
+
+from dynamic_fastapi.app.windows import generate_routes, mount_routes
+from dynamic_fastapi.database.task_types import (
+    TaskTypeCollection, load_snapshot, read_types_from_db, register_types,
+    save_snapshot, snapshot_version
+)
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
+
+_log = getLogger(__name__)
+
+_UNSUPPORTED_CODES = frozenset({40324, 40573})
+"""Server error codes for change streams not being supported, e.g. by a
+standalone server."""
+
+_INITIAL_RETRY_DELAY = 1.0
+"""Seconds to wait before reopening a failed change stream the first time."""
+
+
+def _unsupported(err: PyMongoError) -> bool:
+    """Whether an error means change streams are not supported.
+
+    :param err: The error raised while watching.
+    """
+    return isinstance(err, OperationFailure) and err.code in _UNSUPPORTED_CODES
+
+
+class TaskTypeWatcher:
+    """Watch the task types collection and apply changes to the application.
+
+    Changes are picked up from a change stream on the task types collection,
+    which is reopened if it fails. If change streams are not supported (e.g.
+    mongo is not running as a replica set), the collection is polled instead.
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        task_types_db: TaskTypeCollection,
+        poll_interval: float,
+        snapshot: str | None = None,
+    ):
+        """Create a TaskTypeWatcher.
+
+        :param app: The application to update.
+        :param task_types_db: The task types collection.
+        :param poll_interval: Seconds between reloads when polling.
+        :param snapshot: The file to keep a snapshot of the task types in.
+        """
+        self.app = app
+        self.task_types_db = task_types_db
+        self.poll_interval = poll_interval
+        self.snapshot = snapshot
+        self._snapshot_version: str | None = None
+        self._retry_delay = _INITIAL_RETRY_DELAY
+
+    async def run(self) -> None:
+        """Watch for task type changes until cancelled.
+
+        After each consecutive failure, the change stream is reopened after
+        twice as long as the last time, up to `poll_interval`.
+        """
+        self._retry_delay = _INITIAL_RETRY_DELAY
+        while True:
+            try:
+                await self._watch()
+            except PyMongoError as err:
+                if _unsupported(err):
+                    _log.warning(
+                        "Unable to watch task types, polling every %ss instead: %s",
+                        self.poll_interval,
+                        err,
+                    )
+                    break
+                _log.warning(
+                    "Unable to watch task types, retrying in %ss: %s",
+                    self._retry_delay,
+                    err,
+                )
+
+            await asyncio.sleep(self._retry_delay)
+            self._retry_delay = min(self._retry_delay * 2, self.poll_interval)
+
+        await self._poll()
+
+    async def reload(self) -> bool:
+        """Reload the task types and regenerate routes if any changed.
+
+        Task types removed from the database stay registered, so that their
+        windows can still be read, but are removed from the snapshot.
+
+        :returns: Whether any task type was added or changed.
+        """
+        try:
+            task_types = await read_types_from_db(self.task_types_db)
+        except (PyMongoError, ValidationError):
+            _log.exception("Unable to reload task types")
+            return False
+
+        changed = register_types(task_types)
+        if changed:
+            _log.info("Task types changed, regenerating routes")
+            generate_routes()
+            mount_routes(self.app)
+            self.app.state.openapi_cache.refresh()
+
+        self.save_snapshot(task_types)
+        return changed
+
+    def load_snapshot(self) -> bool:
+        """Register the task types in the snapshot.
+
+        :returns: Whether the snapshot was loaded. A missing or invalid
+            snapshot is logged and otherwise ignored.
+        """
+        if self.snapshot is None:
+            return False
+
+        try:
+            snapshot = load_snapshot(self.snapshot)
+        except FileNotFoundError:
+            _log.info("No task type snapshot at %s", self.snapshot)
+            return False
+        except (OSError, ValueError):
+            _log.exception("Unable to load task type snapshot")
+            return False
+
+        for task_type in snapshot.task_types:
+            TaskTypeRegistry.register(task_type)
+        self._snapshot_version = snapshot.version
+        _log.info(
+            "Loaded %d task types from snapshot version %s",
+            len(snapshot.task_types),
+            snapshot.version,
+        )
+        return True
+
+    def save_snapshot(self, task_types: Iterable[TaskType]) -> None:
+        """Save the task types in the database to the snapshot, if they changed.
+
+        Failing to save the snapshot is logged rather than raised.
+
+        :param task_types: The task types read from the database.
+        """
+        if self.snapshot is None:
+            return
+
+        task_types = list(task_types)
+        if snapshot_version(task_types) == self._snapshot_version:
+            return
+
+        try:
+            self._snapshot_version = save_snapshot(self.snapshot, task_types)
+        except OSError:
+            _log.exception("Unable to save task type snapshot")
+            return
+
+        _log.info("Saved task type snapshot version %s", self._snapshot_version)
+
+    async def _watch(self) -> None:
+        """Reload task types whenever the collection changes."""
+        async with self.task_types_db.collection.watch() as stream:
+            self._retry_delay = _INITIAL_RETRY_DELAY
+            # Pick up anything changed between startup and opening the stream.
+            await self.reload()
+            async for _ in stream:
+                await self.reload()
+
+    async def _poll(self) -> None:
+        """Reload task types periodically."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self.reload()
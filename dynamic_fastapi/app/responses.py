@@ -0,0 +1,94 @@
+"""Response classes for dynamic_fastapi."""
+from collections.abc import Mapping
+from enum import Enum
+from typing import Any
+
+import orjson
+from bson.objectid import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from dynamic_fastapi import metrics
+
+
+def _default(value: Any, exclude_unset: bool = False) -> Any:
+    """Convert values orjson cannot serialise natively.
+
+    :param value: The value to convert.
+    :param exclude_unset: Whether to omit model fields which were not set.
+
+    :returns: A value orjson can serialise.
+
+    :raises TypeError: If the value cannot be converted.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.dict(by_alias=True, exclude_unset=exclude_unset)
+    if isinstance(value, Enum):
+        return value.value
+
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _default_exclude_unset(value: Any) -> Any:
+    return _default(value, exclude_unset=True)
+
+
+def dumps(content: Any, exclude_unset: bool = False) -> bytes:
+    """Serialise content to JSON.
+
+    Models are converted with `dict(by_alias=True)`, matching the output of
+    `jsonable_encoder`. Datetimes, ObjectIds and enums are handled without
+    a separate encoding pass.
+
+    :param content: The content to serialise.
+    :param exclude_unset: Whether to omit model fields which were not set,
+        such as those left out of a projection.
+
+    :returns: The JSON encoded content.
+    """
+    return orjson.dumps(
+        content, default=_default_exclude_unset if exclude_unset else _default
+    )
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Content may be (or contain) already validated models, which are
+    serialised directly rather than walked by `jsonable_encoder`.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+        background: BackgroundTask | None = None,
+        exclude_unset: bool = False,
+    ):
+        """Create an ORJSONResponse.
+
+        :param content: The response content.
+        :param status_code: The response status code.
+        :param headers: The response headers.
+        :param media_type: The response media type.
+        :param background: A task to run after the response is sent.
+        :param exclude_unset: Whether to omit model fields which were not set.
+        """
+        # The content is rendered during initialisation.
+        self.exclude_unset = exclude_unset
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        """Render the content.
+
+        :param content: The response content.
+
+        :returns: The JSON encoded content.
+        """
+        with metrics.stage("encode"):
+            return dumps(content, exclude_unset=self.exclude_unset)
@@ -1,50 +1,853 @@
 """Windows routes for dynamic_fastapi."""
+from collections.abc import AsyncIterator, Callable, Mapping
+from datetime import datetime, timezone
 from logging import getLogger
+from typing import Annotated, Any
 
-from fastapi import APIRouter
-from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from bson.objectid import ObjectId
+from fastapi import (
+    APIRouter, Body, Depends, FastAPI, Header, HTTPException, Query, status
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from pydantic.error_wrappers import ErrorWrapper
 
-from dynamic_fastapi.app.depends import WindowsDBDep
-from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
-from dynamic_fastapi.model.window import Window
+from dynamic_fastapi import metrics
+from dynamic_fastapi.app.active import ActiveWindowIndex
+from dynamic_fastapi.app.config import AppConfig
+from dynamic_fastapi.app.depends import (
+    ActiveWindowsDep, AppConfigDep, RecentWindowsDep, WindowEventsDep,
+    WindowsDBDep
+)
+from dynamic_fastapi.app.idempotency import RecentWindows
+from dynamic_fastapi.app.metrics import TimedRoute
+from dynamic_fastapi.app.responses import ORJSONResponse, dumps
+from dynamic_fastapi.database.collection import decode_cursor
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.base import PydanticObjectId
+from dynamic_fastapi.model.bulk import BulkItemResult, BulkUpdateResult
+from dynamic_fastapi.model.page import Page
+from dynamic_fastapi.model.task_type import (
+    TaskType, TaskTypeModels, TaskTypeRegistry
+)
+from dynamic_fastapi.model.window import (
+    Window, WindowFilter, WindowState, window_union
+)
 
 _log = getLogger(__name__)
 
-windows_api = APIRouter(prefix="/windows")
+windows_api = APIRouter(
+    prefix="/windows", default_response_class=ORJSONResponse, route_class=TimedRoute
+)
 
+DEFAULT_PAGE_SIZE = 100
+"""Number of windows returned by a list request if no limit is given."""
+MAX_PAGE_SIZE = 1000
+"""Largest number of windows a list request may ask for."""
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+"""Media type for streamed window listings."""
+EVENT_STREAM_MEDIA_TYPE = "text/event-stream"
+"""Media type for window events."""
+CLOSE_ACTIONS = {"cancel": WindowState.CANCELLED, "complete": WindowState.COMPLETE}
+"""Terminal window states by the name of the action closing a window."""
 
-def generate_routes() -> None:
-    """Generate routes for windows_api."""
-    window_types = None
-    for task_type in TaskTypeRegistry.task_types():
-        _generate_routes(task_type)
-        if window_types is None:
-            window_types = Window[task_type.params_model]
+
+def _window_filter(
+    task_type: Annotated[list[str] | None, Query()] = None,
+    state: WindowState | None = None,
+    datasource: str | None = None,
+    start_after: datetime | None = None,
+    start_before: datetime | None = None,
+    stop_after: datetime | None = None,
+    stop_before: datetime | None = None,
+) -> WindowFilter:
+    """Provide the window filter from the query parameters.
+
+    :param task_type: Task types to include. May be repeated.
+    :param state: Window state to include.
+    :param datasource: Datasource the windows must use.
+    :param start_after: Earliest window start time.
+    :param start_before: Window start time upper bound (exclusive).
+    :param stop_after: Earliest window stop time.
+    :param stop_before: Window stop time upper bound (exclusive).
+
+    :returns: The window filter.
+    """
+    return WindowFilter(
+        task_types=task_type or [],
+        state=state,
+        datasource=datasource,
+        start_after=start_after,
+        start_before=start_before,
+        stop_after=stop_after,
+        stop_before=stop_before,
+    )
+
+
+WindowFilterDep = Annotated[WindowFilter, Depends(_window_filter)]
+"""Window filter dependency."""
+
+
+def _page_cursor(after: str | None = None) -> str | None:
+    """Provide the validated page cursor from the query parameters.
+
+    :param after: The `next` cursor of the previous page.
+
+    :returns: The page cursor.
+
+    :raises HTTPException: If the cursor is not valid.
+    """
+    if after is not None:
+        try:
+            decode_cursor(after)
+        except ValueError as err:
+            raise HTTPException(status.HTTP_400_BAD_REQUEST, str(err)) from err
+
+    return after
+
+
+PageCursorDep = Annotated[str | None, Depends(_page_cursor)]
+"""Page cursor dependency."""
+
+
+def _window_fields(fields: str | None = None) -> list[str] | None:
+    """Provide the window fields to return from the query parameters.
+
+    :param fields: Comma-separated window fields, such as
+        `id,state,params.task_type`.
+
+    :returns: The field paths, or None to return whole windows.
+
+    :raises HTTPException: If a field is not a window field.
+    """
+    if fields is None:
+        return None
+
+    paths = [path.strip() for path in fields.split(",") if path.strip()]
+    known = {
+        name
+        for field in Window.__fields__.values()
+        for name in (field.name, field.alias)
+    }
+    for path in paths:
+        name, _, rest = path.partition(".")
+        if name not in known or (rest and name != "params"):
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST, f"Unknown window field: {path}"
+            )
+
+    return paths
+
+
+WindowFieldsDep = Annotated[list[str] | None, Depends(_window_fields)]
+"""Window fields dependency."""
+
+
+def _active_range(
+    at: datetime | None = None,
+    start: datetime | None = None,
+    stop: datetime | None = None,
+) -> tuple[datetime, datetime]:
+    """Provide the time range for an open windows query.
+
+    :param at: The time the windows must be open at.
+    :param start: The start of the time range.
+    :param stop: The end of the time range.
+
+    :returns: The start and end of the time range. If no times are given,
+        both are the current time.
+
+    :raises HTTPException: If the time range is not valid.
+    """
+    if (start is None) != (stop is None) or None not in (at, start):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST, "Pass either at, or both start and stop"
+        )
+    if start is None:
+        at = at or datetime.now(timezone.utc)
+        return at, at
+    if stop < start:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "stop is before start")
+
+    return start, stop
+
+
+ActiveRangeDep = Annotated[tuple[datetime, datetime], Depends(_active_range)]
+"""Open windows time range dependency."""
+
+
+def _etag(version: int) -> str:
+    """The entity tag of a window.
+
+    :param version: The version of the window.
+
+    :returns: The quoted entity tag, which changes whenever the window does.
+    """
+    return f'"{version}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check whether an `If-None-Match` header matches an entity tag.
+
+    Tags are compared weakly, as the header requires.
+
+    :param if_none_match: The header value, if any.
+    :param etag: The current entity tag.
+
+    :returns: Whether the client already has the current representation.
+    """
+    if if_none_match is None:
+        return False
+
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+async def _ndjson_lines(
+    windows: AsyncIterator[Window], exclude_unset: bool = False
+) -> AsyncIterator[bytes]:
+    """Encode windows as newline-delimited JSON.
+
+    :param windows: The windows to encode.
+    :param exclude_unset: Whether to omit fields which were not set.
+
+    :yields: One line of JSON per window.
+    """
+    async for window in windows:
+        yield dumps(window, exclude_unset=exclude_unset) + b"\n"
+
+
+BulkItemsBody = Annotated[list[dict[str, Any]], Body()]
+"""Request body for bulk window creation."""
+
+IdempotencyKeyHeader = Annotated[str | None, Header(max_length=255)]
+"""Key identifying retries of a create request."""
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+"""Header marking responses holding a window created by an earlier request."""
+
+
+async def _insert_window(
+    window: Window,
+    windows_db: WindowCollection,
+    active_windows: ActiveWindowIndex,
+    recent_windows: RecentWindows,
+) -> ORJSONResponse:
+    """Insert a window, unless its task type already has one with its key.
+
+    :param window: The window to insert.
+    :param windows_db: The windows database collection.
+    :param active_windows: The index of open windows.
+    :param recent_windows: The windows recently created with idempotency keys.
+
+    :returns: The created window, marked as replayed if it was created by an
+        earlier request with the same task type and idempotency key.
+    """
+    if window.idempotency_key is None:
+        window = await windows_db.insert_one(window)
+        active_windows.update(window)
+        return ORJSONResponse(window)
+
+    # Windows change after they are created, so replays read the current one.
+    window_id = recent_windows.get(window.params.task_type, window.idempotency_key)
+    existing = None if window_id is None else await windows_db.get(window_id)
+    if existing is None:
+        existing, inserted = await windows_db.insert_once(window)
+        recent_windows.add(existing)
+        if inserted:
+            active_windows.update(existing)
+            return ORJSONResponse(existing)
+
+    _log.info("Replaying window for idempotency key: %s", window.idempotency_key)
+    return ORJSONResponse(existing, headers={REPLAYED_HEADER: "true"})
+
+
+async def _create_windows(
+    items: list[dict[str, Any]],
+    models_for: Callable[[Mapping[str, Any]], TaskTypeModels | None],
+    windows_db: WindowCollection,
+    app_config: AppConfig,
+    active_windows: ActiveWindowIndex,
+) -> list[BulkItemResult]:
+    """Validate and insert windows for a bulk create request.
+
+    Items that fail validation or fail to insert are reported in the results
+    and do not stop the remaining items from being created.
+
+    :param items: The window create parameters.
+    :param models_for: Return the task type models for an item, or None if
+        the item does not have a registered task type.
+    :param windows_db: The windows database collection.
+    :param app_config: The application configuration.
+    :param active_windows: The index of open windows.
+
+    :returns: The result for each item, in the same order as the items.
+
+    :raises HTTPException: If there are too many items in the request.
+    """
+    if len(items) > app_config.windows.bulk_max_items:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"At most {app_config.windows.bulk_max_items} windows may be created",
+        )
+
+    results = [BulkItemResult() for _ in items]
+    windows, indexes = [], []
+    for index, item in enumerate(items):
+        models = models_for(item)
+        if models is None:
+            results[index].errors = [
+                {
+                    "loc": ["task_type"],
+                    "msg": "unknown task type",
+                    "type": "value_error.task_type",
+                }
+            ]
+            continue
+
+        # The task type of the model, rather than the unchecked item.
+        task_type = models.params_model.__fields__["task_type"].default
+        try:
+            with metrics.stage("validate", task_type):
+                params = models.params_model.parse_obj(item)
+        except ValidationError as err:
+            metrics.VALIDATION_FAILURES.inc("request", task_type)
+            results[index].errors = err.errors()
+            continue
+
+        windows.append(models.window_model(params=params))
+        indexes.append(index)
+
+    _log.info("Creating %d of %d windows", len(windows), len(items))
+    errors = await windows_db.insert_many(
+        windows, batch_size=app_config.windows.bulk_batch_size
+    )
+    for position, (index, window) in enumerate(zip(indexes, windows, strict=True)):
+        if position in errors:
+            results[index].errors = [{"msg": errors[position], "type": "write_error"}]
         else:
-            window_types = window_types | Window[task_type.params_model]
+            results[index].id = window.id
+            active_windows.update(window)
 
-    @windows_api.get("", response_model=list[window_types])
-    async def list_windows(windows_db: WindowsDBDep) -> JSONResponse:
-        """Return the list of windows."""
-        windows = [window async for window in windows_db.find()]
-        return JSONResponse(jsonable_encoder(windows))
+    return results
 
 
-def _generate_routes(task_type: TaskType) -> None:
-    response_model = Window[task_type.params_model]
+def generate_routes() -> None:
+    """Generate routes for windows_api.
+
+    The routes are built for the currently registered task types and replace
+    any routes previously generated. Use `mount_routes` to apply the new routes
+    to an application which has already included them.
 
-    @windows_api.post(f"/{task_type.name}/create")
+    If the task type registry is lazy, windows are instead created through
+    routes taking the task type as a path parameter, so that no task type's
+    models are built until a window of that type is created or read.
+    """
+    router = APIRouter(
+        prefix=windows_api.prefix,
+        default_response_class=windows_api.default_response_class,
+        route_class=windows_api.route_class,
+    )
+
+    window_model = _generate_create_routes(router)
+
+    for action, state in CLOSE_ACTIONS.items():
+        _generate_close_routes(router, window_model, action, state)
+
+    @router.get(
+        "",
+        response_model=Page[window_model],
+        responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+    )
+    async def list_windows(
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        window_filter: WindowFilterDep,
+        after: PageCursorDep,
+        fields: WindowFieldsDep,
+        limit: Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)] = DEFAULT_PAGE_SIZE,
+        stream: bool = False,
+        accept: Annotated[str | None, Header()] = None,
+    ) -> Response:
+        """Return a page of windows.
+
+        Pass the `next` cursor of a page as `after` to fetch the following
+        page.
+
+        Set `stream=true` or send `Accept: application/x-ndjson` to instead
+        stream every matching window as newline-delimited JSON. Streaming
+        ignores `limit`.
+
+        Set `fields` to a comma-separated list of fields, such as
+        `id,state,params.task_type,params.start_time`, to return only those
+        fields of each window. The `id` and `params.task_type` are always
+        returned.
+        \f
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param window_filter: The filter for the windows to return.
+        :param after: The cursor of the previous page.
+        :param fields: The window fields to return.
+        :param limit: The maximum number of windows to return.
+        :param stream: Whether to stream all windows as NDJSON.
+        :param accept: The accepted response media types.
+
+        :returns: The page of windows, or a stream of all windows.
+        """
+        query = windows_db.filter_query(window_filter)
+        validate = not app_config.windows.trusted_reads
+        # Windows with only some fields fetched hold only those fields.
+        partial = fields is not None
+
+        if stream or (accept is not None and NDJSON_MEDIA_TYPE in accept):
+            windows = windows_db.find_after(
+                query, after=after, validate=validate, fields=fields
+            )
+            return StreamingResponse(
+                _ndjson_lines(windows, exclude_unset=partial),
+                media_type=NDJSON_MEDIA_TYPE,
+            )
+
+        page = await windows_db.find_page(
+            query, limit=limit, after=after, validate=validate, fields=fields
+        )
+        return ORJSONResponse(page, exclude_unset=partial)
+
+    @router.get("/active", response_model=list[window_model])
+    async def list_active_windows(
+        active_windows: ActiveWindowsDep,
+        time_range: ActiveRangeDep,
+        datasource: str | None = None,
+    ) -> ORJSONResponse:
+        """Return the open windows overlapping a time or time range.
+
+        Pass `at` for the windows open at that time, or `start` and `stop` for
+        the windows overlapping that range. With neither, the windows open now
+        are returned.
+        \f
+        :param active_windows: The index of open windows.
+        :param time_range: The time range the windows must overlap.
+        :param datasource: The datasource the windows must use.
+
+        :returns: The open windows, ordered by ID.
+
+        :raises HTTPException: If the open windows are still being loaded.
+        """
+        if not active_windows.loaded:
+            raise HTTPException(
+                status.HTTP_503_SERVICE_UNAVAILABLE, "Open windows are still loading"
+            )
+
+        return ORJSONResponse(active_windows.overlapping(*time_range, datasource))
+
+    @router.get(
+        "/events", responses={200: {"content": {EVENT_STREAM_MEDIA_TYPE: {}}}}
+    )
+    async def window_events(
+        window_events: WindowEventsDep,
+        app_config: AppConfigDep,
+        task_type: Annotated[list[str] | None, Query()] = None,
+    ) -> StreamingResponse:
+        """Stream window changes as server-sent events.
+
+        Each event is named after the change (`insert`, `update`, `replace` or
+        `delete`) and holds the window after the change, or only its `_id` if
+        it was deleted. Clients which fall too far behind receive a `dropped`
+        event and should reconnect and catch up by listing windows.
+        \f
+        :param window_events: The shared window change stream.
+        :param app_config: The application configuration.
+        :param task_type: Task types to receive changes for. May be repeated.
+
+        :returns: The event stream.
+        """
+        events = window_events.subscribe(
+            frozenset(task_type or ()), keepalive=app_config.events.keepalive
+        )
+        return StreamingResponse(
+            events,
+            media_type=EVENT_STREAM_MEDIA_TYPE,
+            headers={"Cache-Control": "no-cache"},
+        )
+
+    @router.post("/bulk", response_model=list[BulkItemResult])
+    async def create_windows_bulk(
+        items: BulkItemsBody,
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        active_windows: ActiveWindowsDep,
+    ) -> ORJSONResponse:
+        """Create windows of any task type.
+
+        Each item is validated against the parameters for its `task_type`.
+        The result for each item holds either the ID of the created window or
+        the reasons it was not created.
+        \f
+        :param items: The window create parameters.
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param active_windows: The index of open windows.
+
+        :returns: The result for each item.
+        """
+
+        def _models_for(item: Mapping[str, Any]) -> TaskTypeModels | None:
+            try:
+                return TaskTypeRegistry.models(item.get("task_type"))
+            except KeyError:
+                return None
+
+        results = await _create_windows(
+            items, _models_for, windows_db, app_config, active_windows
+        )
+        return ORJSONResponse(results)
+
+    # Registered last so that the static paths above take precedence.
+    _generate_get_routes(router, window_model)
+
+    # Swap in the complete set of routes at once.
+    windows_api.routes = router.routes
+
+
+def mount_routes(app: FastAPI) -> None:
+    """Replace the windows routes on an application with the current routes.
+
+    The application's route list is swapped in a single assignment, so
+    requests are always matched against either the old or the new routes.
+    Requests already being handled are unaffected.
+
+    :param app: The application.
+    """
+    mounted = APIRouter()
+    mounted.include_router(windows_api)
+
+    previous = getattr(app.state, "windows_routes", [])
+    routes = [route for route in app.router.routes if route not in previous]
+    app.router.routes = routes + mounted.routes
+    app.state.windows_routes = mounted.routes
+
+    # The schema is regenerated on the next request for it.
+    app.openapi_schema = None
+
+
+def _generate_create_routes(router: APIRouter) -> type[Window]:
+    if TaskTypeRegistry.lazy:
+        _generate_dispatch_routes(router)
+        return window_union([])
+
+    params_models = []
+    for task_type in TaskTypeRegistry.task_types():
+        _generate_routes(router, task_type)
+        params_models.append(TaskTypeRegistry.models(task_type.name).params_model)
+    return window_union(params_models)
+
+
+def _generate_routes(router: APIRouter, task_type: TaskType) -> None:
+    models = TaskTypeRegistry.models(task_type.name)
+    response_model = models.window_model
+
+    @router.post(f"/{task_type.name}/create", response_model=response_model)
     async def create_window(
-        params: task_type.params_model, windows_db: WindowsDBDep
-    ) -> response_model:
+        params: models.params_model,
+        windows_db: WindowsDBDep,
+        active_windows: ActiveWindowsDep,
+        recent_windows: RecentWindowsDep,
+        idempotency_key: IdempotencyKeyHeader = None,
+    ) -> ORJSONResponse:
         """Create a window.
+
+        Requests sent with an `Idempotency-Key` header create at most one
+        window per key of the task type. Retries return the window created by
+        the first request, with an `Idempotent-Replayed` header.
         \f
         :param params: The window create parameters.
         :param windows_db: The windows database collection.
+        :param active_windows: The index of open windows.
+        :param recent_windows: The windows recently created with idempotency
+            keys.
+        :param idempotency_key: The key identifying retries of the request.
 
         :returns: The created window.
         """
         _log.info("Creating %s window with parameters: %s", task_type.name, params)
-        window = await windows_db.insert_one(response_model(params=params))
+        # The window is already valid, so it is serialised directly.
+        return await _insert_window(
+            response_model(params=params, idempotency_key=idempotency_key),
+            windows_db,
+            active_windows,
+            recent_windows,
+        )
+
+    @router.post(
+        f"/{task_type.name}/create_many", response_model=list[BulkItemResult]
+    )
+    async def create_windows(
+        items: BulkItemsBody,
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        active_windows: ActiveWindowsDep,
+    ) -> ORJSONResponse:
+        """Create windows.
+
+        The result for each item holds either the ID of the created window or
+        the reasons it was not created.
+        \f
+        :param items: The window create parameters.
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param active_windows: The index of open windows.
+
+        :returns: The result for each item.
+        """
+        results = await _create_windows(
+            items, lambda _: models, windows_db, app_config, active_windows
+        )
+        return ORJSONResponse(results)
+
+    # Mark the endpoints so that the routes can be grouped by task type.
+    for endpoint in (create_window, create_windows):
+        endpoint.__task_type__ = task_type.name
+    # Items are validated by the endpoint, which times each of them.
+    create_windows.__validates__ = True
+
+
+def _generate_dispatch_routes(router: APIRouter) -> None:
+    def _models(task_type: str) -> TaskTypeModels:
+        try:
+            models = TaskTypeRegistry.models(task_type)
+        except KeyError as err:
+            raise HTTPException(
+                status.HTTP_404_NOT_FOUND, f"Unknown task type: {task_type}"
+            ) from err
+
+        # Label the stages of the request with the task type.
+        metrics.current_task_type.set(task_type)
+        return models
+
+    @router.post("/{task_type}/create", response_model=Window)
+    async def create_window(
+        task_type: str,
+        params: Annotated[dict[str, Any], Body()],
+        windows_db: WindowsDBDep,
+        active_windows: ActiveWindowsDep,
+        recent_windows: RecentWindowsDep,
+        idempotency_key: IdempotencyKeyHeader = None,
+    ) -> ORJSONResponse:
+        """Create a window of a task type.
+
+        The parameters are validated against the parameters of the task type.
+        Requests sent with an `Idempotency-Key` header create at most one
+        window per key of the task type. Retries return the window created by
+        the first request, with an `Idempotent-Replayed` header.
+        \f
+        :param task_type: The name of the task type.
+        :param params: The window create parameters.
+        :param windows_db: The windows database collection.
+        :param active_windows: The index of open windows.
+        :param recent_windows: The windows recently created with idempotency
+            keys.
+        :param idempotency_key: The key identifying retries of the request.
+
+        :returns: The created window.
+
+        :raises HTTPException: If the task type is not registered.
+        :raises RequestValidationError: If the parameters are not valid.
+        """
+        models = _models(task_type)
+        try:
+            with metrics.stage("validate"):
+                window = models.window_model(
+                    params=models.params_model.parse_obj(params),
+                    idempotency_key=idempotency_key,
+                )
+        except ValidationError as err:
+            # Reported the same as parameters validated by a typed route.
+            raise RequestValidationError(
+                [ErrorWrapper(err, loc=("body",))], body=params
+            ) from err
+
+        _log.info("Creating %s window with parameters: %s", task_type, window.params)
+        return await _insert_window(window, windows_db, active_windows, recent_windows)
+
+    @router.post("/{task_type}/create_many", response_model=list[BulkItemResult])
+    async def create_windows(
+        task_type: str,
+        items: BulkItemsBody,
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        active_windows: ActiveWindowsDep,
+    ) -> ORJSONResponse:
+        """Create windows of a task type.
+
+        The result for each item holds either the ID of the created window or
+        the reasons it was not created.
+        \f
+        :param task_type: The name of the task type.
+        :param items: The window create parameters.
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param active_windows: The index of open windows.
+
+        :returns: The result for each item.
+
+        :raises HTTPException: If the task type is not registered.
+        """
+        models = _models(task_type)
+        results = await _create_windows(
+            items, lambda _: models, windows_db, app_config, active_windows
+        )
+        return ORJSONResponse(results)
+
+    # The endpoints validate the parameters once they know the task type, and
+    # time the validate stage themselves.
+    for endpoint in (create_window, create_windows):
+        endpoint.__validates__ = True
+
+
+def _generate_close_routes(
+    router: APIRouter, window_model: type[Window], action: str, state: WindowState
+) -> None:
+    # Name the routes after the action so that each has its own summary.
+    @router.post(
+        f"/{action}", response_model=BulkUpdateResult, name=f"{action}_windows"
+    )
+    async def close_windows(
+        windows_db: WindowsDBDep,
+        window_filter: WindowFilterDep,
+        active_windows: ActiveWindowsDep,
+        all_windows: Annotated[bool, Query(alias="all")] = False,
+    ) -> ORJSONResponse:
+        """Close all open windows selected by the filter.
+
+        The windows are updated in a single operation. Windows which are not
+        open are left unchanged. Closing every open window requires
+        `all=true` rather than an empty filter.
+        \f
+        :param windows_db: The windows database collection.
+        :param window_filter: The filter for the windows to close.
+        :param active_windows: The index of open windows.
+        :param all_windows: Whether to close every open window if there is no
+            filter.
+
+        :returns: The number of windows closed.
+
+        :raises HTTPException: If there is no filter and `all` is not set.
+        """
+        query = windows_db.filter_query(window_filter)
+        if not query and not all_windows:
+            raise HTTPException(
+                status.HTTP_400_BAD_REQUEST,
+                "A filter is required, or all=true to close every open window",
+            )
+
+        # Only the windows found are closed, so that windows opened during the
+        # update stay open in both the database and the index.
+        window_ids = await windows_db.open_ids(query)
+        _log.info("Closing %d windows as %s", len(window_ids), state.value)
+        updated = 0
+        if window_ids:
+            updated = await windows_db.close_many({"_id": {"$in": window_ids}}, state)
+        for window_id in window_ids:
+            active_windows.remove(window_id)
+
+        return ORJSONResponse(BulkUpdateResult(updated=updated))
+
+    @router.post(
+        f"/{{window_id}}/{action}", response_model=window_model, name=f"{action}_window"
+    )
+    async def close_window(
+        window_id: PydanticObjectId,
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        active_windows: ActiveWindowsDep,
+    ) -> ORJSONResponse:
+        """Close an open window.
+        \f
+        :param window_id: The ID of the window.
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param active_windows: The index of open windows.
+
+        :returns: The updated window.
+
+        :raises HTTPException: If the window does not exist or is not open.
+        """
+        validate = not app_config.windows.trusted_reads
+        window = await windows_db.close(window_id, state, validate=validate)
+        if window is None:
+            if await windows_db.find_one({"_id": window_id}, validate=False) is None:
+                raise HTTPException(status.HTTP_404_NOT_FOUND, "Window not found")
+            raise HTTPException(status.HTTP_409_CONFLICT, "Window is not open")
+
+        active_windows.remove(window.id)
+        return ORJSONResponse(window, headers={"ETag": _etag(window.version)})
+
+
+def _generate_get_routes(router: APIRouter, window_model: type[Window]) -> None:
+    async def _get_window(
+        window_id: ObjectId, windows_db: WindowCollection, app_config: AppConfig
+    ) -> Window:
+        validate = not app_config.windows.trusted_reads
+        window = await windows_db.get(window_id, validate=validate)
+        if window is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, "Window not found")
         return window
+
+    async def _get_etag(window_id: ObjectId, windows_db: WindowCollection) -> str:
+        # Only the version is read, so that preconditions are checked cheaply.
+        version = await windows_db.version(window_id)
+        if version is None:
+            raise HTTPException(status.HTTP_404_NOT_FOUND, "Window not found")
+        return _etag(version)
+
+    @router.get(
+        "/{window_id}",
+        response_model=window_model,
+        responses={status.HTTP_304_NOT_MODIFIED: {"description": "Not Modified"}},
+    )
+    async def get_window(
+        window_id: PydanticObjectId,
+        windows_db: WindowsDBDep,
+        app_config: AppConfigDep,
+        if_none_match: Annotated[str | None, Header()] = None,
+    ) -> Response:
+        """Return a window.
+
+        The response has an `ETag` which changes whenever the window does.
+        Send it back as `If-None-Match` to receive an empty `304` response if
+        the window has not changed since, without the window being read.
+        \f
+        :param window_id: The ID of the window.
+        :param windows_db: The windows database collection.
+        :param app_config: The application configuration.
+        :param if_none_match: Entity tags of windows the client already has.
+
+        :returns: The window.
+
+        :raises HTTPException: If the window does not exist.
+        """
+        if if_none_match is not None:
+            etag = await _get_etag(window_id, windows_db)
+            if _etag_matches(if_none_match, etag):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+                )
+
+        window = await _get_window(window_id, windows_db, app_config)
+        return ORJSONResponse(window, headers={"ETag": _etag(window.version)})
+
+    @router.head("/{window_id}", response_class=Response)
+    async def head_window(
+        window_id: PydanticObjectId, windows_db: WindowsDBDep
+    ) -> Response:
+        """Check whether a window exists, and return its `ETag`.
+        \f
+        :param window_id: The ID of the window.
+        :param windows_db: The windows database collection.
+
+        :returns: An empty response with the window's `ETag`.
+
+        :raises HTTPException: If the window does not exist.
+        """
+        return Response(headers={"ETag": await _get_etag(window_id, windows_db)})
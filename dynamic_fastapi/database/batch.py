@@ -0,0 +1,147 @@
+"""Batching of concurrent collection writes."""
+import asyncio
+from collections.abc import Mapping
+from typing import Any
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import (
+    BulkWriteError, DuplicateKeyError, WriteConcernError, WriteError
+)
+from pymongo.results import InsertOneResult
+
+from dynamic_fastapi import metrics
+
+_DUPLICATE_KEY_CODES = frozenset({11000, 11001, 12582})
+"""Server error codes of duplicate key errors."""
+
+
+def _write_error(error: Mapping[str, Any]) -> WriteError:
+    """Convert an error from a bulk write to the error of a single write.
+
+    :param error: The write error from the bulk write result.
+
+    :returns: The error the driver raises for the same failure of a single
+        write.
+    """
+    code = error.get("code")
+    error_class = DuplicateKeyError if code in _DUPLICATE_KEY_CODES else WriteError
+    return error_class(error.get("errmsg"), code, error)
+
+
+def _batch_errors(err: BulkWriteError, count: int) -> dict[int, Exception]:
+    """Find the error of each write in a failed bulk write.
+
+    :param err: The bulk write error.
+    :param count: The number of documents written.
+
+    :returns: The errors, keyed by the index of their document.
+    """
+    errors: dict[int, Exception] = {
+        error["index"]: _write_error(error)
+        for error in err.details.get("writeErrors", [])
+    }
+    concern_errors = err.details.get("writeConcernErrors")
+    if concern_errors:
+        # The documents were written, but not as durably as requested.
+        concern = concern_errors[-1]
+        for index in range(count):
+            errors.setdefault(
+                index,
+                WriteConcernError(concern.get("errmsg"), concern.get("code"), concern),
+            )
+    return errors
+
+
+class InsertBatcher:
+    """Coalesces concurrent inserts into a collection into bulk inserts.
+
+    Each insert waits up to `max_delay` seconds for others to join it, and
+    the waiting inserts are written with a single unordered `insert_many`
+    once the delay passes or `max_batch` inserts are waiting. Each caller
+    receives the result or error of its own document, the same as from
+    `insert_one`, so one failed document does not fail the others.
+    """
+
+    def __init__(
+        self, collection: AsyncIOMotorCollection, max_delay: float, max_batch: int
+    ):
+        """Create an InsertBatcher.
+
+        :param collection: The collection to insert into.
+        :param max_delay: Seconds an insert waits for others to join it.
+        :param max_batch: The most documents written by one bulk insert.
+        """
+        self.collection = collection
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._pending: list[tuple[dict[str, Any], asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # Held so that writes are not garbage collected while running.
+        self._writes: set[asyncio.Task] = set()
+
+    async def insert_one(self, doc: dict[str, Any]) -> InsertOneResult:
+        """Insert a document with the other waiting documents.
+
+        :param doc: The document. Its `_id` is set if it has none.
+
+        :returns: The result of inserting the document.
+
+        :raises PyMongoError: If the document was not inserted.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_batch:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """Start writing the waiting documents now."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        task = asyncio.create_task(self._write(batch))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def close(self) -> None:
+        """Write the waiting documents and wait for every write to finish."""
+        self.flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _write(self, batch: list[tuple[dict[str, Any], asyncio.Future]]) -> None:
+        """Insert a batch of documents and resolve their callers' futures.
+
+        :param batch: The documents and the futures of their callers.
+        """
+        metrics.INSERT_BATCH_SIZE.observe(len(batch), self.collection.name)
+        docs = [doc for doc, _ in batch]
+        errors: dict[int, Exception] = {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as err:
+            errors = _batch_errors(err, len(batch))
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as err:
+            # Nothing is known to be written, so every caller gets the error.
+            errors = dict.fromkeys(range(len(batch)), err)
+
+        acknowledged = self.collection.write_concern.acknowledged
+        for index, (doc, future) in enumerate(batch):
+            # Callers may have been cancelled while waiting.
+            if future.done():
+                continue
+            if index in errors:
+                future.set_exception(errors[index])
+            else:
+                future.set_result(InsertOneResult(doc["_id"], acknowledged))
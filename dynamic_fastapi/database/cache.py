@@ -0,0 +1,420 @@
+"""Caching of collection reads."""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Mapping, Sequence
+from hashlib import sha1
+from logging import getLogger
+from time import monotonic, time_ns
+from typing import Any
+
+import bson
+from bson.codec_options import CodecOptions
+
+from dynamic_fastapi import metrics
+
+try:
+    from redis.asyncio import Redis
+    from redis.exceptions import RedisError
+except ImportError:  # The redis extra is not installed.
+    Redis = None
+    RedisError = OSError
+
+_log = getLogger(__name__)
+
+_CODEC_OPTIONS = CodecOptions(tz_aware=False)
+
+
+class CacheError(Exception):
+    """A cache backend is unavailable."""
+
+
+class CacheBackend(ABC):
+    """Storage for cached values.
+
+    Values expire after a time set by the backend. Generations are numbers
+    used to invalidate groups of values by including them in their keys. They
+    may expire or be evicted too, but a generation never returns to a value
+    it has had before, so values cached under an old generation are never
+    read again.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        """Get a value.
+
+        :param key: The key of the value.
+
+        :returns: The value, or None if it is not cached.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes) -> None:
+        """Cache a value.
+
+        :param key: The key of the value.
+        :param value: The value.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Remove a value if it is cached.
+
+        :param key: The key of the value.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+
+    async def generation(self, name: str) -> int:
+        """Get the current value of a generation.
+
+        :param name: The name of the generation.
+
+        :returns: The generation.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+        (generation,) = await self.generations([name])
+        return generation
+
+    @abstractmethod
+    async def generations(self, names: Sequence[str]) -> list[int]:
+        """Get the current values of generations together.
+
+        :param names: The names of the generations.
+
+        :returns: The generations, in the same order as their names.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+
+    @abstractmethod
+    async def bump(self, name: str) -> None:
+        """Move a generation on, invalidating values cached under it.
+
+        :param name: The name of the generation.
+
+        :raises CacheError: If the backend is unavailable.
+        """
+
+    async def close(self) -> None:  # noqa: B027
+        """Release any resources held by the backend."""
+
+
+class MemoryCache(CacheBackend):
+    """In-process cache with least recently used eviction.
+
+    The cache holds values up to a total size in bytes, evicting the least
+    recently used values to make space.
+    """
+
+    def __init__(
+        self, max_bytes: int, ttl: float, clock: Callable[[], float] = monotonic
+    ):
+        """Create a MemoryCache.
+
+        :param max_bytes: The largest total size of the keys and values held.
+        :param ttl: Seconds until a value expires.
+        :param clock: Returns the current time in seconds.
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.size = 0
+        """The total size of the keys and values held."""
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        # Every generation value is new, so none is ever reused.
+        self._last_generation = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key: str, value: bytes) -> None:
+        self._remove(key)
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def delete(self, key: str) -> None:
+        self._remove(key)
+
+    async def generations(self, names: Sequence[str]) -> list[int]:
+        return [await self._generation(name) for name in names]
+
+    async def bump(self, name: str) -> None:
+        self._last_generation += 1
+        await self.set(name, str(self._last_generation).encode())
+
+    async def _generation(self, name: str) -> int:
+        value = await self.get(name)
+        if value is None:
+            await self.bump(name)
+            value = await self.get(name)
+        if value is None:
+            # Too large to store, so the generation is new on every read.
+            return self._last_generation
+        return int(value)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(key) + len(entry[1])
+
+
+class RedisCache(CacheBackend):
+    """Cache held in Redis, shared by every process using the same server.
+
+    Requires the `redis` extra. Redis evicts values according to its own
+    memory limit and eviction policy.
+    """
+
+    def __init__(self, client: "Redis", ttl: float):
+        """Create a RedisCache.
+
+        :param client: The Redis client.
+        :param ttl: Seconds until a value expires.
+        """
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> "RedisCache":
+        """Create a RedisCache connecting to a server.
+
+        :param url: The Redis URL, e.g. `redis://localhost:6379/0`.
+        :param ttl: Seconds until a value expires.
+
+        :returns: The cache.
+
+        :raises ImportError: If the redis extra is not installed.
+        """
+        if Redis is None:
+            raise ImportError("The redis cache requires the redis extra")
+
+        return cls(Redis.from_url(url), ttl)
+
+    async def get(self, key: str) -> bytes | None:
+        try:
+            return await self.client.get(key)
+        except RedisError as err:
+            raise CacheError(str(err)) from err
+
+    async def set(self, key: str, value: bytes) -> None:
+        try:
+            await self.client.set(key, value, px=int(self.ttl * 1000))
+        except RedisError as err:
+            raise CacheError(str(err)) from err
+
+    async def delete(self, key: str) -> None:
+        try:
+            await self.client.delete(key)
+        except RedisError as err:
+            raise CacheError(str(err)) from err
+
+    async def generations(self, names: Sequence[str]) -> list[int]:
+        try:
+            values = await self.client.mget(names)
+            if None in values:
+                for name, value in zip(names, values, strict=True):
+                    if value is None:
+                        await self._start(name)
+                values = await self.client.mget(names)
+        except RedisError as err:
+            raise CacheError(str(err)) from err
+
+        return [int(value) for value in values]
+
+    async def bump(self, name: str) -> None:
+        try:
+            if not await self._start(name):
+                await self.client.incr(name)
+        except RedisError as err:
+            raise CacheError(str(err)) from err
+
+    async def _start(self, name: str) -> bool:
+        """Create a generation if it does not exist.
+
+        Generations start from the time rather than zero, so that a generation
+        which expired does not return to values cached under it.
+
+        :param name: The name of the generation.
+
+        :returns: Whether the generation was created.
+        """
+        return bool(
+            await self.client.set(name, time_ns(), nx=True, px=int(self.ttl * 1000))
+        )
+
+    async def close(self) -> None:
+        await self.client.close()
+
+
+class DocumentCache:
+    """Read-through cache of the documents of a collection.
+
+    Documents are cached by ID, and the documents of list queries by the
+    query. Both are stored BSON encoded, so cached documents are identical to
+    those read from the database.
+
+    Inserting documents invalidates every cached query. Updating a document
+    also invalidates the document, and updating many documents invalidates
+    everything. Errors from the backend are logged and treated as misses.
+
+    Reads find the key to cache their result under before reading from the
+    database. Invalidating changes the keys, so a result read before a write
+    but cached after it is stored under a key which is no longer used.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str):
+        """Create a DocumentCache.
+
+        :param backend: The cache storage.
+        :param namespace: Prefix for the keys of this cache, e.g. the name of
+            the collection.
+        """
+        self.backend = backend
+        self.namespace = namespace
+        self.hits = 0
+        """The number of reads served from the cache."""
+        self.misses = 0
+        """The number of reads not served from the cache."""
+
+    async def doc_key(self, doc_id: Any) -> str | None:
+        """Find the key to cache a document under.
+
+        :param doc_id: The ID of the document.
+
+        :returns: The key, or None if the backend is unavailable.
+        """
+        return await self._key(self._doc_key(doc_id))
+
+    async def get_doc(self, key: str | None) -> dict[str, Any] | None:
+        """Get a cached document.
+
+        :param key: The key from `doc_key`.
+
+        :returns: The document, or None if it is not cached.
+        """
+        value = await self._get(key)
+        return None if value is None else bson.decode(value, _CODEC_OPTIONS)
+
+    async def set_doc(self, key: str | None, doc: Mapping[str, Any]) -> None:
+        """Cache a document.
+
+        :param key: The key from `doc_key`, found before reading the document.
+        :param doc: The document.
+        """
+        await self._set(key, bson.encode(doc))
+
+    async def query_key(self, query: Mapping[str, Any]) -> str | None:
+        """Find the key to cache the documents found by a query under.
+
+        :param query: The filter and options of the query.
+
+        :returns: The key, or None if the backend is unavailable.
+        """
+        return await self._key(self._query_key(query))
+
+    async def get_docs(self, key: str | None) -> list[dict[str, Any]] | None:
+        """Get the cached documents found by a query.
+
+        :param key: The key from `query_key`.
+
+        :returns: The documents, or None if they are not cached.
+        """
+        value = await self._get(key)
+        if value is None:
+            return None
+
+        return bson.decode(value, _CODEC_OPTIONS)["docs"]
+
+    async def set_docs(
+        self, key: str | None, docs: Sequence[Mapping[str, Any]]
+    ) -> None:
+        """Cache the documents found by a query.
+
+        :param key: The key from `query_key`, found before running the query.
+        :param docs: The documents.
+        """
+        await self._set(key, bson.encode({"docs": docs}))
+
+    async def invalidate(self, doc_id: Any = None) -> None:
+        """Invalidate cached queries, and a cached document.
+
+        :param doc_id: The ID of the document to invalidate, if any.
+        """
+        try:
+            if doc_id is not None:
+                await self.backend.bump(f"{self.namespace}:doc:{doc_id}")
+            await self.backend.bump(f"{self.namespace}:queries")
+        except CacheError:
+            _log.exception("Unable to invalidate %s cache", self.namespace)
+
+    async def invalidate_all(self) -> None:
+        """Invalidate every cached document and query."""
+        try:
+            await self.backend.bump(f"{self.namespace}:docs")
+            await self.backend.bump(f"{self.namespace}:queries")
+        except CacheError:
+            _log.exception("Unable to invalidate %s cache", self.namespace)
+
+    async def _doc_key(self, doc_id: Any) -> str:
+        generation, doc_generation = await self.backend.generations(
+            [f"{self.namespace}:docs", f"{self.namespace}:doc:{doc_id}"]
+        )
+        return f"{self.namespace}:doc:{generation}:{doc_generation}:{doc_id}"
+
+    async def _query_key(self, query: Mapping[str, Any]) -> str:
+        generation = await self.backend.generation(f"{self.namespace}:queries")
+        digest = sha1(bson.encode(query)).hexdigest()  # noqa: S324
+        return f"{self.namespace}:query:{generation}:{digest}"
+
+    async def _key(self, key: Awaitable[str]) -> str | None:
+        try:
+            return await key
+        except CacheError as err:
+            _log.warning("Unable to read %s cache: %s", self.namespace, err)
+            return None
+
+    async def _get(self, key: str | None) -> bytes | None:
+        value = None
+        if key is not None:
+            try:
+                value = await self.backend.get(key)
+            except CacheError as err:
+                _log.warning("Unable to read %s cache: %s", self.namespace, err)
+
+        if value is None:
+            self.misses += 1
+            metrics.CACHE_REQUESTS.inc(self.namespace, "miss")
+        else:
+            self.hits += 1
+            metrics.CACHE_REQUESTS.inc(self.namespace, "hit")
+        return value
+
+    async def _set(self, key: str | None, value: bytes) -> None:
+        if key is None:
+            return
+        try:
+            await self.backend.set(key, value)
+        except CacheError as err:
+            _log.warning("Unable to write %s cache: %s", self.namespace, err)
@@ -1,14 +1,68 @@
 """Base collection utilities."""
-from collections.abc import Iterator, Mapping
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from collections.abc import Iterator, Mapping, Sequence
+from logging import getLogger
+from random import random
 from typing import Any, Generic, TypeVar
 
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import BaseModel, ValidationError
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
 
-from dynamic_fastapi.model.base import DatabaseModel
+from dynamic_fastapi import metrics
+from dynamic_fastapi.database.batch import InsertBatcher
+from dynamic_fastapi.database.cache import DocumentCache
+from dynamic_fastapi.model.base import DatabaseModel, construct_model
+from dynamic_fastapi.model.page import Page
+
+_log = getLogger(__name__)
 
 _MT = TypeVar("_MT", bound=DatabaseModel)
 
 
+class IndexReport(BaseModel):
+    """Comparison of the declared and existing indexes of a collection."""
+
+    collection: str
+    """The name of the collection."""
+    missing: list[str]
+    """Declared indexes which do not exist."""
+    undeclared: list[str]
+    """Existing indexes which are not declared."""
+    unused: list[str] | None
+    """Existing indexes which have not been used since the server started, or
+    None if index usage statistics are not available."""
+
+
+def encode_cursor(last_id: ObjectId) -> str:
+    """Encode a document ID as an opaque page cursor.
+
+    :param last_id: The ID of the last document in a page.
+
+    :returns: The cursor for the following page.
+    """
+    return urlsafe_b64encode(last_id.binary).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    """Decode a page cursor.
+
+    :param cursor: A cursor created by `encode_cursor`.
+
+    :returns: The ID of the last document in the previous page.
+
+    :raises ValueError: If the cursor is not valid.
+    """
+    try:
+        return ObjectId(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (Base64Error, InvalidId, TypeError) as err:
+        raise ValueError(f"Invalid cursor: {cursor}") from err
+
+
 class Collection(Generic[_MT]):
     """Model-based interface to a Mongo collection."""
 
@@ -19,63 +73,455 @@ class Collection(Generic[_MT]):
         """The name of the collection for this class."""
         model_class: type[_MT]
         """The model for documents in this collection."""
+        indexes: list[IndexModel] = []
+        """The indexes for this collection. Each index must be named."""
 
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        validate_sample_rate: float = 0.0,
+        cache: DocumentCache | None = None,
+        batcher: InsertBatcher | None = None,
+    ):
         """Create a new collection.
 
         :param db: The database connection.
+        :param validate_sample_rate: The fraction of documents read without
+            validation which are validated anyway, to detect schema drift.
+        :param cache: The cache for lookups by ID and pages of documents, if
+            any. Writes through this collection invalidate it.
+        :param batcher: The batcher to write single inserts through, if any.
+            It must insert into the same collection.
         """
         self.collection = db[self.Config.collection_name]
+        self.validate_sample_rate = validate_sample_rate
+        self.cache = cache
+        self.batcher = batcher
+
+    def model_for(self, doc: Mapping[str, Any]) -> type[_MT]:
+        """The model class for a document.
+
+        :param doc: The document from the database.
 
-    def from_doc(self, doc: Mapping[str, Any]) -> _MT:
+        :returns: The model class to parse the document with.
+        """
+        return self.Config.model_class
+
+    def from_doc(
+        self, doc: Mapping[str, Any], validate: bool = True, partial: bool = False
+    ) -> _MT:
         """Parse a document to the model class.
 
+        Documents read without validation are built directly from the stored
+        values. A sample of them, set by `validate_sample_rate`, is validated
+        anyway and any failures are logged.
+
         :param doc: The document from the database.
+        :param validate: Whether to validate the document.
+        :param partial: Whether the document has only some fields, as read with
+            a projection. Partial documents are neither validated nor sampled.
 
         :returns: The parsed document.
         """
-        return self.Config.model_class.parse_obj(doc)
+        model = self.model_for(doc)
+        name = self.Config.collection_name
+        validate = validate and not partial
+        metrics.DOCUMENTS_DECODED.inc(name, str(validate).lower())
+        with metrics.stage("decode"):
+            if validate:
+                try:
+                    return model.parse_obj(doc)
+                except ValidationError:
+                    metrics.VALIDATION_FAILURES.inc(name, "")
+                    raise
+
+            # Sampling does not need a cryptographically secure generator.
+            rate = self.validate_sample_rate
+            if rate and not partial and random() < rate:  # noqa: S311
+                try:
+                    model.parse_obj(doc)
+                except ValidationError as err:
+                    metrics.VALIDATION_FAILURES.inc(name, "")
+                    _log.warning(
+                        "Document %s in %s failed validation: %s",
+                        doc.get("_id"),
+                        name,
+                        err,
+                    )
+
+            return construct_model(model, doc)
+
+    def projection(self, fields: Sequence[str]) -> dict[str, bool]:
+        """Create a projection including only the given fields.
+
+        The first part of each dotted field path may be a field name or its
+        alias. `_id` is always included.
+
+        :param fields: The field paths to include.
+
+        :returns: The projection.
+        """
+        model_fields = self.Config.model_class.__fields__
+        paths = {"_id"}
+        for field in fields:
+            name, _, rest = field.partition(".")
+            if name in model_fields:
+                name = model_fields[name].alias
+            paths.add(f"{name}.{rest}" if rest else name)
+
+        # Mongo rejects a projection including both a field and its subfields.
+        return {
+            path: True
+            for path in sorted(paths)
+            if not any(path.startswith(f"{other}.") for other in paths)
+        }
 
-    async def find(self, *args, **kwargs) -> Iterator[_MT]:
+    async def find(
+        self,
+        *args,
+        validate: bool = True,
+        fields: Sequence[str] | None = None,
+        **kwargs,
+    ) -> Iterator[_MT]:
         """Find documents matching the arguments.
 
         :param args: Positional arguments passed to find.
+        :param validate: Whether to validate the documents. Only skip
+            validation for documents written by this application.
+        :param fields: The fields to fetch, or None to fetch whole documents.
+            Documents with only some fields cannot be validated, so they are
+            returned as partial models with only the fetched fields set.
         :param kwargs: Keyword arguments passed to find.
 
         :yields: Parsed models of matching documents.
         """
+        partial = fields is not None
+        if partial:
+            kwargs["projection"] = self.projection(fields)
+
         cursor = self.collection.find(*args, **kwargs)
         async for doc in cursor:
-            yield self.from_doc(doc)
+            yield self.from_doc(doc, validate=validate, partial=partial)
+
+    async def get(self, doc_id: ObjectId, validate: bool = True) -> _MT | None:
+        """Find a document by ID, using the cache if there is one.
+
+        Documents are only cached once they have been parsed, so cached
+        documents are not validated again.
+
+        :param doc_id: The ID of the document.
+        :param validate: Whether to validate the document.
+
+        :returns: The parsed document, or None if there is no such document.
+        """
+        cache = self.cache
+        # Found before reading, so that a write during the read changes it.
+        key = None if cache is None else await cache.doc_key(doc_id)
+        doc = None if cache is None else await cache.get_doc(key)
+        if doc is not None:
+            return self.from_doc(doc, validate=False)
+
+        with metrics.stage("mongo_find"):
+            doc = await self.collection.find_one({"_id": doc_id})
+        if doc is None:
+            return None
+
+        value = self.from_doc(doc, validate=validate)
+        if cache is not None:
+            await cache.set_doc(key, doc)
+        return value
+
+    async def find_one(
+        self, filter: Mapping[str, Any], validate: bool = True
+    ) -> _MT | None:
+        """Find a document matching the filter.
+
+        :param filter: The query filter.
+        :param validate: Whether to validate the document.
+
+        :returns: The parsed document, or None if no document matches.
+        """
+        with metrics.stage("mongo_find"):
+            doc = await self.collection.find_one(filter)
+        return None if doc is None else self.from_doc(doc, validate=validate)
+
+    async def find_after(
+        self,
+        filter: Mapping[str, Any] | None = None,
+        after: str | None = None,
+        **kwargs,
+    ) -> Iterator[_MT]:
+        """Find documents matching the filter in `_id` order.
+
+        :param filter: The query filter.
+        :param after: A page cursor. Only documents following it are returned.
+        :param kwargs: Keyword arguments passed to find.
+
+        :yields: Parsed models of matching documents.
+
+        :raises ValueError: If the cursor is not valid.
+        """
+        async for item in self.find(
+            _after_filter(filter, after), sort=[("_id", 1)], **kwargs
+        ):
+            yield item
+
+    async def find_page(
+        self,
+        filter: Mapping[str, Any] | None = None,
+        limit: int = 100,
+        after: str | None = None,
+        validate: bool = True,
+        fields: Sequence[str] | None = None,
+    ) -> Page[_MT]:
+        """Find a page of documents matching the filter.
+
+        Pages are ordered by `_id` and continue from the `after` cursor rather
+        than skipping documents, so each page costs the same regardless of how
+        deep into the results it is. Pages are cached if the collection has a
+        cache, once they have been parsed, so cached pages are not validated
+        again.
+
+        :param filter: The query filter.
+        :param limit: The maximum number of documents in the page.
+        :param after: The `next` cursor from the previous page.
+        :param validate: Whether to validate the documents.
+        :param fields: The fields to fetch, or None to fetch whole documents.
+            Documents with only some fields are not validated.
+
+        :returns: The page of parsed models.
+
+        :raises ValueError: If the cursor is not valid.
+        """
+        # Fetch one extra document to find out whether there is another page.
+        query = {
+            "filter": _after_filter(filter, after),
+            "sort": [("_id", 1)],
+            "limit": limit + 1,
+        }
+        partial = fields is not None
+        if partial:
+            query["projection"] = self.projection(fields)
+
+        cache = self.cache
+        # Found before reading, so that a write during the read changes it.
+        key = None if cache is None else await cache.query_key(query)
+        docs = None if cache is None else await cache.get_docs(key)
+        if docs is not None:
+            items = [
+                self.from_doc(doc, validate=False, partial=partial) for doc in docs
+            ]
+        else:
+            with metrics.stage("mongo_find"):
+                docs = await self.collection.find(**query).to_list(None)
+            items = [
+                self.from_doc(doc, validate=validate, partial=partial) for doc in docs
+            ]
+            if cache is not None:
+                await cache.set_docs(key, docs)
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(items[-1].id)
+
+        # The items have already been parsed, so skip validating them again.
+        return Page[self.Config.model_class].construct(items=items, next=next_cursor)
 
     async def insert_one(self, value: _MT) -> _MT:
         """Insert the document into the database.
 
+        Concurrent inserts are written together if the collection has a
+        batcher, which may delay each insert by up to its `max_delay`.
+
         :param value: The value to insert.
 
         :returns: The inserted value. The returned value will have its `id`
             field set to the ID attached to the document on insertion.
         """
-        result = await self.collection.insert_one(value.dict())
+        insert_one = self.collection.insert_one
+        if self.batcher is not None:
+            insert_one = self.batcher.insert_one
+        with metrics.stage("mongo_insert"):
+            result = await insert_one(value.dict())
         if result.acknowledged:
             value.id = result.inserted_id
+        await self._invalidate()
         return value
 
+    async def insert_many(
+        self, values: Sequence[_MT], batch_size: int = 1000
+    ) -> dict[int, str]:
+        """Insert the documents into the database.
+
+        Documents are written with unordered inserts of up to `batch_size`
+        documents, so a document that fails to insert does not prevent the
+        others from being written. If a whole batch fails, for example because
+        the connection is lost, all of its documents are reported as failed and
+        the other batches are still written.
+
+        :param values: The values to insert. Each inserted value will have its
+            `id` field set to the ID attached to the document on insertion.
+        :param batch_size: The maximum number of documents per insert.
+
+        :returns: Error messages for the values that were not inserted, keyed
+            by their index in `values`.
+        """
+        docs = [value.dict() for value in values]
+        errors = {}
+        for offset in range(0, len(docs), batch_size):
+            try:
+                with metrics.stage("mongo_insert"):
+                    await self.collection.insert_many(
+                        docs[offset : offset + batch_size], ordered=False
+                    )
+            except BulkWriteError as err:
+                for write_error in err.details.get("writeErrors", []):
+                    errors[offset + write_error["index"]] = write_error["errmsg"]
+            except PyMongoError as err:
+                _log.warning("Failed to insert documents %d onwards: %s", offset, err)
+                for index in range(offset, min(offset + batch_size, len(docs))):
+                    errors[index] = str(err)
+        await self._invalidate()
+
+        # The driver sets the generated _id on each document it sends.
+        for index, (value, doc) in enumerate(zip(values, docs, strict=True)):
+            if index not in errors and "_id" in doc:
+                value.id = doc["_id"]
+
+        return errors
+
+    async def update_one(
+        self,
+        filter: Mapping[str, Any],
+        update: Mapping[str, Any],
+        validate: bool = True,
+    ) -> _MT | None:
+        """Update a document matching the filter.
+
+        The document is matched and updated atomically, so the filter can hold
+        preconditions for the update.
+
+        :param filter: The query filter.
+        :param update: The update to apply.
+        :param validate: Whether to validate the updated document.
+
+        :returns: The updated document, or None if no document matches.
+        """
+        with metrics.stage("mongo_update"):
+            doc = await self.collection.find_one_and_update(
+                filter, update, return_document=ReturnDocument.AFTER
+            )
+        if doc is None:
+            return None
+
+        await self._invalidate(doc["_id"])
+        return self.from_doc(doc, validate=validate)
+
+    async def update_many(
+        self, filter: Mapping[str, Any], update: Mapping[str, Any]
+    ) -> int:
+        """Update all documents matching the filter.
 
-def collection(model: type[DatabaseModel], collection: str):
+        The update is applied by the server in a single operation.
+
+        :param filter: The query filter.
+        :param update: The update to apply.
+
+        :returns: The number of documents updated.
+        """
+        with metrics.stage("mongo_update"):
+            result = await self.collection.update_many(filter, update)
+        if result.modified_count and self.cache is not None:
+            await self.cache.invalidate_all()
+        return result.modified_count
+
+    async def _invalidate(self, doc_id: ObjectId | None = None) -> None:
+        if self.cache is not None:
+            await self.cache.invalidate(doc_id)
+
+    async def ensure_indexes(self) -> list[str]:
+        """Create the declared indexes which do not already exist.
+
+        Creating an index identical to an existing one does nothing, so this is
+        safe to call repeatedly.
+
+        :returns: The names of the declared indexes.
+        """
+        if not self.Config.indexes:
+            return []
+
+        return await self.collection.create_indexes(self.Config.indexes)
+
+    async def index_report(self) -> IndexReport:
+        """Compare the declared indexes with those in the database.
+
+        :returns: The index report.
+        """
+        declared = {index.document["name"] for index in self.Config.indexes}
+        existing = set(await self.collection.index_information()) - {"_id_"}
+
+        try:
+            unused = sorted(
+                [
+                    stats["name"]
+                    async for stats in self.collection.aggregate(
+                        [{"$indexStats": {}}]
+                    )
+                    if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0
+                ]
+            )
+        except OperationFailure:
+            unused = None
+
+        return IndexReport(
+            collection=self.Config.collection_name,
+            missing=sorted(declared - existing),
+            undeclared=sorted(existing - declared),
+            unused=unused,
+        )
+
+
+def _after_filter(
+    filter: Mapping[str, Any] | None, after: str | None
+) -> dict[str, Any]:
+    """Restrict a query filter to the documents following a page cursor.
+
+    :param filter: The query filter.
+    :param after: A page cursor, if any.
+
+    :returns: The restricted filter.
+
+    :raises ValueError: If the cursor is not valid.
+    """
+    filter = dict(filter or {})
+    if after is not None:
+        filter["_id"] = {"$gt": decode_cursor(after)}
+    return filter
+
+
+def collection(
+    model: type[DatabaseModel],
+    collection: str,
+    indexes: Sequence[IndexModel] = (),
+):
     """Class decorator for creating collections.
 
     :param model: The model class for the documents in the collection.
     :param collection: The name of the collection in the database.
+    :param indexes: The indexes for the collection. Each index must be named.
 
     :returns: A Collection[model] class.
     """
 
+    index_models = list(indexes)
+
     def _decorator(cls):
         class _Collection(cls, Collection[model]):
             class Config:
                 collection_name = collection
                 model_class = model
+                indexes = index_models
 
         _Collection.__name__ = cls.__name__
 
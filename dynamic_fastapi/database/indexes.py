@@ -0,0 +1,39 @@
+"""Index management for all collections."""
+from logging import getLogger
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from dynamic_fastapi.database.collection import Collection, IndexReport
+from dynamic_fastapi.database.task_types import TaskTypeCollection
+from dynamic_fastapi.database.windows import WindowCollection
+
+_log = getLogger(__name__)
+
+COLLECTIONS: list[type[Collection]] = [TaskTypeCollection, WindowCollection]
+"""The collections used by the application."""
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """Create the declared indexes for every collection.
+
+    :param db: The database connection.
+    """
+    for collection_class in COLLECTIONS:
+        names = await collection_class(db).ensure_indexes()
+        _log.info(
+            "Ensured indexes on %s: %s",
+            collection_class.Config.collection_name,
+            ", ".join(names),
+        )
+
+
+async def index_reports(db: AsyncIOMotorDatabase) -> list[IndexReport]:
+    """Compare the declared and existing indexes for every collection.
+
+    :param db: The database connection.
+
+    :returns: The report for each collection.
+    """
+    return [
+        await collection_class(db).index_report() for collection_class in COLLECTIONS
+    ]
@@ -1,19 +1,155 @@
 """Task type collections."""
+from collections.abc import Iterable
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, NamedTuple
+
+import orjson
+from pydantic import ValidationError
+from pymongo import ASCENDING, IndexModel
+
 from dynamic_fastapi.database.collection import collection
 from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
 
 
-@collection(TaskType, "task_types")
+@collection(
+    TaskType,
+    "task_types",
+    indexes=[IndexModel([("name", ASCENDING)], name="name", unique=True)],
+)
 class TaskTypeCollection:
     """Collection for task types."""
 
     pass
 
 
-async def register_types_from_db(task_types_db: TaskTypeCollection) -> None:
+class TaskTypeSnapshot(NamedTuple):
+    """Task types saved to a snapshot file."""
+
+    version: str
+    """Hash of the task types, which changes whenever any of them does."""
+    task_types: list[TaskType]
+    """The task types."""
+
+
+async def read_types_from_db(task_types_db: TaskTypeCollection) -> list[TaskType]:
+    """Read every task type in the database.
+
+    Reading every task type before registering any means that a failed read
+    leaves the registry unchanged.
+
+    :param task_types_db: The task type collection.
+
+    :returns: The task types.
+    """
+    return [task_type async for task_type in task_types_db.find()]
+
+
+async def register_types_from_db(task_types_db: TaskTypeCollection) -> bool:
     """Register the task types loaded in the database.
 
     :param task_types_db: The task type collection.
+
+    :returns: Whether any task type was added or changed.
+    """
+    return register_types(await read_types_from_db(task_types_db))
+
+
+def snapshot_version(task_types: Iterable[TaskType]) -> str:
+    """Hash task types, as saved in a snapshot.
+
+    :param task_types: The task types.
+
+    :returns: The hash, which is the same for the same task types in any order.
+    """
+    return _version(_snapshot_docs(task_types))
+
+
+def save_snapshot(path: str | Path, task_types: Iterable[TaskType]) -> str:
+    """Save task types to a snapshot file.
+
+    A snapshot lets processes register task types without reading them from
+    the database. The file is replaced in a single step, so readers never see
+    a partly written snapshot.
+
+    :param path: The file to write.
+    :param task_types: The task types.
+
+    :returns: The version of the snapshot.
+    """
+    docs = _snapshot_docs(task_types)
+    version = _version(docs)
+    path = Path(path)
+    partial = path.with_name(f".{path.name}.tmp")
+    partial.write_bytes(orjson.dumps({"version": version, "task_types": docs}))
+    partial.replace(path)
+    return version
+
+
+def load_snapshot(path: str | Path) -> TaskTypeSnapshot:
+    """Load task types from a snapshot file.
+
+    :param path: The snapshot file written by `save_snapshot`.
+
+    :returns: The snapshot.
+
+    :raises OSError: If the file cannot be read.
+    :raises ValueError: If the file is not a valid snapshot.
     """
-    async for task_type in task_types_db.find():
-        TaskTypeRegistry.register(task_type)
+    try:
+        snapshot = orjson.loads(Path(path).read_bytes())
+        version, docs = snapshot["version"], snapshot["task_types"]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as err:
+        raise ValueError(f"Invalid task type snapshot: {path}") from err
+
+    if _version(docs) != version:
+        raise ValueError(f"Task type snapshot does not match its version: {path}")
+
+    try:
+        task_types = [TaskType.parse_obj(doc) for doc in docs]
+    except ValidationError as err:
+        raise ValueError(f"Invalid task type in snapshot: {path}") from err
+
+    return TaskTypeSnapshot(version, task_types)
+
+
+def register_types_from_snapshot(path: str | Path) -> bool:
+    """Register the task types saved in a snapshot file.
+
+    :param path: The snapshot file written by `save_snapshot`.
+
+    :returns: Whether any task type was added or changed.
+
+    :raises OSError: If the file cannot be read.
+    :raises ValueError: If the file is not a valid snapshot.
+    """
+    return register_types(load_snapshot(path).task_types)
+
+
+def register_types(task_types: Iterable[TaskType]) -> bool:
+    """Register task types.
+
+    Registered task types which are not among them stay registered, so that
+    their windows can still be read.
+
+    :param task_types: The task types.
+
+    :returns: Whether any task type was added or changed.
+    """
+    changed = False
+    for task_type in task_types:
+        changed = TaskTypeRegistry.register(task_type) or changed
+
+    return changed
+
+
+def _snapshot_docs(task_types: Iterable[TaskType]) -> list[dict[str, Any]]:
+    docs = [
+        {**task_type.dict(by_alias=True), "_id": str(task_type.id)}
+        for task_type in task_types
+    ]
+    return sorted(docs, key=lambda doc: doc["name"])
+
+
+def _version(docs: list[dict[str, Any]]) -> str:
+    return sha256(orjson.dumps(docs, option=orjson.OPT_SORT_KEYS)).hexdigest()
@@ -1,22 +1,202 @@
 """Windows collections."""
-from collections.abc import Mapping
+from collections.abc import Mapping, Sequence
 from typing import Any
 
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from dynamic_fastapi import metrics
 from dynamic_fastapi.database.collection import collection
 from dynamic_fastapi.model.task_type import TaskTypeRegistry
-from dynamic_fastapi.model.window import Window
+from dynamic_fastapi.model.window import Window, WindowFilter, WindowState
 
 
-@collection(Window, "windows")
+@collection(
+    Window,
+    "windows",
+    indexes=[
+        # Listing pages through windows by _id, so filtered fields are indexed
+        # together with _id to serve both the filter and the sort.
+        IndexModel(
+            [("params.task_type", ASCENDING), ("_id", ASCENDING)], name="task_type"
+        ),
+        IndexModel([("state", ASCENDING), ("_id", ASCENDING)], name="state"),
+        IndexModel(
+            [("params.datasources", ASCENDING), ("_id", ASCENDING)],
+            name="datasources",
+        ),
+        IndexModel([("params.start_time", ASCENDING)], name="start_time"),
+        IndexModel([("params.stop_time", ASCENDING)], name="stop_time"),
+        IndexModel(
+            [
+                ("state", ASCENDING),
+                ("params.datasources", ASCENDING),
+                ("params.start_time", ASCENDING),
+                ("params.stop_time", ASCENDING),
+            ],
+            name="state_datasources_time",
+        ),
+        # Keys are scoped to their task type. Only windows created with a key
+        # are indexed, so windows without one do not conflict.
+        IndexModel(
+            [("params.task_type", ASCENDING), ("idempotency_key", ASCENDING)],
+            name="task_type_idempotency_key",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$type": "string"}},
+        ),
+    ],
+)
 class WindowCollection:
     """Collection for windows."""
 
-    def from_doc(self, doc: Mapping[str, Any]) -> Window:
-        """Parse the doc using the task type-specific window.
+    def model_for(self, doc: Mapping[str, Any]) -> type[Window]:
+        """The task type-specific window model for a document.
 
         :param doc: The window document.
 
-        :returns: The parsed window document.
+        :returns: The window model for the document's task type.
+        """
+        return TaskTypeRegistry.models(doc["params"]["task_type"]).window_model
+
+    async def insert_once(
+        self, window: Window, validate: bool = True
+    ) -> tuple[Window, bool]:
+        """Insert a window, unless its task type has one with its idempotency key.
+
+        :param window: The window to insert.
+        :param validate: Whether to validate an existing window read.
+
+        :returns: The inserted window, or the existing window with the same
+            task type and idempotency key, and whether the window was inserted.
+
+        :raises DuplicateKeyError: If the window conflicts with another for any
+            reason other than its idempotency key.
+        """
+        try:
+            return await self.insert_one(window), True
+        except DuplicateKeyError:
+            if window.idempotency_key is None:
+                raise
+            existing = await self.find_one(
+                {
+                    "params.task_type": window.params.task_type,
+                    "idempotency_key": window.idempotency_key,
+                },
+                validate=validate,
+            )
+            if existing is None:
+                raise
+            return existing, False
+
+    def projection(self, fields: Sequence[str]) -> dict[str, bool]:
+        """Create a projection including only the given fields.
+
+        The task type is always included, as it selects the window model.
+
+        :param fields: The field paths to include.
+
+        :returns: The projection.
+        """
+        return super().projection([*fields, "params.task_type"])
+
+    @staticmethod
+    def filter_query(window_filter: WindowFilter) -> dict[str, Any]:
+        """Convert a window filter to a mongo query.
+
+        :param window_filter: The window filter.
+
+        :returns: The query matching windows selected by the filter.
+        """
+        query = {}
+        if window_filter.task_types:
+            query["params.task_type"] = {"$in": window_filter.task_types}
+        if window_filter.state is not None:
+            query["state"] = window_filter.state.value
+        if window_filter.datasource is not None:
+            query["params.datasources"] = window_filter.datasource
+
+        time_ranges = (
+            ("params.start_time", window_filter.start_after, window_filter.start_before),
+            ("params.stop_time", window_filter.stop_after, window_filter.stop_before),
+        )
+        for field, after, before in time_ranges:
+            time_range = {}
+            if after is not None:
+                time_range["$gte"] = after
+            if before is not None:
+                time_range["$lt"] = before
+            if time_range:
+                query[field] = time_range
+
+        return query
+
+    @staticmethod
+    def _close_update(state: WindowState) -> dict[str, Any]:
+        if state is WindowState.OPEN:
+            raise ValueError("Windows can only be closed to a terminal state")
+
+        return {"$set": {"state": state.value}, "$inc": {"version": 1}}
+
+    async def close(
+        self, window_id: ObjectId, state: WindowState, validate: bool = True
+    ) -> Window | None:
+        """Move an open window to a terminal state.
+
+        :param window_id: The ID of the window.
+        :param state: The terminal state.
+        :param validate: Whether to validate the updated window.
+
+        :returns: The updated window, or None if there is no open window with
+            the ID.
+
+        :raises ValueError: If the state is not a terminal state.
+        """
+        return await self.update_one(
+            {"_id": window_id, "state": WindowState.OPEN.value},
+            self._close_update(state),
+            validate=validate,
+        )
+
+    async def version(self, window_id: ObjectId) -> int | None:
+        """Find the version of a window, without reading the rest of it.
+
+        :param window_id: The ID of the window.
+
+        :returns: The version of the window, or None if there is no such
+            window.
+        """
+        with metrics.stage("mongo_find"):
+            doc = await self.collection.find_one(
+                {"_id": window_id}, projection={"version": True}
+            )
+        return None if doc is None else doc["version"]
+
+    async def open_ids(self, query: Mapping[str, Any]) -> list[ObjectId]:
+        """Find the IDs of the open windows matching a query.
+
+        :param query: The query for the windows.
+
+        :returns: The IDs of the windows.
+        """
+        with metrics.stage("mongo_find"):
+            docs = await self.collection.find(
+                {"$and": [query, {"state": WindowState.OPEN.value}]},
+                projection={"_id": True},
+            ).to_list(None)
+        return [doc["_id"] for doc in docs]
+
+    async def close_many(self, query: Mapping[str, Any], state: WindowState) -> int:
+        """Move all open windows matching a query to a terminal state.
+
+        :param query: The query for the windows to close.
+        :param state: The terminal state.
+
+        :returns: The number of windows closed.
+
+        :raises ValueError: If the state is not a terminal state.
         """
-        task_type = TaskTypeRegistry.task_type(doc["params"]["task_type"])
-        return Window[task_type.params_model].parse_obj(doc)
+        return await self.update_many(
+            {"$and": [query, {"state": WindowState.OPEN.value}]},
+            self._close_update(state),
+        )
@@ -0,0 +1,376 @@
+"""Metrics for dynamic_fastapi.
+
+Metrics are collected in process and rendered in the Prometheus text format.
+They are disabled by default, in which case recording a metric returns
+immediately, and timing a stage costs a single check.
+
+Timed stages are labelled with the route and task type of the current
+request, which are held in context variables set by the route handling the
+request.
+"""
+from bisect import bisect_left
+from collections.abc import Sequence
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+"""Media type of the rendered metrics."""
+
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+"""Upper bounds in seconds of the default histogram buckets."""
+
+current_route: ContextVar[str] = ContextVar("current_route", default="")
+"""The route template of the request being handled."""
+current_task_type: ContextVar[str] = ContextVar("current_task_type", default="")
+"""The task type of the request being handled, if it has one."""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return f"{{{pairs}}}"
+
+
+class _Metric:
+    """A metric with a value for each combination of label values."""
+
+    kind: str
+
+    def __init__(
+        self, registry: "Registry", name: str, help: str, labels: Sequence[str] = ()
+    ):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+        self._values: dict[tuple[str, ...], object] = {}
+        registry.add(self)
+
+    def _key(self, labels: Sequence[str]) -> tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} has labels {self.label_names}")
+        return tuple(str(label) for label in labels)
+
+    def clear(self) -> None:
+        """Remove every recorded value."""
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> list[str]:
+        """Render the metric in the Prometheus text format.
+
+        :returns: The lines of the metric.
+        """
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels: tuple[str, ...], value: object) -> list[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"]
+
+
+class Counter(_Metric):
+    """A count which only goes up."""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the count.
+
+        :param labels: The label values, in the order of the label names.
+        :param amount: The amount to increase the count by.
+        """
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value which can go up and down."""
+
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        """Increase the value.
+
+        :param labels: The label values, in the order of the label names.
+        :param amount: The amount to increase the value by.
+        """
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        """Decrease the value.
+
+        :param labels: The label values, in the order of the label names.
+        :param amount: The amount to decrease the value by.
+        """
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    """A distribution of observed values, counted in buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """Create a Histogram.
+
+        :param registry: The registry holding the metric.
+        :param name: The name of the metric.
+        :param help: The description of the metric.
+        :param labels: The names of the labels.
+        :param buckets: The increasing upper bounds of the buckets.
+        """
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str) -> None:
+        """Record a value.
+
+        :param value: The observed value.
+        :param labels: The label values, in the order of the label names.
+        """
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Bucket counts, with the last counting values above every
+                # bucket, followed by the sum of the values.
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def _render_value(self, labels: tuple[str, ...], value: object) -> list[str]:
+        names = (*self.label_names, "le")
+        lines, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), value[:-1], strict=True):
+            total += count
+            bucket_labels = _format_labels(names, (*labels, str(bound)))
+            lines.append(f"{self.name}_bucket{bucket_labels} {total}")
+
+        formatted = _format_labels(self.label_names, labels)
+        lines.append(f"{self.name}_sum{formatted} {value[-1]}")
+        lines.append(f"{self.name}_count{formatted} {total}")
+        return lines
+
+
+class Registry:
+    """A set of metrics rendered together."""
+
+    def __init__(self):
+        self.enabled = False
+        """Whether metrics are recorded."""
+        self._metrics: dict[str, _Metric] = {}
+
+    def add(self, metric: _Metric) -> None:
+        """Add a metric to the registry.
+
+        :param metric: The metric.
+
+        :raises ValueError: If the registry already has a metric with the name.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def clear(self) -> None:
+        """Remove every recorded value."""
+        for metric in self._metrics.values():
+            metric.clear()
+
+    def render(self) -> bytes:
+        """Render every metric in the Prometheus text format.
+
+        :returns: The rendered metrics.
+        """
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return ("\n".join(lines) + "\n").encode()
+
+
+REGISTRY = Registry()
+"""The registry of the application metrics."""
+
+REQUEST_DURATION = Histogram(
+    REGISTRY,
+    "dynamic_fastapi_request_duration_seconds",
+    "Time spent handling requests.",
+    ["route", "method", "status"],
+)
+STAGE_DURATION = Histogram(
+    REGISTRY,
+    "dynamic_fastapi_stage_duration_seconds",
+    "Time spent in each stage of handling requests.",
+    ["stage", "route", "task_type"],
+)
+DOCUMENTS_DECODED = Counter(
+    REGISTRY,
+    "dynamic_fastapi_documents_decoded_total",
+    "Documents read from the database and parsed to models.",
+    ["collection", "validated"],
+)
+VALIDATION_FAILURES = Counter(
+    REGISTRY,
+    "dynamic_fastapi_validation_failures_total",
+    "Requests and documents which failed validation.",
+    ["source", "task_type"],
+)
+CACHE_REQUESTS = Counter(
+    REGISTRY,
+    "dynamic_fastapi_cache_requests_total",
+    "Reads from the collection caches.",
+    ["cache", "result"],
+)
+INSERT_BATCH_SIZE = Histogram(
+    REGISTRY,
+    "dynamic_fastapi_insert_batch_size",
+    "Documents written by each batched insert.",
+    ["collection"],
+    buckets=[1, 2, 5, 10, 20, 50, 100, 200, 500],
+)
+MONGO_CONNECTIONS = Gauge(
+    REGISTRY,
+    "dynamic_fastapi_mongo_connections",
+    "Connections in the mongo connection pools.",
+    ["state"],
+)
+MONGO_CHECKOUT_FAILURES = Counter(
+    REGISTRY,
+    "dynamic_fastapi_mongo_checkout_failures_total",
+    "Failures to check a connection out of a mongo connection pool.",
+    ["reason"],
+)
+
+
+class _StageTimer:
+    """Times a stage, labelled with the current route and task type."""
+
+    __slots__ = ("stage", "task_type", "_begin")
+
+    def __init__(self, stage: str, task_type: str | None):
+        self.stage = stage
+        self.task_type = task_type
+
+    def __enter__(self) -> None:
+        self._begin = perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        STAGE_DURATION.observe(
+            perf_counter() - self._begin,
+            self.stage,
+            current_route.get(),
+            self.task_type or current_task_type.get(),
+        )
+
+
+_NOT_TIMED = nullcontext()
+
+
+def stage(name: str, task_type: str | None = None) -> AbstractContextManager:
+    """Time a stage of handling a request.
+
+    :param name: The name of the stage, e.g. `decode` or `mongo_find`.
+    :param task_type: The task type to label the stage with, if not the task
+        type of the current request.
+
+    :returns: A context manager timing its body, which does nothing if
+        metrics are disabled.
+    """
+    if not REGISTRY.enabled:
+        return _NOT_TIMED
+    return _StageTimer(name, task_type)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Track the mongo connection pools in the connection gauges.
+
+    Pass an instance to the client's `event_listeners`.
+    """
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        MONGO_CONNECTIONS.inc("open")
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        MONGO_CONNECTIONS.dec("open")
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        pass
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        MONGO_CHECKOUT_FAILURES.inc(event.reason)
+
+    def connection_checked_out(
+        self, event: monitoring.ConnectionCheckedOutEvent
+    ) -> None:
+        MONGO_CONNECTIONS.inc("in_use")
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        MONGO_CONNECTIONS.dec("in_use")
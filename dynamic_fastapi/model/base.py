@@ -1,8 +1,13 @@
 """Base models for dynamic_fastapi."""
-from typing import Any
+from collections.abc import Mapping
+from typing import Any, TypeVar
 
 from bson.objectid import ObjectId
 from pydantic import BaseModel, Field
+from pydantic.fields import SHAPE_SINGLETON
+from pydantic.utils import lenient_issubclass
+
+_BMT = TypeVar("_BMT", bound=BaseModel)
 
 
 class PydanticObjectId(ObjectId):
@@ -51,3 +56,36 @@ class DatabaseModel(BaseModel):
 
     id: PydanticObjectId = Field(default_factory=PydanticObjectId, alias="_id")
     """Mongo ID."""
+
+
+def construct_model(model: type[_BMT], values: Mapping[str, Any]) -> _BMT:
+    """Build a model from trusted values without validating them.
+
+    Values may be given by field name or alias, and nested models are built
+    recursively. Values are otherwise used as they are, so this is only
+    suitable for data which has already been validated, such as documents
+    written by this application.
+
+    :param model: The model class.
+    :param values: The field values.
+
+    :returns: The model instance.
+    """
+    fields = {}
+    for name, field in model.__fields__.items():
+        if field.alias in values:
+            value = values[field.alias]
+        elif name in values:
+            value = values[name]
+        else:
+            continue
+
+        if (
+            field.shape == SHAPE_SINGLETON
+            and lenient_issubclass(field.type_, BaseModel)
+            and isinstance(value, Mapping)
+        ):
+            value = construct_model(field.type_, value)
+        fields[name] = value
+
+    return model.construct(**fields)
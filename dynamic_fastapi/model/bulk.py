@@ -0,0 +1,27 @@
+"""Bulk operation models for dynamic_fastapi."""
+from typing import Any
+
+from bson.objectid import ObjectId
+from pydantic import BaseModel, Field
+
+from dynamic_fastapi.model.base import PydanticObjectId
+
+
+class BulkItemResult(BaseModel):
+    """Outcome for a single item of a bulk request."""
+
+    class Config:
+        # Required to map the id field to a string when creating JSON.
+        json_encoders = {ObjectId: str}
+
+    id: PydanticObjectId | None = None
+    """The ID of the created document, if it was created."""
+    errors: list[dict[str, Any]] = Field(default_factory=list)
+    """The reasons the item was not created."""
+
+
+class BulkUpdateResult(BaseModel):
+    """Outcome of a bulk update."""
+
+    updated: int
+    """The number of documents updated."""
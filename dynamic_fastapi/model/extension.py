@@ -1,7 +1,8 @@
 """Window extensions."""
 from abc import ABC, abstractmethod
+from functools import cache
 
-from pydantic import constr
+from pydantic import ConstrainedStr, constr
 from pydantic.fields import FieldInfo
 
 
@@ -23,6 +24,9 @@ class Extension(ABC):
     __registry__: dict[str, type["Extension"]] = {}
     """Mapping of extension names to classes."""
 
+    __instances__: dict[tuple[str, frozenset], "Extension"] = {}
+    """Extension instances by name and constructor arguments."""
+
     @classmethod
     def register(cls, ext_class: type["Extension"]) -> type["Extension"]:
         """Register an Extension class.
@@ -31,19 +35,36 @@ class Extension(ABC):
 
         :returns: The registered class.
         """
-        cls.__registry__[ext_class.__ext_name__] = ext_class
+        ext_name = ext_class.__ext_name__
+        cls.__registry__[ext_name] = ext_class
+        # Drop instances of any class previously registered with the name.
+        for key in [key for key in cls.__instances__ if key[0] == ext_name]:
+            del cls.__instances__[key]
         return ext_class
 
     @classmethod
     def extension(cls, ext_name, **kwargs) -> "Extension":
         """Return an extension instance.
 
+        Instances are shared by every task type using the extension with the
+        same arguments, so extensions must not be modified once created.
+        Arguments which cannot be hashed create a new instance every time.
+
         :param ext_name: The name of the extension.
         :param kwargs: Keyword arguments passed to the extension constructor.
 
         :returns: An instance of the extension.
         """
-        return cls.__registry__[ext_name](**kwargs)
+        try:
+            key = (ext_name, frozenset(kwargs.items()))
+        except TypeError:
+            return cls.__registry__[ext_name](**kwargs)
+
+        instance = cls.__instances__.get(key)
+        if instance is None:
+            instance = cls.__registry__[ext_name](**kwargs)
+            cls.__instances__[key] = instance
+        return instance
 
     @abstractmethod
     def field_definitions(self) -> dict[str, (type, FieldInfo)]:
@@ -53,6 +74,20 @@ class Extension(ABC):
 extension = Extension.register
 
 
+@cache
+def _regex_str(regex: str) -> type[ConstrainedStr]:
+    """Create a string type matching a regex.
+
+    Types are shared by every field with the same regex, and the regex is
+    compiled once when the type is created.
+
+    :param regex: The regex.
+
+    :returns: The constrained string type.
+    """
+    return constr(regex=regex)
+
+
 @extension
 class KeyNonceExtension(Extension):
     """Add a key/nonce pair to the window parameters.
@@ -79,15 +114,18 @@ class KeyNonceExtension(Extension):
 
         self.key_len = key_len
         self.nonce_len = nonce_len
+        self._key_type = _regex_str(self.hex16_re(key_len))
+        self._nonce_type = _regex_str(self.hex16_re(nonce_len))
 
     def field_definitions(self) -> dict[str, (type, FieldInfo)]:
         """The field definitions.
 
         :returns: A dict with definitions for the "key" and "nonce" fields.
         """
+        # Field infos are updated by the models using them, so are not shared.
         return {
-            "key": (constr(regex=self.hex16_re(self.key_len)), FieldInfo(...)),
-            "nonce": (constr(regex=self.hex16_re(self.nonce_len)), FieldInfo(...)),
+            "key": (self._key_type, FieldInfo(...)),
+            "nonce": (self._nonce_type, FieldInfo(...)),
         }
 
     def hex16_re(self, val: int) -> str:
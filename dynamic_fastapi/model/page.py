@@ -0,0 +1,20 @@
+"""Paginated response models for dynamic_fastapi."""
+from typing import Generic, TypeVar
+
+from bson.objectid import ObjectId
+from pydantic.generics import GenericModel
+
+_T = TypeVar("_T")
+
+
+class Page(GenericModel, Generic[_T]):
+    """A page of results from a collection."""
+
+    class Config:
+        # Required to map document ids to strings when creating JSON.
+        json_encoders = {ObjectId: str}
+
+    items: list[_T]
+    """The results in this page."""
+    next: str | None = None
+    """Cursor for the following page, or None if this is the last page."""
@@ -2,14 +2,14 @@
 from collections.abc import Sequence
 from enum import Enum
 from logging import getLogger
-from typing import Any, Literal
+from typing import Any, Literal, NamedTuple
 
 from pydantic import Field, ValidationError, constr, create_model, validator
 from pydantic.fields import FieldInfo
 
 from dynamic_fastapi.model.base import DatabaseModel
 from dynamic_fastapi.model.extension import Extension
-from dynamic_fastapi.model.window import WindowParams
+from dynamic_fastapi.model.window import Window, WindowParams
 
 _log = getLogger(__name__)
 
@@ -61,11 +61,12 @@ class TaskType(DatabaseModel):
 
     @property
     def params_model(self) -> type[WindowParams]:
-        """Pydantic mode for the task type parameters."""
+        """Pydantic mode for the task type parameters.
 
+        A new model is built on every access. Registered task types should use
+        the models cached by `TaskTypeRegistry.models` instead.
+        """
         params_model_name = f"{self.name.upper()}_WindowParams"
-        if params_model_name in globals():
-            return globals()[params_model_name]
 
         # Construct an enum to store the task type so that we can use the value
         # in a Literal for Pydantic validation. This is mostly to be compliant
@@ -79,29 +80,70 @@ class TaskType(DatabaseModel):
             ext = Extension.extension(ext_name, **ext_args)
             kwargs.update(ext.field_definitions())
 
-        globals()[params_model_name] = model = create_model(
+        return create_model(
             params_model_name,
             __base__=WindowParams,
             __module__=self.__module__,
             **kwargs,
         )
 
-        return model
+
+class TaskTypeModels(NamedTuple):
+    """Models generated for a task type."""
+
+    params_model: type[WindowParams]
+    """The window parameters model."""
+    window_model: type[Window]
+    """The window model using the parameters model."""
+
+    @classmethod
+    def build(cls, task_type: TaskType) -> "TaskTypeModels":
+        """Build the models for a task type.
+
+        :param task_type: The task type.
+
+        :returns: The task type models.
+        """
+        params_model = task_type.params_model
+        return cls(params_model, Window[params_model])
 
 
 class TaskTypeRegistry:
     """Registry of all saved task types."""
 
     __task_types__: dict[TaskTypeName, TaskType] = {}
+    __models__: dict[TaskTypeName, TaskTypeModels] = {}
+    __version__: int = 0
+    """Incremented whenever a task type is added or changed."""
+    lazy: bool = False
+    """Whether models are built on first use rather than when registered."""
 
     @classmethod
-    def register(cls, task_type: TaskType) -> None:
+    def register(cls, task_type: TaskType) -> bool:
         """Register a task type.
 
+        The models for the task type are built when it is registered so that
+        they can be looked up directly when handling requests, unless the
+        registry is lazy, in which case they are built on first use.
+        Registering a task type identical to the one already registered does
+        nothing.
+
         :param task_type: The task type to register.
+
+        :returns: Whether the registry changed.
         """
+        if cls.__task_types__.get(task_type.name) == task_type:
+            return False
+
         _log.info("Registering task type: %s", task_type.name)
+        if cls.lazy:
+            # Drop the models of any previous version of the task type.
+            cls.__models__.pop(task_type.name, None)
+        else:
+            cls.__models__[task_type.name] = TaskTypeModels.build(task_type)
         cls.__task_types__[task_type.name] = task_type
+        cls.__version__ += 1
+        return True
 
     @classmethod
     def task_type(cls, name: TaskTypeName) -> TaskType:
@@ -111,6 +153,26 @@ class TaskTypeRegistry:
         """
         return cls.__task_types__[name]
 
+    @classmethod
+    def models(cls, name: TaskTypeName) -> TaskTypeModels:
+        """Retrieve the models for a task type.
+
+        The models are built if they have not been yet.
+
+        :param name: The name of the task type.
+        """
+        models = cls.__models__.get(name)
+        if models is None:
+            task_type = cls.__task_types__[name]
+            _log.info("Building models for task type: %s", name)
+            models = cls.__models__[name] = TaskTypeModels.build(task_type)
+        return models
+
+    @classmethod
+    def version(cls) -> int:
+        """The current version of the registry."""
+        return cls.__version__
+
     @classmethod
     def task_types(cls) -> Sequence[TaskType]:
         """Retrieve all task types."""
@@ -1,9 +1,10 @@
 """Window models for dynamic_fastapi."""
+from collections.abc import Sequence
 from datetime import datetime
 from enum import Enum
-from typing import Generic, TypeVar
+from typing import Generic, TypeVar, Union
 
-from pydantic import BaseModel, conlist
+from pydantic import BaseModel, Field, conlist, create_model
 from pydantic.generics import GenericModel
 
 from dynamic_fastapi.model.base import DatabaseModel
@@ -48,3 +49,54 @@ class Window(DatabaseModel, GenericModel, Generic[_WPT]):
     """Window creation parameters."""
     state: WindowState = WindowState.OPEN
     """Current window state."""
+    version: int = 0
+    """Number of times the window has been updated, used as its ETag."""
+    idempotency_key: str | None = None
+    """Key sent by the client creating the window, identifying retries."""
+
+
+def window_union(params_models: Sequence[type[WindowParams]]) -> type[Window]:
+    """Create a window model accepting parameters for any of the given models.
+
+    The parameters are a union discriminated by `task_type`, so a window is
+    validated against the one parameters model for its task type rather than
+    trying each model in turn.
+
+    :param params_models: The parameters models, each with a distinct
+        `Literal` task type.
+
+    :returns: The window model.
+    """
+    if not params_models:
+        return Window[WindowParams]
+    if len(params_models) == 1:
+        return Window[params_models[0]]
+
+    return create_model(
+        "AnyWindow",
+        __base__=Window,
+        __module__=__name__,
+        params=(
+            Union[tuple(params_models)],  # noqa: UP007
+            Field(..., discriminator="task_type"),
+        ),
+    )
+
+
+class WindowFilter(BaseModel):
+    """Filter for window queries."""
+
+    task_types: list[str] = Field(default_factory=list)
+    """Only include windows with one of these task types."""
+    state: WindowState | None = None
+    """Only include windows in this state."""
+    datasource: str | None = None
+    """Only include windows using this datasource."""
+    start_after: datetime | None = None
+    """Only include windows starting at or after this time."""
+    start_before: datetime | None = None
+    """Only include windows starting before this time."""
+    stop_after: datetime | None = None
+    """Only include windows stopping at or after this time."""
+    stop_before: datetime | None = None
+    """Only include windows stopping before this time."""
@@ -0,0 +1,171 @@
+"""Tests for dynamic_fastapi.app.active."""
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+from dynamic_fastapi.app.active import ActiveWindowIndex, IntervalTree
+from dynamic_fastapi.app.events import WindowChange
+from dynamic_fastapi.model.window import (
+    Window, WindowFilter, WindowParams, WindowState
+)
+
+
+class TestIntervalTree:
+    """Tests for dynamic_fastapi.app.active.IntervalTree."""
+
+    def test_overlapping(self) -> None:
+        """Test queries match a linear scan as intervals change."""
+        rng = random.Random(0)  # noqa: S311
+        tree = IntervalTree()
+        intervals = {}
+        for key in range(1000):
+            start = rng.randint(0, 1000)
+            intervals[key] = (start, start + rng.randint(0, 100))
+            tree.add(key, *intervals[key])
+            if key % 3 == 0:
+                removed = rng.choice(list(intervals))
+                del intervals[removed]
+                tree.remove(removed)
+
+            if key % 10 == 0:
+                start = rng.randint(-100, 1100)
+                stop = start + rng.choice([0, 10, 200])
+                expected = {
+                    key
+                    for key, (begin, end) in intervals.items()
+                    if begin <= stop and end > start
+                }
+                assert sorted(tree.overlapping(start, stop)) == sorted(expected)
+
+        assert len(tree) == len(intervals)
+
+    def test_replace(self) -> None:
+        """Test adding an interval with an existing key replaces it."""
+        tree = IntervalTree()
+        tree.add("a", 0, 10)
+        assert tree.overlapping(5, 5) == ["a"]
+
+        tree.add("a", 20, 30)
+        assert tree.overlapping(5, 5) == []
+        assert tree.overlapping(25, 25) == ["a"]
+
+    def test_same_start(self) -> None:
+        """Test intervals starting together are held and removed separately."""
+        tree = IntervalTree()
+        for key, stop in enumerate([10, 20, 30]):
+            tree.add(key, 0, stop)
+        tree.remove(1)
+
+        assert sorted(tree.overlapping(0, 0)) == [0, 2]
+        assert tree.overlapping(15, 15) == [2]
+
+
+class TestActiveWindowIndex:
+    """Tests for dynamic_fastapi.app.active.ActiveWindowIndex."""
+
+    _start = datetime(2023, 1, 1)
+
+    def _window(self, hours: int, datasources: list[str], **kwargs) -> Window:
+        return Window[WindowParams](
+            params={
+                "task_type": "foo",
+                "start_time": self._start,
+                "stop_time": self._start + timedelta(hours=hours),
+                "datasources": datasources,
+            },
+            **kwargs,
+        )
+
+    def test_overlapping(self) -> None:
+        """Test windows are found by datasource and time."""
+        index = ActiveWindowIndex()
+        short = self._window(1, ["a"])
+        long = self._window(10, ["a", "b"])
+        index.update(short)
+        index.update(long)
+
+        at = self._start + timedelta(hours=2)
+        assert index.overlapping(at, at, "a") == [long]
+        assert index.overlapping(at, at, "c") == []
+        assert index.overlapping(self._start, at) == sorted(
+            [short, long], key=lambda window: window.id
+        )
+
+        # Timezone-aware times are compared in UTC.
+        aware = at.replace(tzinfo=timezone.utc)
+        assert index.overlapping(aware, aware, "b") == [long]
+
+    def test_update_closed(self) -> None:
+        """Test windows which are no longer open are removed."""
+        index = ActiveWindowIndex()
+        window = self._window(1, ["a"])
+        index.update(window)
+        index.update(window.copy(update={"state": WindowState.COMPLETE.value}))
+
+        assert len(index) == 0
+        assert index.overlapping(self._start, self._start) == []
+
+    def test_load(self) -> None:
+        """Test open windows are loaded from the database."""
+        windows = [self._window(1, ["a"]), self._window(2, ["b"])]
+
+        async def _find(*args, **kwargs):
+            for window in windows:
+                yield window
+
+        windows_db = MagicMock()
+        windows_db.find = MagicMock(side_effect=_find)
+        index = ActiveWindowIndex()
+        assert not index.loaded
+
+        asyncio.run(index.load(windows_db, validate=False))
+
+        assert index.loaded
+        assert len(index) == 2
+        windows_db.find.assert_called_once_with({"state": "open"}, validate=False)
+
+    def test_reload(self) -> None:
+        """Test the windows are replaced by the open windows in the database."""
+        stale = self._window(1, ["a"])
+        current = self._window(2, ["b"])
+
+        async def _find(*args, **kwargs):
+            yield current
+
+        windows_db = MagicMock()
+        windows_db.find = MagicMock(side_effect=_find)
+        index = ActiveWindowIndex()
+        index.update(stale)
+
+        asyncio.run(index.reload(windows_db))
+
+        assert len(index) == 1
+        assert index.matching(WindowFilter(datasource="a")) == []
+        assert index.matching(WindowFilter(datasource="b")) == [current.id]
+
+    def test_matching(self) -> None:
+        """Test open windows are selected by a filter."""
+        index = ActiveWindowIndex()
+        short = self._window(1, ["a"])
+        long = self._window(10, ["a", "b"])
+        index.update(short)
+        index.update(long)
+
+        stop = self._start + timedelta(hours=5)
+        assert index.matching(WindowFilter(datasource="b")) == [long.id]
+        assert index.matching(WindowFilter(stop_before=stop)) == [short.id]
+        assert index.matching(WindowFilter(task_types=["bar"])) == []
+        assert index.matching(WindowFilter(state=WindowState.COMPLETE)) == []
+        assert len(index.matching(WindowFilter())) == 2
+
+    def test_apply(self) -> None:
+        """Test window changes are applied."""
+        index = ActiveWindowIndex()
+        window = self._window(1, ["a"])
+
+        index.apply(WindowChange("insert", window.id, window))
+        assert len(index) == 1
+
+        index.apply(WindowChange("delete", window.id, None))
+        assert len(index) == 0
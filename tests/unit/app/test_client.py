@@ -0,0 +1,46 @@
+"""Tests for dynamic_fastapi.app.client."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from dynamic_fastapi.app.client import create_client, warm_up
+from dynamic_fastapi.app.config import MongoConfig
+
+
+def test_create_client() -> None:
+    """Test the client is created with the configured pool settings."""
+    config = MongoConfig(
+        host="mongodb://example", database="db", max_pool_size=5, min_pool_size=2
+    )
+    with patch("dynamic_fastapi.app.client.AsyncIOMotorClient") as client_cls:
+        create_client(config)
+
+    client_cls.assert_called_once_with(
+        "mongodb://example",
+        maxPoolSize=5,
+        minPoolSize=2,
+        maxIdleTimeMS=None,
+        connectTimeoutMS=20000,
+        serverSelectionTimeoutMS=30000,
+        event_listeners=[],
+    )
+
+
+def test_warm_up() -> None:
+    """Test that warm up opens no more connections than the pool allows."""
+    client = MagicMock()
+    client.options.pool_options.max_pool_size = 3
+    client.admin.command = AsyncMock()
+
+    asyncio.run(warm_up(client, 10))
+
+    assert client.admin.command.await_count == 3
+
+
+def test_warm_up_disabled() -> None:
+    """Test that warm up does nothing when no connections are requested."""
+    client = MagicMock()
+    client.admin.command = AsyncMock()
+
+    asyncio.run(warm_up(client, 0))
+
+    client.admin.command.assert_not_called()
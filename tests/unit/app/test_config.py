@@ -1,5 +1,15 @@
 """Tests for dynamic_fastapi.app.config."""
-from dynamic_fastapi.app.config import AppConfig, MongoConfig, UvicornConfig
+import os
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from dynamic_fastapi.app import config
+from dynamic_fastapi.app.config import (
+    CONFIG_ENV, AppConfig, MongoConfig, UvicornConfig, WindowsConfig,
+    get_config, load_config
+)
 
 from .. import ModelTest
 
@@ -9,6 +19,24 @@ class TestAppConfig(ModelTest[AppConfig]):
 
     __required_fields__ = {"mongo", "uvicorn"}
 
+    @pytest.mark.parametrize(
+        ("workers", "events", "valid"),
+        [(1, False, True), (4, True, True), (4, False, False)],
+    )
+    def test_workers(self, workers: int, events: bool, valid: bool) -> None:
+        """Test multiple workers require the events stream."""
+        values = {
+            "uvicorn": {"port": 8000, "log_level": "info", "workers": workers},
+            "mongo": {"host": "localhost", "database": "db"},
+            "events": {"enabled": events},
+        }
+
+        if valid:
+            assert AppConfig.parse_obj(values).uvicorn.workers == workers
+        else:
+            with pytest.raises(ValidationError, match="events.enabled"):
+                AppConfig.parse_obj(values)
+
 
 class TestMongoConfig(ModelTest[MongoConfig]):
     """Tests for dynamic_fastapi.app.config.MongoConfig."""
@@ -20,3 +48,32 @@ class TestUvicornConfig(ModelTest[UvicornConfig]):
     """Tests for dynamic_fastapi.app.config.UvicornConfig."""
 
     __required_fields__ = {"port", "log_level"}
+
+
+class TestWindowsConfig(ModelTest[WindowsConfig]):
+    """Tests for dynamic_fastapi.app.config.WindowsConfig."""
+
+    __required_fields__ = set()
+
+
+def test_load_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test processes started later can load the same config."""
+    config_file = tmp_path / "config.yml"
+    config_file.write_text(
+        "uvicorn: {port: 8000, log_level: info, workers: 4}\n"
+        "mongo: {host: localhost, database: db}\n"
+        "events: {enabled: true}\n"
+    )
+    # Set first, so that the variable load_config sets is restored afterwards.
+    monkeypatch.setenv(CONFIG_ENV, "")
+    monkeypatch.delenv(CONFIG_ENV)
+    monkeypatch.setattr(config, "_app_config", None)
+
+    app_config = load_config(str(config_file))
+
+    assert app_config.uvicorn.workers == 4
+    assert os.environ[CONFIG_ENV] == str(config_file)
+
+    # As in a worker process.
+    monkeypatch.setattr(config, "_app_config", None)
+    assert get_config() == app_config
@@ -0,0 +1,201 @@
+"""Tests for dynamic_fastapi.app.events."""
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from dynamic_fastapi.app.events import WindowChange, WindowEvents
+from dynamic_fastapi.model.window import Window, WindowParams
+
+
+def _window(task_type: str = "foo") -> Window:
+    return Window[WindowParams](
+        params={
+            "task_type": task_type,
+            "start_time": "2023-01-01T00:00:00",
+            "stop_time": "2023-01-02T00:00:00",
+            "datasources": ["src"],
+        }
+    )
+
+
+class _Stream:
+    """Async context manager and iterator over change stream events."""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.events:
+            raise StopAsyncIteration
+        return self.events.pop(0)
+
+
+class TestWindowEvents:
+    """Tests for dynamic_fastapi.app.events.WindowEvents."""
+
+    def test_subscribe(self) -> None:
+        """Test subscribers receive the changes for their task types."""
+        window_events = WindowEvents(MagicMock())
+        foo, bar = _window("foo"), _window("bar")
+
+        async def _run():
+            events = window_events.subscribe(frozenset({"foo"}))
+            assert await anext(events) == b": connected\n\n"
+            assert window_events.subscriber_count == 1
+
+            await window_events.publish(WindowChange("insert", bar.id, bar))
+            await window_events.publish(WindowChange("insert", foo.id, foo))
+            await window_events.publish(WindowChange("delete", bar.id, None))
+            messages = [await anext(events), await anext(events)]
+
+            await events.aclose()
+            assert window_events.subscriber_count == 0
+            return messages
+
+        insert, delete = asyncio.run(_run())
+
+        event, data = insert.decode().strip().split("\n")
+        assert event == "event: insert"
+        assert json.loads(data.removeprefix("data: "))["_id"] == str(foo.id)
+        assert delete == f'event: delete\ndata: {{"_id":"{bar.id}"}}\n\n'.encode()
+
+    def test_keepalive(self) -> None:
+        """Test a comment is sent when there are no changes."""
+        window_events = WindowEvents(MagicMock())
+
+        async def _run():
+            events = window_events.subscribe(keepalive=0.01)
+            await anext(events)
+            message = await anext(events)
+            await events.aclose()
+            return message
+
+        assert asyncio.run(_run()) == b": keepalive\n\n"
+
+    def test_drop_slow_subscriber(self) -> None:
+        """Test subscribers with a full buffer are dropped."""
+        window_events = WindowEvents(MagicMock(), queue_size=2)
+        window = _window()
+
+        async def _run():
+            events = window_events.subscribe()
+            await anext(events)
+            for _ in range(3):
+                await window_events.publish(WindowChange("update", window.id, window))
+            return [message async for message in events]
+
+        assert asyncio.run(_run()) == [b"event: dropped\ndata: {}\n\n"]
+        assert window_events.subscriber_count == 0
+
+    def test_watch(self) -> None:
+        """Test change stream events are published to listeners."""
+        window = _window()
+        windows_db = MagicMock()
+        windows_db.from_doc.return_value = window
+        windows_db.collection.watch.return_value = _Stream(
+            [
+                {"_id": 1, "operationType": "insert", "fullDocument": {}},
+                {"_id": 2, "operationType": "update", "fullDocument": None},
+                {"_id": 3, "operationType": "drop"},
+                {"_id": 4, "operationType": "delete", "documentKey": {"_id": 5}},
+            ]
+        )
+        window_events = WindowEvents(windows_db)
+        changes = []
+        window_events.listeners.append(changes.append)
+
+        asyncio.run(window_events._watch())
+
+        assert changes == [
+            WindowChange("insert", window.id, window),
+            WindowChange("delete", 5, None),
+        ]
+
+        # Reopening the stream resumes after the last event.
+        windows_db.collection.watch.return_value = _Stream([])
+        asyncio.run(window_events._watch())
+        assert windows_db.collection.watch.call_args.kwargs["resume_after"] == 4
+
+    def test_invalidated(self) -> None:
+        """Test invalidated change streams are reopened from the current time."""
+        windows_db = MagicMock()
+        windows_db.collection.watch.return_value = _Stream(
+            [
+                {"_id": 1, "operationType": "drop"},
+                {"_id": 2, "operationType": "invalidate"},
+            ]
+        )
+        window_events = WindowEvents(windows_db)
+        resyncs = []
+        window_events.resyncs.append(lambda: resyncs.append(None))
+
+        asyncio.run(window_events._watch())
+        windows_db.collection.watch.return_value = _Stream([])
+        asyncio.run(window_events._watch())
+
+        assert windows_db.collection.watch.call_args.kwargs["resume_after"] is None
+        assert len(resyncs) == 1
+
+    @pytest.mark.parametrize(
+        ("error", "resynced"),
+        [
+            (OperationFailure("history lost", code=286), True),
+            (AutoReconnect("blip"), False),
+            (RuntimeError("listener failed"), True),
+        ],
+    )
+    def test_run_retries(self, error: Exception, resynced: bool) -> None:
+        """Test the stream is reopened, from the current time if it cannot resume."""
+        windows_db = MagicMock()
+        windows_db.from_doc.return_value = _window()
+
+        def _watch(**kwargs):
+            if windows_db.collection.watch.call_count == 3:
+                raise asyncio.CancelledError
+            if windows_db.collection.watch.call_count == 2:
+                return _Stream([])
+            return _Stream([{"_id": 1, "operationType": "insert", "fullDocument": {}}])
+
+        windows_db.collection.watch.side_effect = _watch
+        window_events = WindowEvents(windows_db, retry_interval=0)
+        resyncs = []
+        window_events.resyncs.append(lambda: resyncs.append(None))
+
+        async def _fail(change: WindowChange) -> None:
+            raise error
+
+        window_events.listeners.append(_fail)
+
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(window_events.run())
+
+        resume_after = windows_db.collection.watch.call_args_list[1].kwargs[
+            "resume_after"
+        ]
+        assert (resume_after is None) is resynced
+        assert len(resyncs) == resynced
+
+    def test_unreadable_window(self) -> None:
+        """Test changes to windows which cannot be parsed are ignored."""
+        windows_db = MagicMock()
+        windows_db.from_doc.side_effect = KeyError("unknown")
+        window_events = WindowEvents(windows_db)
+
+        change = window_events._change(
+            {"operationType": "insert", "fullDocument": {"_id": ObjectId()}}
+        )
+
+        assert change is None
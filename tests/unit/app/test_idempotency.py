@@ -0,0 +1,44 @@
+"""Tests for dynamic_fastapi.app.idempotency."""
+from unittest.mock import MagicMock
+
+from dynamic_fastapi.app.idempotency import RecentWindows
+
+
+def _window(key: str | None, task_type: str = "foo") -> MagicMock:
+    window = MagicMock(idempotency_key=key)
+    window.params.task_type = task_type
+    return window
+
+
+def test_recent_windows() -> None:
+    """Test window IDs are found by their task type and idempotency key."""
+    window = _window("a")
+    recent_windows = RecentWindows(2)
+    recent_windows.add(window)
+    recent_windows.add(_window(None))
+
+    assert recent_windows.get("foo", "a") is window.id
+    assert recent_windows.get("foo", "b") is None
+    assert recent_windows.get("bar", "a") is None
+    assert len(recent_windows) == 1
+
+
+def test_recent_windows_evict() -> None:
+    """Test the least recently used windows are evicted."""
+    recent_windows = RecentWindows(2)
+    for key in ("a", "b"):
+        recent_windows.add(_window(key))
+    recent_windows.get("foo", "a")
+    recent_windows.add(_window("c"))
+
+    assert recent_windows.get("foo", "a") is not None
+    assert recent_windows.get("foo", "b") is None
+    assert recent_windows.get("foo", "c") is not None
+
+
+def test_recent_windows_disabled() -> None:
+    """Test nothing is held if the maximum size is zero."""
+    recent_windows = RecentWindows(0)
+    recent_windows.add(_window("a"))
+
+    assert recent_windows.get("foo", "a") is None
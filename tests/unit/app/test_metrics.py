@@ -0,0 +1,113 @@
+"""Tests for dynamic_fastapi.app.metrics."""
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRouter
+
+from dynamic_fastapi.app.metrics import TimedRoute, metrics
+from dynamic_fastapi.metrics import (
+    REGISTRY, REQUEST_DURATION, STAGE_DURATION, VALIDATION_FAILURES
+)
+
+
+@pytest.fixture(autouse=True)
+def enabled():
+    """Enable the application metrics, clearing them afterwards."""
+    REGISTRY.enabled = True
+    yield REGISTRY
+    REGISTRY.enabled = False
+    REGISTRY.clear()
+
+
+def _handler(path: str, validates: bool = False):
+    router = APIRouter(route_class=TimedRoute)
+
+    async def endpoint(count: int) -> dict:
+        return {"count": count}
+
+    endpoint.__task_type__ = "foo"
+    endpoint.__validates__ = validates
+    router.add_api_route(path, endpoint)
+    return router.routes[0].get_route_handler()
+
+
+def _request(query: bytes) -> Request:
+    async def _receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/things/1",
+            "query_string": query,
+            "headers": [],
+            "path_params": {},
+        },
+        _receive,
+    )
+
+
+def test_timed_route(enabled) -> None:
+    """Test requests and their validate stage are timed."""
+    response = asyncio.run(_handler("/things/{id}")(_request(b"count=2")))
+
+    assert response.status_code == 200
+    rendered = enabled.render().decode()
+    assert (
+        f'{REQUEST_DURATION.name}_count{{route="/things/{{id}}",method="GET",'
+        'status="200"} 1'
+    ) in rendered
+    assert (
+        f'{STAGE_DURATION.name}_count{{stage="validate",route="/things/{{id}}",'
+        'task_type="foo"} 1'
+    ) in rendered
+
+
+def test_timed_route_validates(enabled) -> None:
+    """Test the validate stage is left to endpoints which time it themselves."""
+    response = asyncio.run(
+        _handler("/things/{id}", validates=True)(_request(b"count=2"))
+    )
+
+    assert response.status_code == 200
+    rendered = enabled.render().decode()
+    assert f"{REQUEST_DURATION.name}_count" in rendered
+    assert f"{STAGE_DURATION.name}_count" not in rendered
+
+
+def test_timed_route_invalid(enabled) -> None:
+    """Test invalid requests are counted as validation failures."""
+    with pytest.raises(RequestValidationError):
+        asyncio.run(_handler("/things")(_request(b"count=x")))
+
+    rendered = enabled.render().decode()
+    assert f'{VALIDATION_FAILURES.name}{{source="request",task_type="foo"}} 1' in (
+        rendered
+    )
+    assert 'route="/things",method="GET",status="422"} 1' in rendered
+
+
+def test_metrics() -> None:
+    """Test the metrics are rendered when enabled."""
+    app_config = MagicMock()
+    app_config.metrics.enabled = True
+
+    response = asyncio.run(metrics(app_config))
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert REQUEST_DURATION.name.encode() in response.body
+
+
+def test_metrics_disabled() -> None:
+    """Test the endpoint is hidden when metrics are disabled."""
+    app_config = MagicMock()
+    app_config.metrics.enabled = False
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(metrics(app_config))
+
+    assert exc_info.value.status_code == 404
@@ -0,0 +1,106 @@
+"""Tests for dynamic_fastapi.app.openapi."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.openapi.utils import get_openapi
+
+from dynamic_fastapi.app.openapi import OpenAPICache, install_openapi
+from dynamic_fastapi.app.windows import generate_routes, mount_routes
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
+
+
+@pytest.fixture(autouse=True)
+def _registry() -> None:
+    """Isolate the registry contents for each test."""
+    with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+        TaskTypeRegistry.__models__, clear=True
+    ):
+        TaskTypeRegistry.register(TaskType(name="foo"))
+        TaskTypeRegistry.register(TaskType(name="bar"))
+        yield
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    """Application with the windows routes and a schema cache."""
+    app = FastAPI()
+    install_openapi(app)
+    generate_routes()
+    mount_routes(app)
+    return app
+
+
+class TestOpenAPICache:
+    """Tests for dynamic_fastapi.app.openapi.OpenAPICache."""
+
+    def test_openapi(self, app: FastAPI) -> None:
+        """Test the merged schema matches the schema FastAPI generates."""
+        cache = app.state.openapi_cache
+        expected = get_openapi(title=app.title, version=app.version, routes=app.routes)
+
+        schema = cache.openapi()
+
+        assert app.openapi() is schema
+        assert schema["paths"] == expected["paths"]
+        assert schema["components"] == expected["components"]
+
+    def test_cached(self, app: FastAPI) -> None:
+        """Test the schema is only rebuilt when the routes change."""
+        cache = app.state.openapi_cache
+        schema = cache.openapi()
+
+        assert cache.is_current()
+        assert cache.openapi() is schema
+
+        generate_routes()
+        mount_routes(app)
+
+        assert not cache.is_current()
+        assert cache.openapi() is not schema
+
+    def test_incremental(self, app: FastAPI) -> None:
+        """Test only the routes of changed task types are regenerated."""
+        cache = app.state.openapi_cache
+        with patch.object(
+            OpenAPICache, "_generate", autospec=True, side_effect=OpenAPICache._generate
+        ) as generate:
+            cache.openapi()
+            assert generate.call_count == 3
+
+            TaskTypeRegistry.register(
+                TaskType(name="bar", extensions={"symbol_set": None})
+            )
+            generate_routes()
+            mount_routes(app)
+            schema = cache.openapi()
+
+        # Only the shared routes and the routes for bar.
+        assert generate.call_count == 5
+        assert "symbol_set" in schema["components"]["schemas"]["BAR_WindowParams"][
+            "properties"
+        ]
+
+
+def test_install_openapi_etag(app: FastAPI) -> None:
+    """Test the schema is served with an ETag."""
+    (route,) = [route for route in app.router.routes if route.path == "/openapi.json"]
+
+    def _request(headers: dict[str, str]) -> Request:
+        return Request(
+            {
+                "type": "http",
+                "method": "GET",
+                "path": "/openapi.json",
+                "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+            }
+        )
+
+    response = asyncio.run(route.endpoint(_request({})))
+    etag = response.headers["etag"]
+    assert response.status_code == 200
+    assert response.body == app.state.openapi_cache.response()[0]
+
+    response = asyncio.run(route.endpoint(_request({"if-none-match": etag})))
+    assert response.status_code == 304
@@ -0,0 +1,170 @@
+"""Tests for dynamic_fastapi.app.reload."""
+import asyncio
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import AutoReconnect, NetworkTimeout, OperationFailure
+
+from dynamic_fastapi.app.reload import TaskTypeWatcher
+from dynamic_fastapi.database.task_types import load_snapshot, save_snapshot
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
+
+
+class TestTaskTypeWatcher:
+    """Tests for dynamic_fastapi.app.reload.TaskTypeWatcher."""
+
+    @pytest.mark.parametrize("changed", [True, False])
+    def test_reload(self, changed: bool) -> None:
+        """Test routes are only regenerated when the task types change."""
+        app = MagicMock()
+        watcher = TaskTypeWatcher(app, MagicMock(), poll_interval=1)
+
+        with patch(
+            "dynamic_fastapi.app.reload.register_types", return_value=changed
+        ), patch("dynamic_fastapi.app.reload.generate_routes") as generate, patch(
+            "dynamic_fastapi.app.reload.mount_routes"
+        ) as mount:
+            assert asyncio.run(watcher.reload()) is changed
+
+        assert generate.called is changed
+        if changed:
+            mount.assert_called_once_with(app)
+
+    def test_reload_removed(self, tmp_path: Path) -> None:
+        """Test windows of a task type deleted from the database can be read.
+
+        The task type is removed from the snapshot, so it is not registered
+        again after restarting.
+        """
+        snapshot = tmp_path / "task_types.json"
+        task_types_db = MagicMock()
+        task_types_db.find.return_value.__aiter__.return_value = [TaskType(name="foo")]
+        watcher = TaskTypeWatcher(
+            MagicMock(), task_types_db, poll_interval=1, snapshot=str(snapshot)
+        )
+        doc = {
+            "_id": ObjectId(),
+            "params": {
+                "task_type": "bar",
+                "start_time": "2023-01-01T00:00:00",
+                "stop_time": "2023-01-02T00:00:00",
+                "datasources": ["src"],
+            },
+        }
+
+        with patch.multiple(TaskTypeRegistry, __task_types__={}, __models__={}), patch(
+            "dynamic_fastapi.app.reload.generate_routes"
+        ), patch("dynamic_fastapi.app.reload.mount_routes"):
+            TaskTypeRegistry.register(TaskType(name="bar"))
+            asyncio.run(watcher.reload())
+            window = WindowCollection(MagicMock()).from_doc(doc)
+
+        assert window.params.task_type == "bar"
+        assert [task_type.name for task_type in load_snapshot(snapshot).task_types] == [
+            "foo"
+        ]
+
+    def test_reload_error(self) -> None:
+        """Test a failed reload leaves the routes alone."""
+        watcher = TaskTypeWatcher(MagicMock(), MagicMock(), poll_interval=1)
+
+        with patch(
+            "dynamic_fastapi.app.reload.read_types_from_db",
+            AsyncMock(side_effect=OperationFailure("failed")),
+        ), patch("dynamic_fastapi.app.reload.generate_routes") as generate:
+            assert asyncio.run(watcher.reload()) is False
+
+        generate.assert_not_called()
+
+    def test_run_falls_back_to_polling(self) -> None:
+        """Test the collection is polled if it cannot be watched."""
+        task_types_db = MagicMock()
+        task_types_db.collection.watch.side_effect = OperationFailure(
+            "no replset", code=40573
+        )
+        watcher = TaskTypeWatcher(MagicMock(), task_types_db, poll_interval=0)
+
+        reloads = 0
+
+        async def _reload() -> bool:
+            nonlocal reloads
+            reloads += 1
+            if reloads == 3:
+                raise asyncio.CancelledError
+            return False
+
+        with patch.object(watcher, "reload", _reload), pytest.raises(
+            asyncio.CancelledError
+        ):
+            asyncio.run(watcher.run())
+
+        assert reloads == 3
+
+    def test_run_retries(self) -> None:
+        """Test the change stream is reopened after it fails."""
+        stream = MagicMock()
+        stream.__aiter__.return_value = [{}]
+        task_types_db = MagicMock()
+        task_types_db.collection.watch.side_effect = [
+            AutoReconnect("blip"),
+            NetworkTimeout("blip"),
+            MagicMock(__aenter__=AsyncMock(return_value=stream)),
+        ]
+        watcher = TaskTypeWatcher(MagicMock(), task_types_db, poll_interval=0)
+
+        reloads = 0
+
+        async def _reload() -> bool:
+            nonlocal reloads
+            reloads += 1
+            if reloads == 2:
+                raise asyncio.CancelledError
+            return False
+
+        with patch.object(watcher, "reload", _reload), patch(
+            "dynamic_fastapi.app.reload._INITIAL_RETRY_DELAY", 0
+        ), pytest.raises(asyncio.CancelledError):
+            asyncio.run(watcher.run())
+
+        # Both reloads came from the reopened change stream.
+        assert task_types_db.collection.watch.call_count == 3
+        assert reloads == 2
+
+    def test_snapshot(self, tmp_path: Path) -> None:
+        """Test the snapshot is loaded, and saved when the task types change."""
+        snapshot = tmp_path / "task_types.json"
+        foo = TaskType(name="foo")
+        version = save_snapshot(snapshot, [foo])
+        watcher = TaskTypeWatcher(
+            MagicMock(), MagicMock(), poll_interval=1, snapshot=str(snapshot)
+        )
+
+        with patch.multiple(TaskTypeRegistry, __task_types__={}, __models__={}):
+            assert watcher.load_snapshot()
+            assert TaskTypeRegistry.task_type("foo")
+
+            with patch(
+                "dynamic_fastapi.app.reload.save_snapshot", wraps=save_snapshot
+            ) as save:
+                watcher.save_snapshot([foo])
+                save.assert_not_called()
+
+                watcher.save_snapshot([foo, TaskType(name="bar")])
+                save.assert_called_once()
+
+        assert load_snapshot(snapshot).version != version
+
+    @pytest.mark.parametrize("content", [None, "not json"])
+    def test_snapshot_unavailable(self, tmp_path: Path, content: str | None) -> None:
+        """Test a missing or damaged snapshot is not loaded."""
+        snapshot = tmp_path / "task_types.json"
+        if content is not None:
+            snapshot.write_text(content)
+        watcher = TaskTypeWatcher(
+            MagicMock(), MagicMock(), poll_interval=1, snapshot=str(snapshot)
+        )
+
+        assert not watcher.load_snapshot()
@@ -0,0 +1,60 @@
+"""Tests for dynamic_fastapi.app.responses."""
+import json
+from datetime import datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+
+from dynamic_fastapi.app.responses import ORJSONResponse, dumps
+from dynamic_fastapi.model.page import Page
+from dynamic_fastapi.model.window import Window, WindowParams, WindowState
+
+
+@pytest.fixture
+def window() -> Window:
+    """A window with each of the types needing conversion."""
+    return Window[WindowParams](
+        params={
+            "task_type": "foo",
+            "start_time": datetime(2023, 1, 1, 12, 30, 15, 250),
+            "stop_time": datetime(2023, 1, 2),
+            "datasources": ["src"],
+        },
+        state=WindowState.CANCELLED,
+    )
+
+
+def test_dumps(window: Window) -> None:
+    """Test models are encoded the same as by jsonable_encoder."""
+    page = Page[Window].construct(items=[window], next="abc")
+
+    assert json.loads(dumps(page)) == jsonable_encoder(page)
+
+
+def test_dumps_enum() -> None:
+    """Test enums are encoded as their values."""
+    assert dumps({"state": WindowState.OPEN}) == b'{"state":"open"}'
+
+
+def test_dumps_exclude_unset() -> None:
+    """Test fields which were not set can be omitted."""
+    window = Window[WindowParams].construct(state="open")
+
+    assert json.loads(dumps(window, exclude_unset=True)) == {"state": "open"}
+    assert json.loads(ORJSONResponse(window, exclude_unset=True).body) == {
+        "state": "open"
+    }
+
+
+def test_dumps_unsupported() -> None:
+    """Test unsupported values are rejected."""
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_response(window: Window) -> None:
+    """Test the response renders the model."""
+    response = ORJSONResponse(window)
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body)["_id"] == str(window.id)
@@ -1,8 +1,30 @@
 """Tests for dynamic_fastapi.app.windows."""
-from unittest.mock import patch
+import asyncio
+import json
+from collections.abc import Callable
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from dynamic_fastapi.app.windows import generate_routes, windows_api
-from dynamic_fastapi.model.task_type import TaskType
+import pytest
+from bson.objectid import ObjectId
+from fastapi import FastAPI, HTTPException
+from fastapi.exceptions import RequestValidationError
+
+from dynamic_fastapi.app.active import ActiveWindowIndex
+from dynamic_fastapi.app.config import AppConfig
+from dynamic_fastapi.app.idempotency import RecentWindows
+from dynamic_fastapi.app.windows import (
+    REPLAYED_HEADER, _active_range, _create_windows, _etag, _etag_matches,
+    _insert_window, _ndjson_lines, _page_cursor, _window_fields,
+    generate_routes, mount_routes, windows_api
+)
+from dynamic_fastapi.database.windows import WindowCollection
+from dynamic_fastapi.model.task_type import (
+    TaskType, TaskTypeModels, TaskTypeRegistry
+)
+from dynamic_fastapi.model.window import (
+    Window, WindowFilter, WindowParams, WindowState
+)
 
 
 class TestWindowsApi:
@@ -10,16 +32,612 @@ class TestWindowsApi:
 
     def test_routes(self) -> None:
         """Test routes."""
-        dummy_types = [TaskType(name="foo"), TaskType(name="bar")]
-        with patch(
-            "dynamic_fastapi.app.windows.TaskTypeRegistry.task_types",
-            return_value=dummy_types,
-        ), patch("dynamic_fastapi.model.task_type.globals", return_value={}):
+        with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+            TaskTypeRegistry.__models__, clear=True
+        ):
+            TaskTypeRegistry.register(TaskType(name="foo"))
+            TaskTypeRegistry.register(TaskType(name="bar"))
             generate_routes()
 
-        routes = {route.path: route.methods for route in windows_api.routes}
+        routes = {}
+        for route in windows_api.routes:
+            routes.setdefault(route.path, set()).update(route.methods)
         assert routes == {
             "/windows": {"GET"},
+            "/windows/active": {"GET"},
+            "/windows/bulk": {"POST"},
+            "/windows/cancel": {"POST"},
+            "/windows/complete": {"POST"},
+            "/windows/events": {"GET"},
+            "/windows/{window_id}": {"GET", "HEAD"},
+            "/windows/{window_id}/cancel": {"POST"},
+            "/windows/{window_id}/complete": {"POST"},
             "/windows/bar/create": {"POST"},
+            "/windows/bar/create_many": {"POST"},
             "/windows/foo/create": {"POST"},
+            "/windows/foo/create_many": {"POST"},
         }
+
+    def test_regenerate(self) -> None:
+        """Test regenerating routes replaces them on a mounted application."""
+        app = FastAPI()
+        app.openapi_schema = {}
+        with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+            TaskTypeRegistry.__models__, clear=True
+        ):
+            TaskTypeRegistry.register(TaskType(name="foo"))
+            generate_routes()
+            mount_routes(app)
+            assert app.openapi_schema is None
+
+            TaskTypeRegistry.register(TaskType(name="bar"))
+            generate_routes()
+            mount_routes(app)
+
+        paths = [route.path for route in app.router.routes]
+        routes = [(route.path, frozenset(route.methods)) for route in app.router.routes]
+        assert len(routes) == len(set(routes))
+        assert {"/openapi.json", "/windows/foo/create", "/windows/bar/create"} <= set(
+            paths
+        )
+
+
+class TestLazyRoutes:
+    """Tests for the windows routes of a lazy task type registry."""
+
+    @pytest.fixture(autouse=True)
+    def _registry(self) -> None:
+        """Generate the routes for a lazy registry of one task type."""
+        with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+            TaskTypeRegistry.__models__, clear=True
+        ), patch.object(TaskTypeRegistry, "lazy", True):
+            TaskTypeRegistry.register(TaskType(name="foo"))
+            generate_routes()
+            yield
+
+    def _endpoint(self, path: str) -> Callable:
+        (route,) = [route for route in windows_api.routes if route.path == path]
+        return route.endpoint
+
+    def test_routes(self) -> None:
+        """Test windows are created through routes for every task type."""
+        paths = {route.path for route in windows_api.routes}
+
+        assert "/windows/{task_type}/create" in paths
+        assert "/windows/{task_type}/create_many" in paths
+        assert "/windows/foo/create" not in paths
+        assert not TaskTypeRegistry.__models__
+
+    @pytest.mark.parametrize(
+        "path", ["/windows/{task_type}/create", "/windows/{task_type}/create_many"]
+    )
+    def test_validates(self, path: str) -> None:
+        """Test the validate stage is timed only by the endpoints."""
+        assert self._endpoint(path).__validates__
+
+    def test_create(self) -> None:
+        """Test the task type's models are built to create a window."""
+        create_window = self._endpoint("/windows/{task_type}/create")
+        windows_db = AsyncMock()
+        windows_db.insert_one.side_effect = lambda window: window
+        params = {
+            "start_time": "2023-01-01T00:00:00",
+            "stop_time": "2023-01-02T00:00:00",
+            "datasources": ["src"],
+        }
+
+        response = asyncio.run(
+            create_window(
+                "foo", params, windows_db, ActiveWindowIndex(), RecentWindows(1)
+            )
+        )
+
+        window = windows_db.insert_one.await_args.args[0]
+        assert isinstance(window, TaskTypeRegistry.models("foo").window_model)
+        assert json.loads(response.body)["params"]["task_type"] == "foo"
+
+    def test_create_invalid(self) -> None:
+        """Test invalid parameters are reported like any request body."""
+        create_window = self._endpoint("/windows/{task_type}/create")
+
+        with pytest.raises(RequestValidationError) as exc_info:
+            asyncio.run(
+                create_window(
+                    "foo", {}, AsyncMock(), ActiveWindowIndex(), RecentWindows(1)
+                )
+            )
+
+        assert ("body", "start_time") in {err["loc"] for err in exc_info.value.errors()}
+
+    def test_create_unknown(self) -> None:
+        """Test windows of unregistered task types are not found."""
+        create_window = self._endpoint("/windows/{task_type}/create")
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(
+                create_window(
+                    "bar", {}, AsyncMock(), ActiveWindowIndex(), RecentWindows(1)
+                )
+            )
+
+        assert exc_info.value.status_code == 404
+
+
+class TestInsertWindow:
+    """Tests for dynamic_fastapi.app.windows._insert_window."""
+
+    @staticmethod
+    def _window(idempotency_key: str | None, task_type: str = "foo") -> Window:
+        return Window(
+            params=WindowParams(
+                task_type=task_type,
+                start_time=datetime(2023, 1, 1),
+                stop_time=datetime(2023, 1, 2),
+                datasources=["src"],
+            ),
+            idempotency_key=idempotency_key,
+        )
+
+    def test_no_key(self) -> None:
+        """Test windows without a key are always inserted."""
+        windows_db = AsyncMock()
+        windows_db.insert_one.side_effect = lambda window: window
+        active_windows = ActiveWindowIndex()
+        recent_windows = RecentWindows(1)
+
+        response = asyncio.run(
+            _insert_window(
+                self._window(None), windows_db, active_windows, recent_windows
+            )
+        )
+
+        windows_db.insert_once.assert_not_awaited()
+        assert REPLAYED_HEADER not in response.headers
+        assert len(active_windows) == 1
+        assert len(recent_windows) == 0
+
+    def test_inserted(self) -> None:
+        """Test windows with a new key are inserted and held."""
+        window = self._window("key")
+        windows_db = AsyncMock()
+        windows_db.insert_once.return_value = (window, True)
+        active_windows = ActiveWindowIndex()
+        recent_windows = RecentWindows(1)
+
+        response = asyncio.run(
+            _insert_window(window, windows_db, active_windows, recent_windows)
+        )
+
+        assert REPLAYED_HEADER not in response.headers
+        assert len(active_windows) == 1
+        assert recent_windows.get("foo", "key") == window.id
+
+    def test_replayed(self) -> None:
+        """Test windows with a key already in the database are replayed."""
+        existing = self._window("key")
+        windows_db = AsyncMock()
+        windows_db.insert_once.return_value = (existing, False)
+        active_windows = ActiveWindowIndex()
+        recent_windows = RecentWindows(1)
+
+        response = asyncio.run(
+            _insert_window(
+                self._window("key"), windows_db, active_windows, recent_windows
+            )
+        )
+
+        assert response.headers[REPLAYED_HEADER] == "true"
+        assert len(active_windows) == 0
+        assert recent_windows.get("foo", "key") == existing.id
+
+    def test_replayed_recent(self) -> None:
+        """Test windows recently created with a key are replayed as they are now."""
+        existing = self._window("key")
+        windows_db = AsyncMock()
+        windows_db.get.return_value = existing.copy(
+            update={"state": WindowState.CANCELLED, "version": 1}
+        )
+        recent_windows = RecentWindows(1)
+        recent_windows.add(existing)
+
+        response = asyncio.run(
+            _insert_window(
+                self._window("key"), windows_db, ActiveWindowIndex(), recent_windows
+            )
+        )
+
+        windows_db.get.assert_awaited_once_with(existing.id)
+        windows_db.insert_once.assert_not_awaited()
+        assert response.headers[REPLAYED_HEADER] == "true"
+        assert json.loads(response.body)["state"] == "cancelled"
+
+    def test_recent_deleted(self) -> None:
+        """Test windows held by key which no longer exist are created again."""
+        window = self._window("key")
+        windows_db = AsyncMock()
+        windows_db.get.return_value = None
+        windows_db.insert_once.return_value = (window, True)
+        recent_windows = RecentWindows(1)
+        recent_windows.add(self._window("key"))
+
+        response = asyncio.run(
+            _insert_window(window, windows_db, ActiveWindowIndex(), recent_windows)
+        )
+
+        windows_db.insert_once.assert_awaited_once_with(window)
+        assert REPLAYED_HEADER not in response.headers
+        assert recent_windows.get("foo", "key") == window.id
+
+    def test_other_task_type(self) -> None:
+        """Test keys used by another task type create a new window."""
+        window = self._window("key", task_type="bar")
+        windows_db = AsyncMock()
+        windows_db.insert_once.return_value = (window, True)
+        recent_windows = RecentWindows(2)
+        recent_windows.add(self._window("key"))
+
+        response = asyncio.run(
+            _insert_window(window, windows_db, ActiveWindowIndex(), recent_windows)
+        )
+
+        windows_db.insert_once.assert_awaited_once_with(window)
+        assert REPLAYED_HEADER not in response.headers
+        assert recent_windows.get("bar", "key") == window.id
+
+
+class TestCloseWindows:
+    """Tests for the routes closing windows selected by a filter."""
+
+    @pytest.fixture
+    def close_windows(self) -> Callable:
+        """The endpoint cancelling windows."""
+        with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+            TaskTypeRegistry.__models__, clear=True
+        ):
+            generate_routes()
+        (route,) = [
+            route for route in windows_api.routes if route.path == "/windows/cancel"
+        ]
+        return route.endpoint
+
+    @staticmethod
+    def _window(datasource: str) -> Window:
+        return Window(
+            id=ObjectId(),
+            params=WindowParams(
+                task_type="foo",
+                start_time=datetime(2023, 1, 1),
+                stop_time=datetime(2023, 1, 2),
+                datasources=[datasource],
+            ),
+        )
+
+    @staticmethod
+    def _windows_db(window_ids: list[ObjectId]) -> AsyncMock:
+        windows_db = AsyncMock()
+        windows_db.filter_query = WindowCollection.filter_query
+        windows_db.open_ids.return_value = window_ids
+        windows_db.close_many.return_value = len(window_ids)
+        return windows_db
+
+    def test_filter_required(self, close_windows: Callable) -> None:
+        """Test windows are not all closed by a request without a filter."""
+        windows_db = self._windows_db([])
+
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(close_windows(windows_db, WindowFilter(), ActiveWindowIndex()))
+
+        assert exc_info.value.status_code == 400
+        windows_db.close_many.assert_not_awaited()
+
+    def test_all(self, close_windows: Callable) -> None:
+        """Test every open window is closed if requested explicitly."""
+        window_ids = [ObjectId(), ObjectId()]
+        windows_db = self._windows_db(window_ids)
+
+        response = asyncio.run(
+            close_windows(
+                windows_db, WindowFilter(), ActiveWindowIndex(), all_windows=True
+            )
+        )
+
+        assert json.loads(response.body) == {"updated": 2}
+        windows_db.open_ids.assert_awaited_once_with({})
+        windows_db.close_many.assert_awaited_once_with(
+            {"_id": {"$in": window_ids}}, WindowState.CANCELLED
+        )
+
+    def test_none_open(self, close_windows: Callable) -> None:
+        """Test nothing is updated if no open window matches."""
+        windows_db = self._windows_db([])
+
+        response = asyncio.run(
+            close_windows(windows_db, WindowFilter(datasource="a"), ActiveWindowIndex())
+        )
+
+        assert json.loads(response.body) == {"updated": 0}
+        windows_db.close_many.assert_not_awaited()
+
+    def test_filter(self, close_windows: Callable) -> None:
+        """Test only the closed windows are removed from the open windows index."""
+        closed = self._window("a")
+        windows_db = self._windows_db([closed.id])
+        active_windows = ActiveWindowIndex()
+        active_windows.update(closed)
+        active_windows.update(self._window("b"))
+
+        async def _close_many(query, state):
+            # Opened while the others are closed.
+            active_windows.update(self._window("a"))
+            return 1
+
+        windows_db.close_many.side_effect = _close_many
+
+        asyncio.run(
+            close_windows(windows_db, WindowFilter(datasource="a"), active_windows)
+        )
+
+        assert len(active_windows) == 2
+        assert closed.id not in active_windows.matching(WindowFilter(datasource="a"))
+        assert active_windows.matching(WindowFilter(datasource="a"))
+
+
+def test_active_loading() -> None:
+    """Test the open windows are not listed until they are loaded."""
+    with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+        TaskTypeRegistry.__models__, clear=True
+    ):
+        generate_routes()
+    (route,) = [
+        route for route in windows_api.routes if route.path == "/windows/active"
+    ]
+    active_windows = ActiveWindowIndex()
+    time_range = _active_range()
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(route.endpoint(active_windows, time_range))
+    assert exc_info.value.status_code == 503
+
+    active_windows.loaded = True
+    response = asyncio.run(route.endpoint(active_windows, time_range))
+    assert json.loads(response.body) == []
+
+
+def test_get_routes_last() -> None:
+    """Test windows are looked up by ID only if no static path matches."""
+    with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+        TaskTypeRegistry.__models__, clear=True
+    ):
+        generate_routes()
+
+    paths = [route.path for route in windows_api.routes]
+    assert paths[-2:] == ["/windows/{window_id}", "/windows/{window_id}"]
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "read"), [(None, True), ('"0"', True), ('"1"', False)]
+)
+def test_get_window_conditional(if_none_match: str | None, read: bool) -> None:
+    """Test windows are only read if the client does not have the current one."""
+    with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+        TaskTypeRegistry.__models__, clear=True
+    ):
+        generate_routes()
+    (route,) = [
+        route
+        for route in windows_api.routes
+        if route.path == "/windows/{window_id}" and "GET" in route.methods
+    ]
+    window = Window[WindowParams](
+        params={
+            "task_type": "foo",
+            "start_time": "2023-01-01T00:00:00",
+            "stop_time": "2023-01-02T00:00:00",
+            "datasources": ["src"],
+        },
+        version=1,
+    )
+    windows_db = AsyncMock()
+    windows_db.version.return_value = window.version
+    windows_db.get.return_value = window
+
+    response = asyncio.run(
+        route.endpoint(window.id, windows_db, MagicMock(), if_none_match)
+    )
+
+    assert response.headers["etag"] == '"1"'
+    assert response.status_code == (200 if read else 304)
+    assert windows_db.get.await_count == int(read)
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "expected"),
+    [
+        (None, False),
+        ('"1"', True),
+        ('W/"1"', True),
+        ('"0", "1"', True),
+        ("*", True),
+        ('"0"', False),
+    ],
+)
+def test_etag_matches(if_none_match: str | None, expected: bool) -> None:
+    """Test If-None-Match headers are compared with the window ETag."""
+    window = Window[WindowParams](
+        params={
+            "task_type": "foo",
+            "start_time": "2023-01-01T00:00:00",
+            "stop_time": "2023-01-02T00:00:00",
+            "datasources": ["src"],
+        },
+        version=1,
+    )
+
+    assert _etag_matches(if_none_match, _etag(window.version)) is expected
+
+
+def test_ndjson_lines() -> None:
+    """Test windows are encoded as one JSON document per line."""
+    windows = [
+        Window[WindowParams](
+            params={
+                "task_type": "foo",
+                "start_time": "2023-01-01T00:00:00",
+                "stop_time": "2023-01-02T00:00:00",
+                "datasources": ["src"],
+            }
+        )
+        for _ in range(2)
+    ]
+
+    async def _windows():
+        for window in windows:
+            yield window
+
+    async def _collect():
+        return [line async for line in _ndjson_lines(_windows())]
+
+    lines = asyncio.run(_collect())
+
+    assert len(lines) == 2
+    for line, window in zip(lines, windows, strict=True):
+        assert line.endswith(b"\n")
+        assert json.loads(line)["_id"] == str(window.id)
+
+
+def test_page_cursor_invalid() -> None:
+    """Test that an invalid page cursor is rejected."""
+    with pytest.raises(HTTPException) as exc_info:
+        _page_cursor("zz")
+
+    assert exc_info.value.status_code == 400
+
+
+def test_window_fields() -> None:
+    """Test the requested fields are split into paths."""
+    assert _window_fields(None) is None
+    assert _window_fields("id, state,params.start_time,") == [
+        "id",
+        "state",
+        "params.start_time",
+    ]
+
+
+@pytest.mark.parametrize("fields", ["unknown", "state.value"])
+def test_window_fields_invalid(fields: str) -> None:
+    """Test that unknown fields are rejected."""
+    with pytest.raises(HTTPException) as exc_info:
+        _window_fields(fields)
+
+    assert exc_info.value.status_code == 400
+
+
+class TestCreateWindows:
+    """Tests for dynamic_fastapi.app.windows._create_windows."""
+
+    _params = {
+        "start_time": "2023-01-01T00:00:00",
+        "stop_time": "2023-01-02T00:00:00",
+        "datasources": ["src"],
+    }
+
+    @pytest.fixture
+    def app_config(self) -> AppConfig:
+        """Application config with a small bulk size limit."""
+        return AppConfig.parse_obj(
+            {
+                "uvicorn": {"port": 8000, "log_level": "info"},
+                "mongo": {"host": "localhost", "database": "db"},
+                "windows": {"bulk_max_items": 3},
+            }
+        )
+
+    def test_results(self, app_config: AppConfig) -> None:
+        """Test each item gets either an ID or its errors."""
+        models = TaskTypeModels.build(TaskType(name="foo"))
+        windows_db = AsyncMock()
+        windows_db.insert_many.return_value = {1: "duplicate key"}
+        items = [self._params, {"task_type": "bar"}, self._params]
+        active_windows = ActiveWindowIndex()
+
+        results = asyncio.run(
+            _create_windows(
+                items,
+                lambda item: None if item.get("task_type") else models,
+                windows_db,
+                app_config,
+                active_windows,
+            )
+        )
+
+        windows = windows_db.insert_many.await_args.args[0]
+        assert len(windows) == 2
+        assert results[0].id == windows[0].id and not results[0].errors
+        assert results[1].id is None
+        assert results[1].errors[0]["loc"] == ["task_type"]
+        assert results[2].id is None
+        assert results[2].errors == [{"msg": "duplicate key", "type": "write_error"}]
+        assert len(active_windows) == 1
+
+    def test_validation_errors(self, app_config: AppConfig) -> None:
+        """Test validation errors are reported per item."""
+        models = TaskTypeModels.build(TaskType(name="foo"))
+        windows_db = AsyncMock()
+        windows_db.insert_many.return_value = {}
+
+        results = asyncio.run(
+            _create_windows(
+                [{"datasources": []}],
+                lambda _: models,
+                windows_db,
+                app_config,
+                ActiveWindowIndex(),
+            )
+        )
+
+        assert results[0].id is None
+        assert {err["loc"] for err in results[0].errors} == {
+            ("start_time",),
+            ("stop_time",),
+            ("datasources",),
+        }
+
+    def test_too_many(self, app_config: AppConfig) -> None:
+        """Test requests with too many items are rejected."""
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(
+                _create_windows(
+                    [{}] * 4,
+                    lambda _: None,
+                    AsyncMock(),
+                    app_config,
+                    ActiveWindowIndex(),
+                )
+            )
+
+        assert exc_info.value.status_code == 413
+
+
+def test_active_range() -> None:
+    """Test the open windows time range is a point or a range."""
+    start, stop = datetime(2023, 1, 1), datetime(2023, 1, 2)
+
+    assert _active_range(at=start) == (start, start)
+    assert _active_range(start=start, stop=stop) == (start, stop)
+    assert _active_range()[0].tzinfo is not None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"start": datetime(2023, 1, 1)},
+        {"at": datetime(2023, 1, 1), "start": datetime(2023, 1, 1)},
+        {"start": datetime(2023, 1, 2), "stop": datetime(2023, 1, 1)},
+    ],
+)
+def test_active_range_invalid(kwargs: dict) -> None:
+    """Test that invalid time ranges are rejected."""
+    with pytest.raises(HTTPException) as exc_info:
+        _active_range(**kwargs)
+
+    assert exc_info.value.status_code == 400
@@ -0,0 +1,120 @@
+"""Tests for dynamic_fastapi.database.batch."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import (
+    AutoReconnect, BulkWriteError, DuplicateKeyError, WriteConcernError
+)
+
+from dynamic_fastapi.database.batch import InsertBatcher
+
+
+def _collection(error: Exception | None = None) -> MagicMock:
+    """A motor collection which sets the IDs of inserted documents."""
+
+    async def _insert_many(docs, ordered):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        if error is not None:
+            raise error
+
+    collection = MagicMock()
+    collection.name = "test"
+    collection.insert_many = AsyncMock(side_effect=_insert_many)
+    return collection
+
+
+async def _insert(batcher: InsertBatcher, count: int) -> list:
+    docs = [{"a": index} for index in range(count)]
+    results = await asyncio.gather(
+        *(batcher.insert_one(doc) for doc in docs), return_exceptions=True
+    )
+    return list(zip(docs, results, strict=True))
+
+
+def test_insert_one() -> None:
+    """Test concurrent inserts are written together."""
+    collection = _collection()
+    batcher = InsertBatcher(collection, max_delay=0.01, max_batch=10)
+
+    results = asyncio.run(_insert(batcher, 3))
+
+    collection.insert_many.assert_awaited_once()
+    assert collection.insert_many.await_args.kwargs["ordered"] is False
+    for doc, result in results:
+        assert result.inserted_id == doc["_id"]
+
+
+def test_insert_one_max_batch() -> None:
+    """Test full batches are written without waiting for the delay."""
+    collection = _collection()
+    batcher = InsertBatcher(collection, max_delay=60, max_batch=2)
+
+    asyncio.run(asyncio.wait_for(_insert(batcher, 4), timeout=5))
+
+    calls = collection.insert_many.await_args_list
+    assert [len(call.args[0]) for call in calls] == [2, 2]
+
+
+def test_insert_one_write_errors() -> None:
+    """Test each caller receives the error of its own document."""
+    error = BulkWriteError(
+        {"writeErrors": [{"index": 1, "code": 11000, "errmsg": "dup"}]}
+    )
+    batcher = InsertBatcher(_collection(error), max_delay=0.01, max_batch=10)
+
+    results = asyncio.run(_insert(batcher, 3))
+
+    assert isinstance(results[1][1], DuplicateKeyError)
+    assert results[0][1].inserted_id == results[0][0]["_id"]
+    assert results[2][1].inserted_id == results[2][0]["_id"]
+
+
+def test_insert_one_write_concern_error() -> None:
+    """Test write concern errors are raised to every caller."""
+    error = BulkWriteError({"writeConcernErrors": [{"code": 64, "errmsg": "wc"}]})
+    batcher = InsertBatcher(_collection(error), max_delay=0.01, max_batch=10)
+
+    results = asyncio.run(_insert(batcher, 2))
+
+    assert all(isinstance(result, WriteConcernError) for _, result in results)
+
+
+def test_insert_one_failed() -> None:
+    """Test failures of the whole write are raised to every caller."""
+    batcher = InsertBatcher(
+        _collection(AutoReconnect("down")), max_delay=0.01, max_batch=10
+    )
+
+    results = asyncio.run(_insert(batcher, 2))
+
+    assert all(isinstance(result, AutoReconnect) for _, result in results)
+
+
+def test_close() -> None:
+    """Test closing writes the waiting documents."""
+    collection = _collection()
+    batcher = InsertBatcher(collection, max_delay=60, max_batch=10)
+
+    async def _run() -> None:
+        insert = asyncio.create_task(batcher.insert_one({"a": 1}))
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert insert.done()
+
+    asyncio.run(_run())
+
+    collection.insert_many.assert_awaited_once()
+
+
+@pytest.mark.parametrize("code", [11000, 11001])
+def test_insert_one_duplicate_codes(code: int) -> None:
+    """Test every duplicate key error code is raised as DuplicateKeyError."""
+    error = BulkWriteError({"writeErrors": [{"index": 0, "code": code}]})
+    batcher = InsertBatcher(_collection(error), max_delay=0, max_batch=10)
+
+    ((_, result),) = asyncio.run(_insert(batcher, 1))
+
+    assert isinstance(result, DuplicateKeyError)
@@ -0,0 +1,220 @@
+"""Tests for dynamic_fastapi.database.cache."""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+import pytest
+from bson.objectid import ObjectId
+
+from dynamic_fastapi.database.cache import (
+    CacheError, DocumentCache, MemoryCache, RedisCache, RedisError
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestMemoryCache:
+    """Tests for dynamic_fastapi.database.cache.MemoryCache."""
+
+    def test_lru(self) -> None:
+        """Test the least recently used values are evicted to fit the size."""
+        cache = MemoryCache(max_bytes=20, ttl=10)
+
+        async def _run():
+            await cache.set("a", b"0123456")
+            await cache.set("b", b"0123456")
+            await cache.get("a")
+            await cache.set("c", b"0123456")
+            return [await cache.get(key) for key in "abc"]
+
+        assert asyncio.run(_run()) == [b"0123456", None, b"0123456"]
+        assert cache.size == 16
+        assert len(cache) == 2
+
+    def test_too_large(self) -> None:
+        """Test values larger than the cache are not stored."""
+        cache = MemoryCache(max_bytes=4, ttl=10)
+
+        asyncio.run(cache.set("a", b"01234"))
+
+        assert len(cache) == 0
+        assert cache.size == 0
+
+    def test_ttl(self) -> None:
+        """Test values expire."""
+        clock = _Clock()
+        cache = MemoryCache(max_bytes=100, ttl=10, clock=clock)
+
+        asyncio.run(cache.set("a", b"value"))
+        clock.now = 9.9
+        assert asyncio.run(cache.get("a")) == b"value"
+        clock.now = 10
+        assert asyncio.run(cache.get("a")) is None
+        assert cache.size == 0
+
+    def test_generation(self) -> None:
+        """Test generations are stable until bumped."""
+        cache = MemoryCache(max_bytes=100, ttl=10)
+
+        async def _run():
+            before = await cache.generation("g")
+            again = await cache.generation("g")
+            await cache.bump("g")
+            return before, again, await cache.generation("g")
+
+        before, again, after = asyncio.run(_run())
+        assert before == again
+        assert after != before
+
+    def test_generation_expired(self) -> None:
+        """Test expired generations do not return to earlier values."""
+        clock = _Clock()
+        cache = MemoryCache(max_bytes=100, ttl=10, clock=clock)
+
+        async def _run():
+            seen = {await cache.generation("g")}
+            await cache.bump("g")
+            seen.add(await cache.generation("g"))
+            clock.now = 10
+            return seen, await cache.generation("g")
+
+        seen, after = asyncio.run(_run())
+        assert after not in seen
+
+
+class TestRedisCache:
+    """Tests for dynamic_fastapi.database.cache.RedisCache."""
+
+    def test_set(self) -> None:
+        """Test values are set with the TTL."""
+        client = AsyncMock()
+        asyncio.run(RedisCache(client, ttl=1.5).set("a", b"value"))
+
+        client.set.assert_awaited_once_with("a", b"value", px=1500)
+
+    def test_generations(self) -> None:
+        """Test generations are read together."""
+        client = AsyncMock()
+        client.mget.return_value = [b"1", b"2"]
+
+        assert asyncio.run(RedisCache(client, ttl=1).generations(["a", "b"])) == [1, 2]
+        client.mget.assert_awaited_once_with(["a", "b"])
+        client.set.assert_not_awaited()
+
+    def test_generation_initialised(self) -> None:
+        """Test missing generations are created."""
+        client = AsyncMock()
+        client.mget.side_effect = [[b"1", None], [b"1", b"123"]]
+
+        assert asyncio.run(RedisCache(client, ttl=1).generations(["a", "g"])) == [
+            1,
+            123,
+        ]
+        client.set.assert_awaited_once()
+        assert client.set.await_args.args[0] == "g"
+        assert client.set.await_args.kwargs == {"nx": True, "px": 1000}
+
+    @pytest.mark.parametrize(("created", "incremented"), [(True, False), (False, True)])
+    def test_bump(self, created: bool, incremented: bool) -> None:
+        """Test missing generations are created and others incremented."""
+        client = AsyncMock()
+        client.set.return_value = created
+
+        asyncio.run(RedisCache(client, ttl=1).bump("g"))
+
+        assert client.incr.await_count == incremented
+
+    def test_error(self) -> None:
+        """Test Redis errors are raised as cache errors."""
+        client = AsyncMock()
+        client.get.side_effect = RedisError("unavailable")
+
+        with pytest.raises(CacheError):
+            asyncio.run(RedisCache(client, ttl=1).get("a"))
+
+
+class TestDocumentCache:
+    """Tests for dynamic_fastapi.database.cache.DocumentCache."""
+
+    _doc = {"_id": ObjectId(), "time": datetime(2023, 1, 1, 12), "items": ["a"]}
+
+    def test_doc(self) -> None:
+        """Test documents are cached by ID until invalidated."""
+        cache = DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+
+        async def _run():
+            key = await cache.doc_key(self._doc["_id"])
+            await cache.set_doc(key, self._doc)
+            cached = await cache.get_doc(await cache.doc_key(self._doc["_id"]))
+            await cache.invalidate(self._doc["_id"])
+            return cached, await cache.get_doc(await cache.doc_key(self._doc["_id"]))
+
+        assert asyncio.run(_run()) == (self._doc, None)
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_doc_invalidated_while_read(self) -> None:
+        """Test documents read before being invalidated are not served."""
+        cache = DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+
+        async def _run():
+            key = await cache.doc_key(self._doc["_id"])
+            await cache.invalidate(self._doc["_id"])
+            await cache.set_doc(key, self._doc)
+            return await cache.get_doc(await cache.doc_key(self._doc["_id"]))
+
+        assert asyncio.run(_run()) is None
+
+    def test_docs(self) -> None:
+        """Test query results are cached until documents change."""
+        cache = DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+        query = {"filter": {"a": 1}, "limit": 2}
+
+        async def _run():
+            await cache.set_docs(await cache.query_key(query), [self._doc])
+            cached = await cache.get_docs(await cache.query_key(query))
+            other = await cache.get_docs(await cache.query_key({**query, "limit": 3}))
+            key = await cache.query_key(query)
+            await cache.invalidate()
+            # Read before the invalidation, so not served after it.
+            await cache.set_docs(key, [self._doc])
+            return cached, other, await cache.get_docs(await cache.query_key(query))
+
+        assert asyncio.run(_run()) == ([self._doc], None, None)
+
+    def test_invalidate_all(self) -> None:
+        """Test every document and query can be invalidated."""
+        cache = DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+
+        async def _run():
+            await cache.set_doc(await cache.doc_key(self._doc["_id"]), self._doc)
+            await cache.set_docs(await cache.query_key({}), [self._doc])
+            await cache.invalidate_all()
+            return (
+                await cache.get_doc(await cache.doc_key(self._doc["_id"])),
+                await cache.get_docs(await cache.query_key({})),
+            )
+
+        assert asyncio.run(_run()) == (None, None)
+
+    @pytest.mark.parametrize("failing", ["generations", "get"])
+    def test_backend_error(self, failing: str) -> None:
+        """Test backend errors are treated as misses."""
+        backend = AsyncMock()
+        backend.generations.return_value = [0, 0]
+        getattr(backend, failing).side_effect = CacheError("unavailable")
+        backend.set.side_effect = CacheError("unavailable")
+        cache = DocumentCache(backend, "test")
+
+        async def _run():
+            key = await cache.doc_key(self._doc["_id"])
+            await cache.set_doc(key, self._doc)
+            return await cache.get_doc(key)
+
+        assert asyncio.run(_run()) is None
+        assert cache.misses == 1
@@ -0,0 +1,391 @@
+"""Tests for dynamic_fastapi.database.collection."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from pydantic import ValidationError
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import AutoReconnect, BulkWriteError, OperationFailure
+from pymongo.results import InsertOneResult
+
+from dynamic_fastapi.database.cache import DocumentCache, MemoryCache
+from dynamic_fastapi.database.collection import (
+    Collection, decode_cursor, encode_cursor
+)
+from dynamic_fastapi.model.base import DatabaseModel
+
+
+class _Collection(Collection[DatabaseModel]):
+    class Config:
+        collection_name = "test"
+        model_class = DatabaseModel
+        indexes = [IndexModel("a", name="a"), IndexModel("b", name="b")]
+
+
+async def _aiter(values):
+    for value in values:
+        yield value
+
+
+def test_cursor_round_trip() -> None:
+    """Test that a cursor decodes to the ID it was created from."""
+    last_id = ObjectId()
+
+    assert decode_cursor(encode_cursor(last_id)) == last_id
+
+
+@pytest.mark.parametrize("cursor", ["zz", "!!!!", ""])
+def test_decode_cursor_invalid(cursor: str) -> None:
+    """Test that invalid cursors are rejected."""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_insert_many() -> None:
+    """Test documents are inserted in batches and failures are reported."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+
+    async def _insert_many(docs, ordered):
+        for doc in docs:
+            doc["_id"] = ObjectId()
+        if len(docs) == 2:
+            raise BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "dup"}]})
+
+    motor_collection.insert_many = AsyncMock(side_effect=_insert_many)
+    values = [DatabaseModel() for _ in range(5)]
+    ids = [value.id for value in values]
+
+    errors = asyncio.run(_Collection(db).insert_many(values, batch_size=2))
+
+    assert errors == {1: "dup", 3: "dup"}
+    assert motor_collection.insert_many.await_count == 3
+    assert all(
+        call.kwargs["ordered"] is False
+        for call in motor_collection.insert_many.await_args_list
+    )
+    for index, value in enumerate(values):
+        assert (value.id == ids[index]) == (index in errors)
+
+
+def test_insert_many_batch_failed() -> None:
+    """Test a batch which fails outright does not lose the other batches."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+
+    async def _insert_many(docs, ordered):
+        for doc in docs:
+            doc["_id"] = ObjectId()
+        if motor_collection.insert_many.await_count == 2:
+            raise AutoReconnect("connection lost")
+
+    motor_collection.insert_many = AsyncMock(side_effect=_insert_many)
+    values = [DatabaseModel() for _ in range(5)]
+    ids = [value.id for value in values]
+
+    errors = asyncio.run(_Collection(db).insert_many(values, batch_size=2))
+
+    assert errors == {2: "connection lost", 3: "connection lost"}
+    assert motor_collection.insert_many.await_count == 3
+    for index, value in enumerate(values):
+        assert (value.id == ids[index]) == (index in errors)
+
+
+def test_ensure_indexes() -> None:
+    """Test the declared indexes are created."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.create_indexes = AsyncMock(return_value=["a", "b"])
+
+    assert asyncio.run(_Collection(db).ensure_indexes()) == ["a", "b"]
+    motor_collection.create_indexes.assert_awaited_once_with(
+        _Collection.Config.indexes
+    )
+
+
+def test_index_report() -> None:
+    """Test declared and existing indexes are compared."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.index_information = AsyncMock(
+        return_value={"_id_": {}, "a": {}, "c": {}}
+    )
+    motor_collection.aggregate.return_value = _aiter(
+        [
+            {"name": "_id_", "accesses": {"ops": 0}},
+            {"name": "a", "accesses": {"ops": 5}},
+            {"name": "c", "accesses": {"ops": 0}},
+        ]
+    )
+
+    report = asyncio.run(_Collection(db).index_report())
+
+    assert report.collection == "test"
+    assert report.missing == ["b"]
+    assert report.undeclared == ["c"]
+    assert report.unused == ["c"]
+
+
+def test_index_report_no_stats() -> None:
+    """Test the report when index statistics are not available."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.index_information = AsyncMock(return_value={"_id_": {}})
+    motor_collection.aggregate.side_effect = OperationFailure("unsupported")
+
+    report = asyncio.run(_Collection(db).index_report())
+
+    assert report.missing == ["a", "b"]
+    assert report.unused is None
+
+
+def test_from_doc_trusted() -> None:
+    """Test trusted documents are not validated."""
+    collection = _Collection(MagicMock())
+
+    assert collection.from_doc({"_id": "invalid"}, validate=False).id == "invalid"
+    with pytest.raises(ValidationError):
+        collection.from_doc({"_id": "invalid"})
+
+
+def test_from_doc_sampled(caplog: pytest.LogCaptureFixture) -> None:
+    """Test sampled trusted documents which fail validation are logged."""
+    collection = _Collection(MagicMock(), validate_sample_rate=1.0)
+
+    assert collection.from_doc({"_id": "invalid"}, validate=False).id == "invalid"
+    assert "failed validation" in caplog.text
+
+
+def test_projection() -> None:
+    """Test field names are mapped to a projection including the ID."""
+    collection = _Collection(MagicMock())
+
+    assert collection.projection(["a.b", "a", "c.d"]) == {
+        "_id": True,
+        "a": True,
+        "c.d": True,
+    }
+    assert collection.projection(["id"]) == {"_id": True}
+
+
+def test_find_fields() -> None:
+    """Test documents found with a projection are not validated."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.find.return_value = _aiter([{"_id": "partial"}])
+
+    async def _find():
+        return [value async for value in _Collection(db).find({}, fields=["a"])]
+
+    assert [value.id for value in asyncio.run(_find())] == ["partial"]
+    motor_collection.find.assert_called_once_with(
+        {}, projection={"_id": True, "a": True}
+    )
+
+
+def test_find_page_fields_sampled(caplog: pytest.LogCaptureFixture) -> None:
+    """Test documents found with a projection are not sampled for validation."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.find.return_value.to_list = AsyncMock(
+        return_value=[{"_id": "partial"}]
+    )
+    collection = _Collection(db, validate_sample_rate=1.0)
+
+    page = asyncio.run(collection.find_page({}, fields=["a"]))
+
+    assert [value.id for value in page.items] == ["partial"]
+    assert not caplog.text
+
+
+def test_update_one() -> None:
+    """Test the updated document is returned."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    doc_id = ObjectId()
+    motor_collection.find_one_and_update = AsyncMock(
+        side_effect=[{"_id": doc_id}, None]
+    )
+    collection = _Collection(db)
+
+    update = {"$set": {"a": 2}}
+
+    assert asyncio.run(collection.update_one({"a": 1}, update)).id == doc_id
+    assert asyncio.run(collection.update_one({"a": 1}, update)) is None
+    assert motor_collection.find_one_and_update.await_args.kwargs == {
+        "return_document": ReturnDocument.AFTER
+    }
+
+
+def test_update_many() -> None:
+    """Test the number of updated documents is returned."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.update_many = AsyncMock(
+        return_value=MagicMock(modified_count=3)
+    )
+
+    assert asyncio.run(_Collection(db).update_many({}, {"$set": {"a": 1}})) == 3
+    motor_collection.update_many.assert_awaited_once_with({}, {"$set": {"a": 1}})
+
+
+def test_get_cached() -> None:
+    """Test lookups by ID are read through the cache."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    doc_id = ObjectId()
+    motor_collection.find_one = AsyncMock(return_value={"_id": doc_id})
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+
+    assert asyncio.run(collection.get(doc_id)).id == doc_id
+    assert asyncio.run(collection.get(doc_id)).id == doc_id
+    motor_collection.find_one.assert_awaited_once_with({"_id": doc_id})
+
+
+def test_get_cached_not_validated() -> None:
+    """Test documents read from the cache are not validated again."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    doc_id = ObjectId()
+    motor_collection.find_one = AsyncMock(return_value={"_id": doc_id})
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+    collection.from_doc = MagicMock(wraps=collection.from_doc)
+
+    asyncio.run(collection.get(doc_id))
+    asyncio.run(collection.get(doc_id))
+    assert [c.kwargs["validate"] for c in collection.from_doc.call_args_list] == [
+        True,
+        False,
+    ]
+
+
+def test_get_cached_race() -> None:
+    """Test a document read while it is updated is not cached."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    doc_id = ObjectId()
+    read = asyncio.Event()
+    updated = asyncio.Event()
+
+    async def _find_one(filter):
+        if motor_collection.find_one.await_count == 1:
+            # The first read returns the document from before the update.
+            read.set()
+            await updated.wait()
+        return {"_id": doc_id}
+
+    motor_collection.find_one = AsyncMock(side_effect=_find_one)
+    motor_collection.find_one_and_update = AsyncMock(return_value={"_id": doc_id})
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+
+    async def _run() -> None:
+        get = asyncio.create_task(collection.get(doc_id))
+        await read.wait()
+        await collection.update_one({"_id": doc_id}, {"$set": {"a": 1}})
+        updated.set()
+        await get
+        await collection.get(doc_id)
+        await collection.get(doc_id)
+
+    asyncio.run(_run())
+
+    # Read again after the update, then served from the cache.
+    assert motor_collection.find_one.await_count == 2
+
+
+def test_find_page_cached_race() -> None:
+    """Test a page read while a document is inserted is not cached."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    read = asyncio.Event()
+    inserted = asyncio.Event()
+
+    async def _to_list(length):
+        if motor_collection.find.call_count == 1:
+            read.set()
+            await inserted.wait()
+        return [{"_id": ObjectId()}]
+
+    motor_collection.find.return_value.to_list = AsyncMock(side_effect=_to_list)
+    motor_collection.insert_one = AsyncMock()
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+
+    async def _run() -> None:
+        page = asyncio.create_task(collection.find_page({"a": 1}))
+        await read.wait()
+        await collection.insert_one(DatabaseModel())
+        inserted.set()
+        await page
+        await collection.find_page({"a": 1})
+        await collection.find_page({"a": 1})
+
+    asyncio.run(_run())
+
+    assert motor_collection.find.call_count == 2
+
+
+def test_find_page_cached() -> None:
+    """Test pages are cached until a document is inserted."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.find.return_value.to_list = AsyncMock(
+        return_value=[{"_id": ObjectId()}, {"_id": ObjectId()}]
+    )
+    motor_collection.insert_one = AsyncMock()
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+
+    first = asyncio.run(collection.find_page({"a": 1}, limit=1))
+    second = asyncio.run(collection.find_page({"a": 1}, limit=1))
+    assert first == second
+    assert first.next == encode_cursor(first.items[0].id)
+    assert motor_collection.find.call_count == 1
+
+    asyncio.run(collection.insert_one(DatabaseModel()))
+    asyncio.run(collection.find_page({"a": 1}, limit=1))
+    assert motor_collection.find.call_count == 2
+
+
+def test_find_page_cached_not_validated() -> None:
+    """Test pages read from the cache are not validated again."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    motor_collection.find.return_value.to_list = AsyncMock(
+        return_value=[{"_id": ObjectId()}]
+    )
+    collection = _Collection(
+        db, cache=DocumentCache(MemoryCache(max_bytes=1000, ttl=10), "test")
+    )
+    collection.from_doc = MagicMock(wraps=collection.from_doc)
+
+    asyncio.run(collection.find_page({"a": 1}))
+    asyncio.run(collection.find_page({"a": 1}))
+    assert [c.kwargs["validate"] for c in collection.from_doc.call_args_list] == [
+        True,
+        False,
+    ]
+
+
+def test_insert_one_batched() -> None:
+    """Test single inserts are written through the batcher if there is one."""
+    db = MagicMock()
+    motor_collection = db.__getitem__.return_value
+    doc_id = ObjectId()
+    batcher = MagicMock()
+    batcher.insert_one = AsyncMock(return_value=InsertOneResult(doc_id, True))
+
+    value = asyncio.run(_Collection(db, batcher=batcher).insert_one(DatabaseModel()))
+
+    assert value.id == doc_id
+    batcher.insert_one.assert_awaited_once()
+    motor_collection.insert_one.assert_not_called()
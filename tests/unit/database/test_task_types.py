@@ -1,6 +1,16 @@
 """Tests for dynamic_fastapi.database.task_types."""
-from dynamic_fastapi.database.task_types import TaskTypeCollection
-from dynamic_fastapi.model.task_type import TaskType
+import asyncio
+import json
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from dynamic_fastapi.database.task_types import (
+    TaskTypeCollection, load_snapshot, register_types_from_db,
+    register_types_from_snapshot, save_snapshot, snapshot_version
+)
+from dynamic_fastapi.model.task_type import TaskType, TaskTypeRegistry
 
 
 class TestTaskTypeCollection:
@@ -10,3 +20,76 @@ class TestTaskTypeCollection:
         """Test dynamic_fastapi.database.task_types.TaskTypeCollection.Config."""
         assert TaskTypeCollection.Config.collection_name == "task_types"
         assert TaskTypeCollection.Config.model_class == TaskType
+
+    def test_indexes(self) -> None:
+        """Test task type names are unique."""
+        (index,) = TaskTypeCollection.Config.indexes
+        assert index.document["key"] == {"name": 1}
+        assert index.document["unique"]
+
+
+def test_snapshot(tmp_path: Path) -> None:
+    """Test task types saved to a snapshot are registered unchanged."""
+    task_type = TaskType(name="snapshot", extensions={"keynonce": {}})
+    snapshot = tmp_path / "task_types.json"
+
+    save_snapshot(snapshot, [task_type])
+    with patch.multiple(TaskTypeRegistry, __task_types__={}, __models__={}):
+        assert register_types_from_snapshot(snapshot)
+        assert TaskTypeRegistry.task_type("snapshot") == task_type
+        assert not register_types_from_snapshot(snapshot)
+
+
+def test_snapshot_version(tmp_path: Path) -> None:
+    """Test the snapshot version identifies the task types in any order."""
+    foo, bar = TaskType(name="foo"), TaskType(name="bar")
+
+    version = save_snapshot(tmp_path / "task_types.json", [foo, bar])
+
+    assert version == snapshot_version([bar, foo])
+    assert version != snapshot_version([foo])
+    assert load_snapshot(tmp_path / "task_types.json").version == version
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "not json",
+        '{"task_types": []}',
+        '{"version": "0", "task_types": []}',
+    ],
+)
+def test_snapshot_invalid(tmp_path: Path, content: str) -> None:
+    """Test snapshots which are damaged or do not match their version fail."""
+    snapshot = tmp_path / "task_types.json"
+    snapshot.write_text(content)
+
+    with pytest.raises(ValueError):
+        load_snapshot(snapshot)
+
+
+def test_snapshot_modified(tmp_path: Path) -> None:
+    """Test task types changed after the snapshot was saved are rejected."""
+    snapshot = tmp_path / "task_types.json"
+    save_snapshot(snapshot, [TaskType(name="foo")])
+    document = json.loads(snapshot.read_text())
+    document["task_types"][0]["name"] = "bar"
+    snapshot.write_text(json.dumps(document))
+
+    with pytest.raises(ValueError):
+        load_snapshot(snapshot)
+
+
+def test_register_types_removed() -> None:
+    """Test task types no longer in the database stay registered."""
+    task_types_db = MagicMock()
+    task_types_db.find.return_value.__aiter__.return_value = [TaskType(name="foo")]
+
+    with patch.multiple(TaskTypeRegistry, __task_types__={}, __models__={}):
+        TaskTypeRegistry.register(TaskType(name="bar"))
+        assert asyncio.run(register_types_from_db(task_types_db))
+        assert not asyncio.run(register_types_from_db(task_types_db))
+        assert {task_type.name for task_type in TaskTypeRegistry.task_types()} == {
+            "foo",
+            "bar",
+        }
@@ -1,6 +1,14 @@
 """Tests for dynamic_fastapi.database.windows."""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson.objectid import ObjectId
+from pymongo.errors import DuplicateKeyError
+
 from dynamic_fastapi.database.windows import WindowCollection
-from dynamic_fastapi.model.window import Window
+from dynamic_fastapi.model.window import Window, WindowFilter, WindowState
 
 
 class TestTaskTypeCollection:
@@ -10,3 +18,128 @@ class TestTaskTypeCollection:
         """Test dynamic_fastapi.database.windows.WindowCollection.Config."""
         assert WindowCollection.Config.collection_name == "windows"
         assert WindowCollection.Config.model_class == Window
+
+    def test_filter_query(self) -> None:
+        """Test dynamic_fastapi.database.windows.WindowCollection.filter_query."""
+        start, stop = datetime(2023, 1, 1), datetime(2023, 1, 2)
+        window_filter = WindowFilter(
+            task_types=["foo", "bar"],
+            state=WindowState.OPEN,
+            datasource="src",
+            start_after=start,
+            stop_before=stop,
+        )
+
+        assert WindowCollection.filter_query(window_filter) == {
+            "params.task_type": {"$in": ["foo", "bar"]},
+            "state": "open",
+            "params.datasources": "src",
+            "params.start_time": {"$gte": start},
+            "params.stop_time": {"$lt": stop},
+        }
+
+    def test_filter_query_empty(self) -> None:
+        """Test an empty filter matches all windows."""
+        assert WindowCollection.filter_query(WindowFilter()) == {}
+
+    def test_projection(self) -> None:
+        """Test the task type is always projected."""
+        windows_db = WindowCollection(MagicMock())
+
+        assert windows_db.projection(["state"]) == {
+            "_id": True,
+            "params.task_type": True,
+            "state": True,
+        }
+
+    def test_close(self) -> None:
+        """Test only open windows are closed."""
+        windows_db = WindowCollection(MagicMock())
+        windows_db.update_one = AsyncMock(return_value=None)
+        window_id = ObjectId()
+
+        assert asyncio.run(windows_db.close(window_id, WindowState.COMPLETE)) is None
+        windows_db.update_one.assert_awaited_once_with(
+            {"_id": window_id, "state": "open"},
+            {"$set": {"state": "complete"}, "$inc": {"version": 1}},
+            validate=True,
+        )
+
+    def test_close_many(self) -> None:
+        """Test windows matching the query are closed if they are open."""
+        windows_db = WindowCollection(MagicMock())
+        windows_db.update_many = AsyncMock(return_value=2)
+
+        assert asyncio.run(windows_db.close_many({"a": 1}, WindowState.CANCELLED)) == 2
+        windows_db.update_many.assert_awaited_once_with(
+            {"$and": [{"a": 1}, {"state": "open"}]},
+            {"$set": {"state": "cancelled"}, "$inc": {"version": 1}},
+        )
+
+    def test_open_ids(self) -> None:
+        """Test the IDs of open windows matching the query are found."""
+        db = MagicMock()
+        motor_collection = db.__getitem__.return_value
+        window_id = ObjectId()
+        motor_collection.find.return_value.to_list = AsyncMock(
+            return_value=[{"_id": window_id}]
+        )
+
+        assert asyncio.run(WindowCollection(db).open_ids({"a": 1})) == [window_id]
+        motor_collection.find.assert_called_once_with(
+            {"$and": [{"a": 1}, {"state": "open"}]}, projection={"_id": True}
+        )
+
+    def test_version(self) -> None:
+        """Test only the version of a window is read."""
+        db = MagicMock()
+        motor_collection = db.__getitem__.return_value
+        window_id = ObjectId()
+        motor_collection.find_one = AsyncMock(
+            return_value={"_id": window_id, "version": 3}
+        )
+
+        assert asyncio.run(WindowCollection(db).version(window_id)) == 3
+        motor_collection.find_one.assert_awaited_once_with(
+            {"_id": window_id}, projection={"version": True}
+        )
+
+    def test_close_open(self) -> None:
+        """Test windows cannot be closed to the open state."""
+        windows_db = WindowCollection(MagicMock())
+
+        with pytest.raises(ValueError):
+            asyncio.run(windows_db.close_many({}, WindowState.OPEN))
+
+    def test_insert_once(self) -> None:
+        """Test windows are inserted if their key is unused."""
+        window = MagicMock(idempotency_key="key")
+        windows_db = WindowCollection(MagicMock())
+        windows_db.insert_one = AsyncMock(return_value=window)
+
+        assert asyncio.run(windows_db.insert_once(window)) == (window, True)
+
+    def test_insert_once_existing(self) -> None:
+        """Test the window with the same key is returned if it exists."""
+        existing = MagicMock()
+        windows_db = WindowCollection(MagicMock())
+        windows_db.insert_one = AsyncMock(side_effect=DuplicateKeyError("dup"))
+        windows_db.find_one = AsyncMock(return_value=existing)
+
+        window = MagicMock(idempotency_key="key")
+        window.params.task_type = "foo"
+
+        result = asyncio.run(windows_db.insert_once(window))
+
+        assert result == (existing, False)
+        windows_db.find_one.assert_awaited_once_with(
+            {"params.task_type": "foo", "idempotency_key": "key"}, validate=True
+        )
+
+    def test_insert_once_no_key(self) -> None:
+        """Test duplicates of windows without a key are raised."""
+        windows_db = WindowCollection(MagicMock())
+        windows_db.insert_one = AsyncMock(side_effect=DuplicateKeyError("dup"))
+
+        with pytest.raises(DuplicateKeyError):
+            asyncio.run(windows_db.insert_once(MagicMock(idempotency_key=None)))
@@ -1,8 +1,11 @@
 """Tests for dynamic_fastapi.model.base."""
+from datetime import datetime
+
 import pytest
 from bson.objectid import ObjectId
 
-from dynamic_fastapi.model.base import DatabaseModel
+from dynamic_fastapi.model.base import DatabaseModel, construct_model
+from dynamic_fastapi.model.window import Window, WindowParams
 
 from .. import ModelTest
 
@@ -17,3 +20,29 @@ class TestDatabaseModel(ModelTest[DatabaseModel]):
         v = DatabaseModel(**kwargs)
 
         assert v.id == ObjectId("12345678901234567890abcd")
+
+
+def test_construct_model() -> None:
+    """Test models are built from trusted values by alias and field name."""
+    start, stop = datetime(2023, 1, 1), datetime(2023, 1, 2)
+    window_id = ObjectId()
+    window = construct_model(
+        Window[WindowParams],
+        {
+            "_id": window_id,
+            "params": {
+                "task_type": "foo",
+                "start_time": start,
+                "stop_time": stop,
+                "datasources": ["src"],
+            },
+            "state": "open",
+            "unknown": 1,
+        },
+    )
+
+    assert window.id == window_id
+    assert isinstance(window.params, WindowParams)
+    assert window.params.start_time == start
+    assert window.dict() == Window[WindowParams](**window.dict()).dict()
+    assert not hasattr(window, "unknown")
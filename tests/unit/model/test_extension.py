@@ -1,4 +1,6 @@
 """Tests for dynamic_fastapi.model.extension."""
+from unittest.mock import MagicMock, patch
+
 import pytest
 from pydantic import ConstrainedStr, StrRegexError
 from pydantic.fields import FieldInfo
@@ -23,6 +25,21 @@ class TestExtension:
         assert kne.key_len == 12
         assert kne.nonce_len == 16
 
+    def test_extension_memoised(self) -> None:
+        """Test extensions with the same arguments are shared."""
+        kne = Extension.extension("keynonce", key_len=12)
+
+        assert Extension.extension("keynonce", key_len=12) is kne
+        assert Extension.extension("keynonce", key_len=8) is not kne
+
+    def test_extension_unhashable(self) -> None:
+        """Test extensions with unhashable arguments are created every time."""
+        with patch.dict(Extension.__registry__, {"test": MagicMock()}):
+            Extension.extension("test", values=[1])
+            Extension.extension("test", values=[1])
+
+            assert Extension.__registry__["test"].call_count == 2
+
 
 class TestKeyNonceExtension:
     """Tests for dynamic_fastapi.model.extension.KeyNonceExtension."""
@@ -39,6 +56,15 @@ class TestKeyNonceExtension:
         self._validate_hex16(*key_def, key_len)
         self._validate_hex16(*nonce_def, nonce_len)
 
+    def test_field_types_shared(self) -> None:
+        """Test fields with the same length share a type but not field info."""
+        first = KeyNonceExtension(key_len=12, nonce_len=8).field_definitions()
+        second = KeyNonceExtension(key_len=8, nonce_len=12).field_definitions()
+
+        assert first["key"][0] is second["nonce"][0]
+        assert first["nonce"][0] is second["key"][0]
+        assert first["key"][1] is not second["nonce"][1]
+
     def _validate_hex16(
         self, field_type: type, field_info: FieldInfo, length: int | None
     ) -> None:
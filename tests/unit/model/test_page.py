@@ -0,0 +1,10 @@
+"""Tests for dynamic_fastapi.model.page."""
+from dynamic_fastapi.model.page import Page
+
+from .. import ModelTest
+
+
+class TestPage(ModelTest[Page]):
+    """Tests for dynamic_fastapi.model.page.Page."""
+
+    __required_fields__ = ["items"]
@@ -4,7 +4,10 @@ from unittest.mock import patch
 import pytest
 from pydantic import StrRegexError
 
-from dynamic_fastapi.model.task_type import TaskType, TaskTypeName
+from dynamic_fastapi.model.task_type import (
+    TaskType, TaskTypeName, TaskTypeRegistry
+)
+from dynamic_fastapi.model.window import Window
 
 from .. import ModelTest
 
@@ -50,8 +53,7 @@ class TestTaskType(ModelTest[TaskType]):
             },
         )
 
-        with patch("dynamic_fastapi.model.task_type.globals", return_value={}):
-            model = task_type.params_model
+        model = task_type.params_model
 
         assert model.__fields__.keys() == {
             "task_type",
@@ -64,3 +66,68 @@ class TestTaskType(ModelTest[TaskType]):
         }
 
         assert model.__fields__["task_type"].default == "foo"
+
+
+class TestTaskTypeRegistry:
+    """Tests for dynamic_fastapi.model.task_type.TaskTypeRegistry."""
+
+    @pytest.fixture(autouse=True)
+    def _registry(self) -> None:
+        """Isolate the registry contents for each test."""
+        with patch.dict(TaskTypeRegistry.__task_types__, clear=True), patch.dict(
+            TaskTypeRegistry.__models__, clear=True
+        ):
+            yield
+
+    def test_register(self) -> None:
+        """Test the models are built when a task type is registered."""
+        task_type = TaskType(name="foo", extensions={"symbol_set": None})
+        TaskTypeRegistry.register(task_type)
+
+        models = TaskTypeRegistry.models("foo")
+        assert TaskTypeRegistry.task_type("foo") is task_type
+        assert "symbol_set" in models.params_model.__fields__
+        assert models.window_model is Window[models.params_model]
+
+        window = models.window_model.parse_obj(
+            {
+                "params": {
+                    "task_type": "foo",
+                    "start_time": "2023-01-01T00:00:00",
+                    "stop_time": "2023-01-02T00:00:00",
+                    "datasources": ["src"],
+                    "symbol_set": 1,
+                }
+            }
+        )
+        assert isinstance(window, models.window_model)
+
+    def test_register_replaces(self) -> None:
+        """Test registering a changed task type rebuilds its models."""
+        foo = TaskType(name="foo")
+        assert TaskTypeRegistry.register(foo)
+        assert not TaskTypeRegistry.register(foo.copy())
+
+        changed = TaskType(id=foo.id, name="foo", extensions={"symbol_set": None})
+        assert TaskTypeRegistry.register(changed)
+
+        assert "symbol_set" in TaskTypeRegistry.models("foo").params_model.__fields__
+
+    def test_register_lazy(self) -> None:
+        """Test a lazy registry builds models on first use."""
+        with patch.object(TaskTypeRegistry, "lazy", True):
+            foo = TaskType(name="foo")
+            assert TaskTypeRegistry.register(foo)
+            assert "foo" not in TaskTypeRegistry.__models__
+
+            models = TaskTypeRegistry.models("foo")
+            assert TaskTypeRegistry.models("foo") is models
+
+            changed = TaskType(id=foo.id, name="foo", extensions={"symbol_set": None})
+            assert TaskTypeRegistry.register(changed)
+            assert "foo" not in TaskTypeRegistry.__models__
+            models = TaskTypeRegistry.models("foo")
+            assert "symbol_set" in models.params_model.__fields__
+
+        with pytest.raises(KeyError):
+            TaskTypeRegistry.models("bar")
@@ -1,5 +1,9 @@
 """Tests for dynamic_fastapi.model.window."""
-from dynamic_fastapi.model.window import Window, WindowParams
+import pytest
+from pydantic import ValidationError
+
+from dynamic_fastapi.model.task_type import TaskType
+from dynamic_fastapi.model.window import Window, WindowParams, window_union
 
 from .. import ModelTest
 
@@ -14,3 +18,47 @@ class TestWindowParams(ModelTest[WindowParams]):
     """Tests for dynamic_fastapi.model.window.WindowParams."""
 
     __required_fields__ = ["task_type", "start_time", "stop_time", "datasources"]
+
+
+class TestWindowUnion:
+    """Tests for dynamic_fastapi.model.window.window_union."""
+
+    _params = {
+        "start_time": "2023-01-01T00:00:00",
+        "stop_time": "2023-01-02T00:00:00",
+        "datasources": ["src"],
+    }
+
+    def test_empty(self) -> None:
+        """Test the union of no models accepts any parameters."""
+        assert window_union([]) is Window[WindowParams]
+
+    def test_single(self) -> None:
+        """Test the union of one model is the window for that model."""
+        params_model = TaskType(name="foo").params_model
+
+        assert window_union([params_model]) is Window[params_model]
+
+    def test_discriminated(self) -> None:
+        """Test windows are validated against the model for their task type."""
+        foo = TaskType(name="foo").params_model
+        bar = TaskType(name="bar", extensions={"symbol_set": None}).params_model
+        model = window_union([foo, bar])
+
+        window = model.parse_obj(
+            {"params": {"task_type": "bar", "symbol_set": 1, **self._params}}
+        )
+        assert isinstance(window.params, bar)
+
+        with pytest.raises(ValidationError) as exc_info:
+            model.parse_obj({"params": {"task_type": "bar", **self._params}})
+        # Only the matching model is tried.
+        assert [err["loc"] for err in exc_info.value.errors()] == [
+            ("params", "BAR_WindowParams", "symbol_set")
+        ]
+
+        with pytest.raises(ValidationError) as exc_info:
+            model.parse_obj({"params": {"task_type": "baz", **self._params}})
+        assert exc_info.value.errors()[0]["type"] == (
+            "value_error.discriminated_union.invalid_discriminator"
+        )
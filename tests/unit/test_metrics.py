@@ -0,0 +1,139 @@
+"""Tests for dynamic_fastapi.metrics."""
+from contextlib import nullcontext
+from unittest.mock import MagicMock
+
+import pytest
+
+from dynamic_fastapi.metrics import (
+    MONGO_CHECKOUT_FAILURES, MONGO_CONNECTIONS, REGISTRY, STAGE_DURATION,
+    Counter, Gauge, Histogram, PoolMetrics, Registry, current_route,
+    current_task_type, stage
+)
+
+
+@pytest.fixture
+def registry() -> Registry:
+    """An enabled registry."""
+    registry = Registry()
+    registry.enabled = True
+    return registry
+
+
+@pytest.fixture
+def enabled():
+    """Enable the application metrics, clearing them afterwards."""
+    REGISTRY.enabled = True
+    yield REGISTRY
+    REGISTRY.enabled = False
+    REGISTRY.clear()
+
+
+def test_counter(registry: Registry) -> None:
+    """Test counters are rendered per label value."""
+    counter = Counter(registry, "things_total", "Things.", ["kind"])
+    counter.inc("a")
+    counter.inc("a", amount=2)
+    counter.inc('b"\n')
+
+    assert registry.render().decode().splitlines() == [
+        "# HELP things_total Things.",
+        "# TYPE things_total counter",
+        'things_total{kind="a"} 3',
+        'things_total{kind="b\\"\\n"} 1',
+    ]
+
+
+def test_counter_labels(registry: Registry) -> None:
+    """Test the label values must match the label names."""
+    counter = Counter(registry, "things_total", "Things.", ["kind"])
+
+    with pytest.raises(ValueError):
+        counter.inc("a", "b")
+
+
+def test_gauge(registry: Registry) -> None:
+    """Test gauges go up and down."""
+    gauge = Gauge(registry, "things", "Things.")
+    gauge.inc(amount=3)
+    gauge.dec()
+
+    assert registry.render().decode().splitlines()[-1] == "things 2"
+
+
+def test_histogram(registry: Registry) -> None:
+    """Test histogram buckets are cumulative."""
+    histogram = Histogram(registry, "seconds", "Time.", ["op"], buckets=[0.1, 1])
+    for value in (0.05, 0.1, 0.5, 2):
+        histogram.observe(value, "read")
+
+    assert registry.render().decode().splitlines()[2:] == [
+        'seconds_bucket{op="read",le="0.1"} 2',
+        'seconds_bucket{op="read",le="1"} 3',
+        'seconds_bucket{op="read",le="+Inf"} 4',
+        'seconds_sum{op="read"} 2.65',
+        'seconds_count{op="read"} 4',
+    ]
+
+
+def test_disabled() -> None:
+    """Test nothing is recorded while the registry is disabled."""
+    registry = Registry()
+    counter = Counter(registry, "things_total", "Things.")
+    histogram = Histogram(registry, "seconds", "Time.")
+    counter.inc()
+    histogram.observe(1)
+
+    lines = registry.render().decode().splitlines()
+    assert [line for line in lines if not line.startswith("#")] == []
+
+
+def test_duplicate(registry: Registry) -> None:
+    """Test metric names must be unique."""
+    Counter(registry, "things_total", "Things.")
+
+    with pytest.raises(ValueError):
+        Counter(registry, "things_total", "Things.")
+
+
+def test_stage_disabled() -> None:
+    """Test stages are not timed while metrics are disabled."""
+    assert isinstance(stage("decode"), nullcontext)
+
+
+def test_stage(enabled: Registry) -> None:
+    """Test stages are labelled with the current route and task type."""
+    token = current_route.set("/windows")
+    task_token = current_task_type.set("foo")
+    try:
+        with stage("decode"):
+            pass
+        with stage("validate", "bar"):
+            pass
+    finally:
+        current_route.reset(token)
+        current_task_type.reset(task_token)
+
+    rendered = enabled.render().decode()
+    assert (
+        f'{STAGE_DURATION.name}_count{{stage="decode",route="/windows",'
+        'task_type="foo"} 1'
+    ) in rendered
+    assert (
+        f'{STAGE_DURATION.name}_count{{stage="validate",route="/windows",'
+        'task_type="bar"} 1'
+    ) in rendered
+
+
+def test_pool_metrics(enabled: Registry) -> None:
+    """Test connection pool events update the gauges."""
+    listener = PoolMetrics()
+    listener.connection_created(MagicMock())
+    listener.connection_created(MagicMock())
+    listener.connection_closed(MagicMock())
+    listener.connection_checked_out(MagicMock())
+    listener.connection_check_out_failed(MagicMock(reason="timeout"))
+
+    rendered = enabled.render().decode()
+    assert f'{MONGO_CONNECTIONS.name}{{state="open"}} 1' in rendered
+    assert f'{MONGO_CONNECTIONS.name}{{state="in_use"}} 1' in rendered
+    assert f'{MONGO_CHECKOUT_FAILURES.name}{{reason="timeout"}} 1' in rendered